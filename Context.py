@@ -13,6 +13,9 @@ class EventReport:
         # indicates that the event caused something that requires a scene
         #   update -- a scene update automatically implies a redraw
         self.sceneUpdate = sceneUpdate
+        # indicates that the event left work to be completed later, in
+        #   Context.processDeferred -- e.g., several events can share the work
+        self.hasDeferred = False
 
     def __str__( self ):
         return 'EventReport: handled( %s ), redraw( %s ), update( %s )' % ( self.isHandled, self.needsRedraw, self.sceneUpdate )
@@ -28,6 +31,7 @@ class EventReport:
         self.isHandled = report.isHandled or self.isHandled
         self.needsRedraw = report.needsRedraw or self.needsRedraw
         self.sceneUpdate = report.sceneUpdate or self.sceneUpdate
+        self.hasDeferred = report.hasDeferred or self.hasDeferred
 
 class Context( object ):
     '''Base class for UI contexts'''
@@ -76,6 +80,16 @@ class Context( object ):
         '''
         return EventReport()
 
+    def processDeferred( self, camControl, scene ):
+        '''Completes the work deferred by previous events (see
+        EventReport.hasDeferred), returning an EventReport.
+
+        @param:     camControl  The scene's camera control.
+        @param:     scene       The scene.
+        @returns:   An instance of EventReport.
+        '''
+        return EventReport()
+
     def keyPressEvent( self, event, camControl ):
         '''Handles key press events.
 
@@ -295,6 +309,43 @@ class SelectContext( Context ):
 
         return selected    
         
+    def pickSingle( self, camControl, selectPoint ):
+        '''Given the camera and a selection point in screen space, reports the id
+        of the front-most element drawn by the context under the point. Where
+        supported, the context's 3D UI is drawn in id colors (see Select.startPick())
+        instead of using OpenGL selection; this avoids the selection buffer's
+        size limit and slow, emulated selection modes. Otherwise, this falls back
+        to selectSingle(), drawing the context's UI alone.
+
+        @param:     camControl  The camera control.
+        @param:     selectPoint The screen space point at which selection is to be done.
+        @returns:   The id (a non-negative int) of the picked element; zero if nothing
+                    was picked.
+        '''
+        if ( not Select.pickSupported() ):
+            selected = self.selectSingle( None, camControl, selectPoint )
+            if ( len( selected ) ):
+                return selected.pop()
+            return 0
+        glMatrixMode( GL_PROJECTION )
+        glPushMatrix()
+        glMatrixMode( GL_MODELVIEW )
+        glPushMatrix()
+
+        camControl.setSelectMat( selectPoint, 1 )
+        camControl.setGLView()
+
+        Select.startPick()
+        self.draw3DGL( camControl, Select.SelectState.PICK )
+        picked = Select.endPick()
+
+        glMatrixMode( GL_PROJECTION )
+        glPopMatrix()
+        glMatrixMode( GL_MODELVIEW )
+        glPopMatrix()
+
+        return picked
+
     def selectRegion( self, scene, camControl, point0, point1 ):
         '''Given the scene, camera and a selection *region*, returns a set of all
         selectables which intersect the region.
@@ -3,6 +3,7 @@
 from PyQt4 import QtCore, QtGui, QtOpenGL
 from OpenGL.GL import *
 import math
+import time
 from camera import GLCamera
 from mesh import getMeshNode
 from camControl import OrbitCamControl
@@ -10,8 +11,13 @@ from matrix import Vector3
 from Context import EventReport
 from material import Material
 import mouse
+import timing
 
 class GLWidget( QtOpenGL.QGLWidget ):
+    # The shortest time (in ms) between processing deferred work (e.g., hover
+    #   picking); events arriving more often share the work.
+    DEFERRED_INTERVAL = 16
+
     def __init__(self, scene, parent=None):
         '''Constructor.
 
@@ -25,10 +31,19 @@ class GLWidget( QtOpenGL.QGLWidget ):
         self.camControl = OrbitCamControl( camera, Vector3( 0.0, 0.0, 0.0 ) )
 
         self.hidden = False
+        # If True, the recent stage timings are drawn over the view.
+        self.showTimings = False
         self.bgColor = ( 0.3, 0.35, 0.4, 0.0 )
         self.setFocusPolicy( QtCore.Qt.StrongFocus )
         self.setMouseTracking( True )
 
+        # Deferred work (see EventReport.hasDeferred) is done at most once per
+        #   DEFERRED_INTERVAL.
+        self.deferredTimer = QtCore.QTimer( self )
+        self.deferredTimer.setSingleShot( True )
+        self.deferredTimer.timeout.connect( self.processDeferred )
+        self.lastDeferred = 0.0
+
     def addObjToScene( self, obj_filename, selectable=True ):
         '''Adds the given obj file to the scene.'''
         is_selectable = selectable
@@ -78,6 +93,13 @@ class GLWidget( QtOpenGL.QGLWidget ):
         glShadeModel(GL_FLAT)
 
     def paintGL(self):
+        with timing.stage( 'paintGL' ):
+            self.drawView()
+        if ( self.showTimings ):
+            self.drawTimings()
+
+    def drawView( self ):
+        '''Draws the scene and the camera control.'''
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT )
         glLoadIdentity()
         self.camControl.setGLView()
@@ -99,6 +121,24 @@ class GLWidget( QtOpenGL.QGLWidget ):
         if ( self.hidden ):
             Material.setGL = Material.setGLSolid
 
+    def drawTimings( self ):
+        '''Draws the recent stage timings (see timing.py) over the view.'''
+        glPushAttrib( GL_ENABLE_BIT | GL_CURRENT_BIT )
+        glDisable( GL_LIGHTING )
+        glDisable( GL_DEPTH_TEST )
+        glColor3f( 1.0, 1.0, 0.0 )
+        y = 15
+        self.renderText( 5, y, '%-20s %9s %9s %9s' % ( 'stage (ms)', 'last', 'mean', 'max' ) )
+        for row in timing.TIMINGS.summary():
+            y += 15
+            self.renderText( 5, y, '%-20s %9.2f %9.2f %9.2f' % ( row['stage'], row['last'], row['mean'], row['max'] ) )
+        glPopAttrib()
+
+    def toggleTimings( self, state ):
+        '''Sets whether the stage timings are drawn over the view.'''
+        self.showTimings = state
+        self.updateGL()
+
     def resizeGL(self, width, height):
         side = min(width, height)
         if side < 0:
@@ -153,9 +193,30 @@ class GLWidget( QtOpenGL.QGLWidget ):
         result = self.camControl.mouseMoveEvent( event, self.scene )
         if ( self.scene and not result.isHandled ):
             result = self.scene.mouseMoveEvent( event, self.camControl )
+        if ( result.hasDeferred ):
+            self.scheduleDeferred()
         if ( result.needsRedraw or result.sceneUpdate ):
             self.updateGL()
 
+    def scheduleDeferred( self ):
+        '''Schedules the processing of deferred work. The work is done once all
+        pending events have been handled, but no sooner than DEFERRED_INTERVAL
+        after it was last done.'''
+        if ( not self.deferredTimer.isActive() ):
+            elapsed = ( time.time() - self.lastDeferred ) * 1000.0
+            self.deferredTimer.start( max( 0, int( self.DEFERRED_INTERVAL - elapsed ) ) )
+
+    def processDeferred( self ):
+        '''Processes the work deferred by earlier events.'''
+        self.lastDeferred = time.time()
+        if ( self.scene ):
+            self.makeCurrent()
+            result = self.scene.processDeferred( self.camControl )
+            if ( result.hasDeferred ):
+                self.scheduleDeferred()
+            if ( result.needsRedraw or result.sceneUpdate ):
+                self.updateGL()
+
     def toggle_cam_control_widget_display( self, state ):
         '''Toggles the display of the camera control's widget'''
         self.camControl.toggle_motion_widget( state )
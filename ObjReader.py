@@ -12,6 +12,7 @@
 
 
 import re
+import numpy as np
 from matrix import *
 from primitives import *
 from datetime import datetime
@@ -32,6 +33,17 @@ MTLLIB_PAT = re.compile('\s*mtllib\s+([a-zA-Z_0-9\./]+\.[a-zA-Z0-9]{3})')
 GRP_PAT = re.compile('\s*g\s+([a-zA-Z][a-zA-Z_0-9]*)')
 USEMTL_PAT = re.compile('\s*usemtl\s+([a-zA-Z][a-zA-Z_0-9\(\)]*)')
 
+# Whole-file patterns used by the bulk reader (see readObjArrays); each captures
+#   the body of a record.
+VERT_LINES_PAT = re.compile( '^[ \t]*v[ \t]+(.*)$', re.M )
+UV_LINES_PAT = re.compile( '^[ \t]*vt[ \t]+(.*)$', re.M )
+NORM_LINES_PAT = re.compile( '^[ \t]*vn[ \t]+(.*)$', re.M )
+FACE_LINES_PAT = re.compile( '^[ \t]*f[ \t]+(.*)$', re.M )
+# Lines which change the state of the reader (group, material, library).
+STATE_LINES_PAT = re.compile( '^[ \t]*(?:g|usemtl|mtllib).*$', re.M )
+# Lines starting with v which are not vertex, uv or normal records.
+BAD_VERT_LINES_PAT = re.compile( '^[ \t]*v(?![ \t]|[nt][ \t])', re.M )
+
 ##mtllib	wooddoll.mtl
 ##g Figure_4
 ##g Figure_4
@@ -308,6 +320,181 @@ class Group:
         else:
             return None
         
+class ObjArrays:
+    """The contents of an obj file in contiguous arrays (see readObjArrays).
+
+    Face data is stored per *corner*: face i's corners are
+    faceOffsets[ i ] : faceOffsets[ i + 1 ] of faceVerts, faceNorms and faceUVs.
+    The indices are one-based, as in the file; an index of zero means the face
+    has no normal (or uv) indices.
+    """
+    def __init__( self ):
+        # Vx3, Nx3 and Tx2 arrays of vertex positions, normals and uvs.
+        self.verts = np.zeros( ( 0, 3 ), dtype=FLOAT )
+        self.norms = np.zeros( ( 0, 3 ), dtype=FLOAT )
+        self.uvs = np.zeros( ( 0, 2 ), dtype=FLOAT )
+        # The faces, in file order.
+        self.faceOffsets = np.zeros( 1, dtype=np.int64 )
+        self.faceVerts = np.zeros( 0, dtype=np.int64 )
+        self.faceNorms = np.zeros( 0, dtype=np.int64 )
+        self.faceUVs = np.zeros( 0, dtype=np.int64 )
+        # The group and material records, in file order:
+        #   ( 'g', groupName ) -- the current group becomes groupName.
+        #   ( 'f', matName, start, end ) -- faces [start, end) with material matName
+        #                                   belong to the current group.
+        self.events = []
+        self.mtllib = None
+        self.currMatName = 'default'
+
+    def faceCount( self ):
+        """Returns the number of faces"""
+        return self.faceOffsets.size - 1
+
+def parseRecords( bodies, width ):
+    """Parses the bodies of vertex, normal or uv records into an array.
+
+    @param:     bodies      A list of strings -- the text following the record tag.
+    @param:     width       The number of values to take from each record; any
+                            further values are ignored.
+    @returns:   An Nx(width) array of FLOATs or None if the records are malformed.
+    """
+    values = np.fromstring( ' '.join( bodies ), dtype=np.float64, sep=' ' )
+    if ( values.size == len( bodies ) * width ):
+        return values.reshape( -1, width ).astype( FLOAT )
+    # Some records have additional values (or are malformed).
+    try:
+        rows = [ [ float( x ) for x in b.split()[ :width ] ] for b in bodies ]
+        return np.array( rows, dtype=FLOAT ).reshape( -1, width )
+    except ValueError:
+        return None
+
+def parseFaceRecords( bodies ):
+    """Parses the bodies of face records. Faces which repeat a vertex are
+    discarded (as with the line-by-line reader).
+
+    @param:     bodies      A list of strings -- the text following the f tag.
+    @returns:   A 4-tuple of int arrays ( sizes, verts, norms, uvs ) -- the
+                number of vertices in each face and the (one-based) indices of
+                each corner -- or None if the records don't all have the same,
+                well-formed, layout.
+    """
+    sizes = np.fromiter( ( len( b.split() ) for b in bodies ), dtype=np.int64, count=len( bodies ) )
+    if ( np.any( sizes == 0 ) ):
+        return None
+    text = ' '.join( bodies )
+    corners = sizes.sum()
+    first = bodies[0].split()[0]
+    # The layout of every corner: v, v/t, v//n or v/t/n
+    if ( '//' in first ):
+        stride, columns = 2, ( 0, 2 )
+        if ( text.count( '//' ) != corners or text.count( '/' ) != 2 * corners ):
+            return None
+        text = text.replace( '//', ' ' )
+    else:
+        slashes = first.count( '/' )
+        stride, columns = slashes + 1, ( 0, 1, 2 )[ :slashes + 1 ]
+        if ( text.count( '/' ) != slashes * corners or ( slashes and '//' in text ) ):
+            return None
+        text = text.replace( '/', ' ' )
+    values = np.fromstring( text, dtype=np.int64, sep=' ' )
+    if ( values.size != corners * stride ):
+        return None
+    values = values.reshape( -1, stride )
+    data = [ np.zeros( corners, dtype=np.int64 ) for i in xrange( 3 ) ]
+    for i, col in enumerate( columns ):
+        data[ col ] = values[ :, i ]
+    verts, uvs, norms = data
+
+    # Discard faces which use a vertex more than once.
+    face = np.repeat( np.arange( sizes.size ), sizes )
+    order = np.lexsort( ( verts, face ) )
+    repeats = ( verts[ order[1:] ] == verts[ order[:-1] ] ) & ( face[ order[1:] ] == face[ order[:-1] ] )
+    if ( np.any( repeats ) ):
+        bad = np.zeros( sizes.size, dtype=np.bool )
+        bad[ face[ order[1:] ][ repeats ] ] = True
+        keep = ~bad[ face ]
+        sizes = sizes[ ~bad ]
+        verts, norms, uvs = verts[ keep ], norms[ keep ], uvs[ keep ]
+    return sizes, verts, norms, uvs
+
+def readObjArrays( filename ):
+    """Reads an obj file in bulk: the vertex, normal, uv and face records are
+    located with whole-file patterns and converted to arrays in a few numpy
+    operations.
+
+    Only the common subset of the format is handled this way. If the file
+    contains anything else which the line-by-line reader (ObjFile.readFileLines)
+    would interpret differently -- including malformed records, which it
+    reports -- None is returned.
+
+    @param:     filename        The path to the obj file.
+    @returns:   An instance of ObjArrays or None.
+    """
+    with open( filename, 'r' ) as f:
+        text = f.read()
+    if ( BAD_VERT_LINES_PAT.search( text ) ):
+        return None
+    arrays = ObjArrays()
+    for pattern, width, name in ( ( VERT_LINES_PAT, 3, 'verts' ),
+                                  ( NORM_LINES_PAT, 3, 'norms' ),
+                                  ( UV_LINES_PAT, 2, 'uvs' ) ):
+        bodies = pattern.findall( text )
+        if ( bodies ):
+            values = parseRecords( bodies, width )
+            if ( values is None ):
+                return None
+            setattr( arrays, name, values )
+
+    # The state lines split the file into segments whose faces share a group
+    #   and material.
+    segments = []
+    start = 0
+    for match in STATE_LINES_PAT.finditer( text ):
+        segments.append( ( start, match.start(), arrays.currMatName ) )
+        start = match.end()
+        line = match.group( 0 ).strip()
+        if ( line.startswith( 'mtllib' ) ):
+            lib = MTLLIB_PAT.match( line )
+            if ( lib is None or arrays.mtllib ):
+                return None
+            arrays.mtllib = lib.group( 1 )
+        elif ( line.startswith( 'g' ) ):
+            grp = GRP_PAT.match( line )
+            if ( grp ):
+                segments.append( grp.group( 1 ) )
+        else:
+            mtl = USEMTL_PAT.match( line )
+            if ( mtl is None ):
+                return None
+            arrays.currMatName = mtl.group( 1 )
+    segments.append( ( start, len( text ), arrays.currMatName ) )
+
+    sizes, verts, norms, uvs = [], [], [], []
+    face_count = 0
+    for segment in segments:
+        if ( isinstance( segment, str ) ):
+            arrays.events.append( ( 'g', segment ) )
+            continue
+        start, end, matName = segment
+        bodies = FACE_LINES_PAT.findall( text, start, end )
+        if ( not bodies ):
+            continue
+        faces = parseFaceRecords( bodies )
+        if ( faces is None ):
+            return None
+        sizes.append( faces[0] )
+        verts.append( faces[1] )
+        norms.append( faces[2] )
+        uvs.append( faces[3] )
+        arrays.events.append( ( 'f', matName, face_count, face_count + faces[0].size ) )
+        face_count += faces[0].size
+    if ( sizes ):
+        arrays.faceOffsets = np.concatenate( ( [ 0 ], np.cumsum( np.concatenate( sizes ) ) ) )
+        arrays.faceVerts = np.concatenate( verts )
+        arrays.faceNorms = np.concatenate( norms )
+        arrays.faceUVs = np.concatenate( uvs )
+    return arrays
+
 class ObjFile:
     class FaceIterator:
         """An iterator through the objfile's faces"""
@@ -358,10 +545,90 @@ class ObjFile:
         self.currGroup = None #self.groups['default']
         self.mtllib = None
         self.currMatName = 'default'
+        # The file's contents as arrays (an ObjArrays instance) if it was read
+        #   in bulk. While this is set, vertSet, normSet, uvSet and groups are
+        #   views of the arrays, created on first use.
+        self.arrays = None
         if ( filename != None ):
             self.readFile( filename )
 
+    def __getattr__( self, name ):
+        # Only called for missing attributes: creates the views of the arrays.
+        arrays = self.__dict__.get( 'arrays' )
+        if ( arrays is None or name not in ( 'vertSet', 'normSet', 'uvSet', 'groups' ) ):
+            raise AttributeError, name
+        if ( name == 'groups' ):
+            self._makeGroups()
+        else:
+            # The vectors share memory with the arrays, so in-place changes
+            #   (e.g., scale(), translate()) are reflected in both.
+            data = { 'vertSet':( arrays.verts, Vector3 ),
+                     'normSet':( arrays.norms, Vector3 ),
+                     'uvSet':( arrays.uvs, Vector2 ) }[ name ]
+            views = []
+            for row in data[0]:
+                v = data[1]()
+                v.data = row
+                views.append( v )
+            self.__dict__[ name ] = views
+        return self.__dict__[ name ]
+
+    def _makeGroups( self ):
+        '''Creates the groups (and their faces) from the arrays.'''
+        arrays = self.arrays
+        offsets = arrays.faceOffsets.tolist()
+        verts = arrays.faceVerts.tolist()
+        norms = arrays.faceNorms.tolist()
+        uvs = arrays.faceUVs.tolist()
+        self.__dict__[ 'groups' ] = {}
+        self.currGroup = None
+        for event in arrays.events:
+            if ( event[0] == 'g' ):
+                groupName = event[1]
+                if ( self.groups.has_key( groupName ) ):
+                    self.currGroup = self.groups[ groupName ]
+                else:
+                    self.currGroup = Group( groupName )
+                    self.groups[ groupName ] = self.currGroup
+                continue
+            matName, start, end = event[1:]
+            if ( self.currGroup == None ):
+                groupName = 'no_name'
+                self.currGroup = Group( groupName )
+                self.groups[ groupName ] = self.currGroup
+            for i in xrange( start, end ):
+                first, last = offsets[ i ], offsets[ i + 1 ]
+                # Missing normal or uv indices are stored as zero.
+                f = Face( verts[ first:last ],
+                          norms[ first:last ] if norms[ first ] else [],
+                          uvs[ first:last ] if uvs[ first ] else [] )
+                self.currGroup.addFace( f, matName )
+
+    def _detachArrays( self ):
+        '''Makes the object views (vertSet, normSet, uvSet, groups) the only
+        definition of the mesh; called before they are changed.'''
+        if ( self.arrays is not None ):
+            for name in ( 'vertSet', 'normSet', 'uvSet', 'groups' ):
+                getattr( self, name )
+            self.arrays = None
+
     def readFile( self, filename ):
+        '''Reads the obj file. Where possible, the file is read in bulk into
+        arrays (see readObjArrays) and the object views are created only as
+        needed. Otherwise, it is read line-by-line (see readFileLines).'''
+        arrays = readObjArrays( filename )
+        if ( arrays is None ):
+            self.readFileLines( filename )
+            return
+        self.arrays = arrays
+        self.mtllib = arrays.mtllib
+        self.currMatName = arrays.currMatName
+        for name in ( 'vertSet', 'normSet', 'uvSet', 'groups' ):
+            self.__dict__.pop( name, None )
+
+    def readFileLines( self, filename ):
+        '''Reads the obj file, one line at a time, into the object views.'''
+        self._detachArrays()
         file = open( filename, 'r')
         lineNum = 0
         for line in file.xreadlines():
@@ -660,20 +927,83 @@ class ObjFile:
         norm.normalize_ip()
         return norm
 
+    def vertexArray( self ):
+        '''Returns the vertex positions as a Vx3 array of FLOATs.'''
+        if ( self.arrays is not None ):
+            return self.arrays.verts
+        return np.array( [ v.data for v in self.vertSet ], dtype=FLOAT ).reshape( -1, 3 )
+
+    def faceArrays( self ):
+        '''Returns the faces' vertex indices, with the faces in the same order as
+        getFaceIterator().
+
+        @returns:   A 2-tuple of int arrays ( offsets, verts ): face i's (one-based)
+                    vertex indices are verts[ offsets[ i ] : offsets[ i + 1 ] ].
+        '''
+        if ( self.arrays is None ):
+            faces = [ f.verts for f in self.getFaceIterator() ] if self.faceStats()[1] else []
+            sizes = np.array( [ len( f ) for f in faces ], dtype=np.int64 )
+            verts = np.array( [ v for f in faces for v in f ], dtype=np.int64 )
+            return np.concatenate( ( [ 0 ], np.cumsum( sizes ) ) ).astype( np.int64 ), verts
+        # The iterator visits groups and their materials in dictionary order.
+        #   Dictionaries with the same keys, inserted in the same order, replay
+        #   that order.
+        groups = {}
+        current = None
+        for event in self.arrays.events:
+            if ( event[0] == 'g' ):
+                current = groups.setdefault( event[1], {} )
+            else:
+                if ( current is None ):
+                    current = groups.setdefault( 'no_name', {} )
+                current.setdefault( event[1], [] ).append( event[2:] )
+        order = [ np.arange( start, end ) for materials in groups.values()
+                  for ranges in materials.values() for start, end in ranges ]
+        offsets = self.arrays.faceOffsets
+        if ( not order ):
+            return offsets, self.arrays.faceVerts
+        order = np.concatenate( order )
+        sizes = np.diff( offsets )[ order ]
+        new_offsets = np.concatenate( ( [ 0 ], np.cumsum( sizes ) ) )
+        corners = np.arange( new_offsets[-1] ) - np.repeat( new_offsets[:-1] - offsets[ order ], sizes )
+        return new_offsets, self.arrays.faceVerts[ corners ]
+
+    def getFaceNormals( self, offsets, verts ):
+        '''Returns the normals of the given faces (see getFaceNormal).
+
+        @param:     offsets     The faces' offsets (see faceArrays()).
+        @param:     verts       The faces' vertex indices (see faceArrays()).
+        @returns:   An Fx3 array of FLOATs.
+        '''
+        positions = self.vertexArray()
+        first = offsets[:-1]
+        v1 = positions[ verts[ first ] - 1 ]
+        e1 = positions[ verts[ first + 1 ] - 1 ] - v1
+        e2 = positions[ verts[ first + 2 ] - 1 ] - v1
+        norms = np.cross( e1, e2 )
+        lengths = np.sqrt( np.sum( norms * norms, axis=1 ) )
+        valid = lengths >= EPS
+        norms[ ~valid ] = 0.0
+        norms[ valid ] *= ( 1.0 / lengths[ valid ] )[ :, np.newaxis ]
+        return norms
+
     def addVertex( self, v ):
         '''Adds a vertex to the current group and returns index'''
+        self._detachArrays()
         idx = len( self.vertSet )
         self.vertSet.append( v )
         return idx
 
     def addUV( self, uv ):
         '''Adds a uv coordinate to the current group and returns index'''
+        self._detachArrays()
         idx = len( self.uvSet )
         self.uvSet.append( uv )
         return idx
 
     def addNormal( self, n ):
         '''Adds a normal to the current group and returns index'''
+        self._detachArrays()
         idx = len( self.normSet )
         self.normSet.append( n )
         return idx
@@ -695,6 +1025,7 @@ class ObjFile:
 
     def addFace( self, verts, uvs, norms ):
         '''Given indices into verts, uvs and norms, creates the face and adds it'''
+        self._detachArrays()
         f = Face( verts, norms, uvs )
         if ( self.currGroup == None ):
             groupName = 'no_name'
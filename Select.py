@@ -1,5 +1,6 @@
 # Class for handling selection
 from OpenGL.GL import *
+import numpy as np
 
 # all registered selectable objects
 SELECTABLES = [None]
@@ -12,6 +13,8 @@ class SelectState:
     DRAW = 0
 ##    HOVER = 1
     SELECT = 2
+    # Drawing ids as colors for color-id picking (see startPick()).
+    PICK = 3
 
 class Selectable:
     '''Base class for selectable objects - using OpenGL selection mechanism.'''
@@ -168,4 +171,95 @@ def closestHit( buffer ):
             return closest
     else:
         return None
-    
\ No newline at end of file
+
+# Color-id picking.
+#
+# GL_SELECT is deprecated and often emulated in software, and its hit buffer
+# has a fixed size (BUFFER_SIZE). As an alternative, elements can be drawn with
+# their ids encoded as colors (see idColors()) into a single-pixel, offscreen
+# framebuffer; the id of the front-most element is read back from that pixel.
+# The projection must map the picked pixel to the whole viewport (e.g.,
+# GLCamera.setSelectMat() with a pick size of one).
+#
+# Ids are 24 bits (the red, green and blue channels); zero means nothing was
+# drawn.
+
+# The ( framebuffer, color renderbuffer, depth renderbuffer ) names of the pick
+# framebuffer, created on the first pick.
+_PICK_FRAMEBUFFER = None
+
+def pickSupported():
+    '''Reports if color-id picking is supported by the current OpenGL context.'''
+    return bool( glGenFramebuffers ) and bool( glGenRenderbuffers )
+
+def idColors( ids ):
+    '''Encodes ids as colors.
+
+    @param:     ids         An array of N non-negative integers less than 2^24.
+    @returns:   An Nx4 uint8 array of RGBA colors.
+    '''
+    ids = np.asarray( ids, dtype=np.uint32 ).ravel()
+    colors = np.empty( ( ids.size, 4 ), dtype=np.uint8 )
+    colors[:, 0] = ids & 0xff
+    colors[:, 1] = ( ids >> 8 ) & 0xff
+    colors[:, 2] = ( ids >> 16 ) & 0xff
+    colors[:, 3] = 0xff
+    return colors
+
+def _pickFramebuffer():
+    '''Returns the name of the pick framebuffer, creating it if necessary.'''
+    global _PICK_FRAMEBUFFER
+    if ( _PICK_FRAMEBUFFER is None ):
+        fbo = int( glGenFramebuffers( 1 ) )
+        color, depth = [ int( name ) for name in glGenRenderbuffers( 2 ) ]
+        glBindRenderbuffer( GL_RENDERBUFFER, color )
+        glRenderbufferStorage( GL_RENDERBUFFER, GL_RGBA8, 1, 1 )
+        glBindRenderbuffer( GL_RENDERBUFFER, depth )
+        glRenderbufferStorage( GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, 1, 1 )
+        glBindRenderbuffer( GL_RENDERBUFFER, 0 )
+        glBindFramebuffer( GL_FRAMEBUFFER, fbo )
+        glFramebufferRenderbuffer( GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, color )
+        glFramebufferRenderbuffer( GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, depth )
+        status = glCheckFramebufferStatus( GL_FRAMEBUFFER )
+        glBindFramebuffer( GL_FRAMEBUFFER, 0 )
+        if ( status != GL_FRAMEBUFFER_COMPLETE ):
+            glDeleteFramebuffers( 1, [ fbo ] )
+            glDeleteRenderbuffers( 2, [ color, depth ] )
+            raise RuntimeError( 'The pick framebuffer is incomplete: 0x%x' % status )
+        _PICK_FRAMEBUFFER = ( fbo, color, depth )
+    return _PICK_FRAMEBUFFER[0]
+
+def startPick():
+    '''Starts the color-id picking process. Everything drawn until endPick()
+    should be drawn in id colors (see idColors()).'''
+    fbo = _pickFramebuffer()
+    glPushAttrib( GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT |
+                  GL_VIEWPORT_BIT | GL_POLYGON_BIT )
+    glBindFramebuffer( GL_FRAMEBUFFER, fbo )
+    glViewport( 0, 0, 1, 1 )
+    # Anything which alters the drawn colors would corrupt the ids.
+    glDisable( GL_LIGHTING )
+    glDisable( GL_TEXTURE_2D )
+    glDisable( GL_BLEND )
+    glDisable( GL_DITHER )
+    glDisable( GL_FOG )
+    glEnable( GL_DEPTH_TEST )
+    glDepthMask( GL_TRUE )
+    glColorMask( GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE )
+    glPolygonMode( GL_FRONT_AND_BACK, GL_FILL )
+    glClearColor( 0.0, 0.0, 0.0, 0.0 )
+    glClear( GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT )
+
+def endPick():
+    '''Ends the color-id picking process.
+
+    @returns:       The id of the front-most element drawn over the picked
+                    pixel (zero if there is none).
+    '''
+    pixel = glReadPixels( 0, 0, 1, 1, GL_RGBA, GL_UNSIGNED_BYTE )
+    glBindFramebuffer( GL_FRAMEBUFFER, 0 )
+    glPopAttrib()
+    if ( isinstance( pixel, str ) ):
+        pixel = np.fromstring( pixel, dtype=np.uint8 )
+    r, g, b = np.asarray( pixel, dtype=np.uint8 ).ravel()[:3]
+    return int( r ) | ( int( g ) << 8 ) | ( int( b ) << 16 )
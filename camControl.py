@@ -68,6 +68,32 @@ class CameraControl:
         '''
         self.camera.setSelectMat( selectPoint, self.VWIDTH, self.VHEIGHT, pickSize )
 
+    def pickRay( self, selectPoint ):
+        '''Computes the ray through the given point in screen space.
+
+        @param:     selectPoint     The point, in screen space, through which the ray passes.
+        @returns:   A 2-tuple of numpy arrays ( origin, direction ) (see GLCamera.pickRay).
+        '''
+        return self.camera.pickRay( selectPoint, self.VWIDTH, self.VHEIGHT )
+
+    def screenPoints( self, points ):
+        '''Projects points into screen space.
+
+        @param:     points          An Nx3 array of points.
+        @returns:   A 2-tuple of numpy arrays ( screen, valid ) (see GLCamera.screenPoints).
+        '''
+        return self.camera.screenPoints( points, self.VWIDTH, self.VHEIGHT )
+
+    def viewState( self ):
+        '''Reports a value which changes whenever the view changes (i.e., the
+        camera or the viewport size).
+
+        @returns:   A hashable value; equal values mean equal views.
+        '''
+        M = np.dot( self.camera.projectionMatrix( self.VWIDTH, self.VHEIGHT ),
+                    self.camera.viewMatrix() )
+        return ( self.VWIDTH, self.VHEIGHT, M.tostring() )
+
     def setSelectMatRegion( self, x0, y0, x1, y1 ):
         '''Given the selection point, computes the projection matrices for the
         selection matrix.
@@ -538,6 +538,96 @@ class GLCamera( Camera ):
             raise AttributeError, "Invalid projection type for GLCamera: {0}".format( self.projType )
         glMatrixMode( GL_MODELVIEW )
 
+    def projectionMatrix( self, w, h ):
+        '''Computes the projection matrix set by setProjection() (without any
+        pick matrix).
+
+        @param:     w       The viewport width (the dimension, in pixels, of the screen)
+        @param:     h       The viewport height (the dimension, in pixels, of the screen)
+        @returns:   A 4x4 numpy array.
+        '''
+        n = self.nearPlane
+        f = self.farPlane
+        P = np.zeros( ( 4, 4 ) )
+        if ( self.projType == GLCamera.PERSP ):
+            # gluPerspective
+            cot = 1.0 / np.tan( np.radians( self.fov ) * 0.5 )
+            P[0, 0] = cot * float( h ) / float( w )
+            P[1, 1] = cot
+            P[2, 2] = ( f + n ) / ( n - f )
+            P[2, 3] = 2.0 * f * n / ( n - f )
+            P[3, 2] = -1.0
+        elif ( self.projType == GLCamera.ORTHO ):
+            # glOrtho (symmetric)
+            halfW = self.oWidth * 0.5 * self.pixelScale
+            halfH = self.oHeight * 0.5 * self.pixelScale
+            P[0, 0] = 1.0 / halfW
+            P[1, 1] = 1.0 / halfH
+            P[2, 2] = -2.0 / ( f - n )
+            P[2, 3] = -( f + n ) / ( f - n )
+            P[3, 3] = 1.0
+        else:
+            raise AttributeError, "Invalid projection type for GLCamera: {0}".format( self.projType )
+        return P
+
+    def viewMatrix( self ):
+        '''Computes the view matrix set by setGLView().
+
+        @returns:   A 4x4 numpy array.
+        '''
+        # gluLookAt
+        f = self.facing.data / np.sqrt( np.dot( self.facing.data, self.facing.data ) )
+        s = np.cross( f, self.up.data )
+        s /= np.sqrt( np.dot( s, s ) )
+        u = np.cross( s, f )
+        V = np.identity( 4 )
+        V[0, :3] = s
+        V[1, :3] = u
+        V[2, :3] = -f
+        V[:3, 3] = -np.dot( V[:3, :3], self.pos.data )
+        return V
+
+    def pickRay( self, selectPoint, w, h ):
+        '''Computes the ray through the given point in screen space by
+        unprojecting it through the view and projection matrices.
+
+        @param:     selectPoint     The point, in screen space (origin in the upper-left corner).
+        @param:     w               The viewport width.
+        @param:     h               The viewport height.
+        @returns:   A 2-tuple of numpy arrays ( origin, direction ): the point on
+                    the near plane and the unit direction of the ray.
+        '''
+        x = 2.0 * selectPoint[0] / w - 1.0
+        y = 1.0 - 2.0 * selectPoint[1] / h
+        inverse = np.linalg.inv( np.dot( self.projectionMatrix( w, h ), self.viewMatrix() ) )
+        near = np.dot( inverse, ( x, y, -1.0, 1.0 ) )
+        far = np.dot( inverse, ( x, y, 1.0, 1.0 ) )
+        near = near[:3] / near[3]
+        far = far[:3] / far[3]
+        direction = far - near
+        return near, direction / np.sqrt( np.dot( direction, direction ) )
+
+    def screenPoints( self, points, w, h ):
+        '''Projects points into screen space (the inverse of pickRay()).
+
+        @param:     points      An Nx3 array of points.
+        @param:     w           The viewport width.
+        @param:     h           The viewport height.
+        @returns:   A 2-tuple of numpy arrays ( screen, valid ): the Nx2 points in
+                    screen space (origin in the upper-left corner) and, for each
+                    point, if it could be projected (i.e., it isn't behind a
+                    perspective camera).
+        '''
+        M = np.dot( self.projectionMatrix( w, h ), self.viewMatrix() )
+        clip = np.dot( points, M[:, :3].T ) + M[:, 3]
+        valid = clip[:, 3] > 0
+        with np.errstate( divide='ignore', invalid='ignore' ):
+            ndc = clip[:, :2] / clip[:, 3:]
+        screen = np.empty( ( points.shape[0], 2 ) )
+        screen[:, 0] = ( ndc[:, 0] + 1.0 ) * 0.5 * w
+        screen[:, 1] = ( 1.0 - ndc[:, 1] ) * 0.5 * h
+        return screen, valid
+
     def setGLView( self ):
         glLoadIdentity()
         tgt = self.pos + self.facing
@@ -0,0 +1,378 @@
+# Levels of detail for drawing large triangle meshes.
+#
+# A mesh is simplified into a sequence of levels, each with roughly a quarter of
+# the triangles of the previous one, by quadric edge collapse (Garland and
+# Heckbert): every vertex accumulates the planes of the triangles around it and
+# collapsing an edge costs the squared distance of the merged vertex to the
+# planes of both of its vertices.
+#
+# Rather than collapsing one edge at a time from a priority queue, edges are
+# collapsed in rounds. Each round selects among the cheaper half of the edges a
+# set of edges no triangle touches two of (in a few passes, each taking the
+# edges whose random priority beats every candidate around their vertices'
+# neighbors), so they are collapsed at once with array operations.
+# Collapses which would fold a triangle over or pinch the surface (the edge's
+# vertices have more than two common neighbors) are skipped.
+#
+# When drawing, the level is chosen by the number of pixels the mesh's bounding
+# box covers on screen: there is no point in drawing more triangles than
+# pixels. The levels can be cached on disk next to the mesh (see meshcache.py).
+#
+# No OpenGL dependencies.
+
+import numpy as np
+from scipy.sparse import csr_matrix
+import meshcache
+
+# Each level has (at most) this fraction of the previous level's triangles.
+LEVEL_RATIO = 0.25
+# Meshes are not simplified below this many triangles.
+MIN_TRIANGLES = 2000
+# The number of screen pixels per drawn triangle a level should provide.
+PIXELS_PER_TRIANGLE = 1.0
+# In each round of collapses, only the cheapest fraction of the edges are
+#   candidates.
+CANDIDATE_FRACTION = 0.5
+# The most passes made to select the edges collapsed in a round.
+SELECT_PASSES = 8
+# A collapse is skipped if it turns a triangle's normal by more than this
+#   (the cosine of the largest angle).
+FLIP_COS = 0.2
+# Increment whenever the simplification changes.
+LOD_VERSION = 1
+
+def triangleQuadrics( positions, triangles ):
+    '''Computes the quadric of each vertex: the sum of the squared distance
+    functions of the planes of its triangles, weighted by their areas.
+
+    @param  positions   A Vx3 array of vertex positions.
+    @param  triangles   A Tx3 int array of vertex indices.
+    @returns A Vx10 array: the unique entries of each vertex's symmetric 4x4
+    quadric (see quadricCost()).
+    '''
+    p0 = positions[ triangles[:, 0] ]
+    n = np.cross( positions[ triangles[:, 1] ] - p0, positions[ triangles[:, 2] ] - p0 )
+    double_area = np.sqrt( np.sum( n * n, axis=1 ) )
+    valid = double_area > 0
+    n[ valid ] /= double_area[ valid, np.newaxis ]
+    plane = np.column_stack( ( n, -np.sum( n * p0, axis=1 ) ) )
+    weight = 0.5 * double_area
+    V = positions.shape[0]
+    corners = triangles.ravel()
+    quadrics = np.empty( ( V, 10 ) )
+    for k, ( i, j ) in enumerate( zip( *np.triu_indices( 4 ) ) ):
+        quadrics[:, k] = np.bincount( corners, weights=np.repeat( weight * plane[:, i] * plane[:, j], 3 ),
+                                      minlength=V )
+    return quadrics
+
+def quadricCost( quadrics, points ):
+    '''Evaluates quadrics at points: p^T A p + 2 b.p + c for the quadric
+    [ [ A, b ], [ b^T, c ] ].
+
+    @param  quadrics    An Nx10 array of quadrics (see triangleQuadrics()).
+    @param  points      An Nx3 array of points.
+    @returns An (N,) array of costs.
+    '''
+    x, y, z = np.ascontiguousarray( points.T )
+    q = quadrics.T
+    return ( x * ( q[0] * x + 2 * ( q[1] * y + q[2] * z + q[3] ) ) +
+             y * ( q[4] * y + 2 * ( q[5] * z + q[6] ) ) +
+             z * ( q[7] * z + 2 * q[8] ) + q[9] )
+
+def collapsePoints( quadrics, p0, p1 ):
+    '''Finds the point which minimizes each quadric. Where the quadric has no
+    well-defined minimum (or its minimum is far from the edge), the best of
+    the edge's end points and midpoint is used.
+
+    @param  quadrics    An Nx10 array of edge quadrics.
+    @param  p0          An Nx3 array of the edges' first vertices.
+    @param  p1          An Nx3 array of the edges' second vertices.
+    @returns A 2-tuple ( points, costs ): an Nx3 array and an (N,) array.
+    '''
+    # The quadrics' columns are used separately; q.T is the quadrics, without
+    #   the column stride.
+    q = np.ascontiguousarray( quadrics.T )
+    # The minimum solves A p = -b; A is symmetric, so its inverse is its
+    #   adjugate over its determinant.
+    a00, a01, a02, b0, a11, a12, b1, a22, b2, c = q
+    adj00 = a11 * a22 - a12 * a12
+    adj01 = a02 * a12 - a01 * a22
+    adj02 = a01 * a12 - a02 * a11
+    adj11 = a00 * a22 - a02 * a02
+    adj12 = a01 * a02 - a00 * a12
+    adj22 = a00 * a11 - a01 * a01
+    det = a00 * adj00 + a01 * adj01 + a02 * adj02
+    scale = ( a00 + a11 + a22 ) / 3.0
+    solvable = np.abs( det ) > 1e-6 * np.abs( scale ) ** 3
+    det[ ~solvable ] = 1.0
+    optimal = np.column_stack( ( adj00 * b0 + adj01 * b1 + adj02 * b2,
+                                 adj01 * b0 + adj11 * b1 + adj12 * b2,
+                                 adj02 * b0 + adj12 * b1 + adj22 * b2 ) )
+    optimal /= -det[:, np.newaxis]
+    points = 0.5 * ( p0 + p1 )
+    # The minimum of a nearly singular quadric can be far away.
+    solvable &= np.sum( ( optimal - points ) ** 2, axis=1 ) <= np.sum( ( p1 - p0 ) ** 2, axis=1 )
+    points[ solvable ] = optimal[ solvable ]
+    costs = quadricCost( q.T, points )
+    if ( not np.all( solvable ) ):
+        fallback = ~solvable
+        for end in ( p0, p1 ):
+            end_costs = quadricCost( q.T, end )
+            better = fallback & ( end_costs < costs )
+            points[ better ] = end[ better ]
+            costs[ better ] = end_costs[ better ]
+    return points, costs
+
+def triangleNormals( positions, triangles ):
+    '''Computes the unit normals of triangles (zero for degenerate ones).
+
+    @param  positions   A Vx3 array of vertex positions.
+    @param  triangles   A Tx3 int array of (counter-clockwise) vertex indices.
+    @returns A Tx3 array of normals.
+    '''
+    p0 = positions[ triangles[:, 0] ]
+    normals = np.cross( positions[ triangles[:, 1] ] - p0, positions[ triangles[:, 2] ] - p0 )
+    lengths = np.sqrt( np.sum( normals * normals, axis=1 ) )
+    valid = lengths > 0
+    normals[ valid ] /= lengths[ valid, np.newaxis ]
+    return normals
+
+def meshEdges( triangles ):
+    '''Reports the edges of a closed, manifold triangle mesh.
+
+    @param  triangles       A Tx3 int array of (consistently oriented) vertex
+                            indices.
+    @returns An Ex2 int array of vertex indices (the smaller index first).
+    '''
+    # Each edge is shared by two triangles, in opposite directions; it is
+    #   reported by the triangle in which it runs from the smaller index.
+    pairs = np.concatenate( ( triangles[:, [ 0, 1 ] ], triangles[:, [ 1, 2 ] ], triangles[:, [ 2, 0 ] ] ) )
+    return pairs[ pairs[:, 0] < pairs[:, 1] ]
+
+def collapseRound( positions, triangles, quadrics, limit ):
+    '''Collapses a set of edges which don't share any triangles.
+
+    @param  positions   A Vx3 array of vertex positions. Modified in place.
+    @param  triangles   A Tx3 int array of vertex indices.
+    @param  quadrics    A Vx10 array of the vertices' quadrics. Modified in place.
+    @param  limit       The most edges to collapse.
+    @returns A 2-tuple ( triangles, collapsed ): the remaining triangles and
+    the number of edges collapsed.
+    '''
+    V = positions.shape[0]
+    edges = meshEdges( triangles )
+    u = edges[:, 0]
+    v = edges[:, 1]
+    edge_quadrics = np.take( quadrics, u, axis=0 ) + np.take( quadrics, v, axis=0 )
+    points, costs = collapsePoints( edge_quadrics, positions[ u ], positions[ v ] )
+
+    # The cheapest edges are candidates, each with a random (but reproducible)
+    #   unique key. A candidate is taken if its key is the smallest of the
+    #   candidates touching its vertices or their neighbors. Then the
+    #   candidates touching the taken edges' vertices or their neighbors are
+    #   removed (so no triangle touches two taken edges) and the remaining
+    #   candidates are considered again. (Keys ordered by cost would take
+    #   far fewer edges: costs vary smoothly over the surface.)
+    E = edges.shape[0]
+    cheapest = max( 1, int( E * CANDIDATE_FRACTION ) )
+    candidate = np.zeros( E, dtype=np.bool )
+    candidate[ np.argpartition( costs, cheapest - 1 )[ :cheapest ] ] = True
+    key = np.random.RandomState( E ).permutation( E )
+    # The edges (and the edges' other vertices) around each vertex, grouped by
+    #   vertex: a sparse adjacency matrix whose entries are edge indices.
+    adjacency = csr_matrix( ( np.concatenate( ( np.arange( E ), np.arange( E ) ) ),
+                              ( np.concatenate( ( u, v ) ), np.concatenate( ( v, u ) ) ) ), shape=( V, V ) )
+    around_edge = adjacency.data
+    around_other = adjacency.indices
+    degrees = np.diff( adjacency.indptr )
+    around_vertex = np.repeat( np.arange( V ), degrees )
+    vertices = np.flatnonzero( degrees )
+    starts = adjacency.indptr[ vertices ]
+    def vertexMin( values ):
+        '''The minimum of values over the edges around each vertex.'''
+        result = np.empty( V, dtype=values.dtype )
+        result.fill( E )
+        result[ vertices ] = np.minimum.reduceat( values, starts )
+        return result
+    taken = np.zeros( E, dtype=np.bool )
+    for i in xrange( SELECT_PASSES ):
+        if ( not np.any( candidate ) ):
+            break
+        near = vertexMin( np.where( candidate, key, E )[ around_edge ] )
+        ring = np.minimum( near, vertexMin( near[ around_other ] ) )
+        take = candidate & ( ring[ u ] == key ) & ( ring[ v ] == key )
+        taken |= take
+        # The taken edges' vertices and their neighbors.
+        blocked = np.zeros( V, dtype=np.bool )
+        blocked[ u[ take ] ] = blocked[ v[ take ] ] = True
+        blocked[ around_other[ blocked[ around_vertex ] ] ] = True
+        candidate &= ~( blocked[ u ] | blocked[ v ] )
+    chosen = np.flatnonzero( taken )
+
+    # Collapses which pinch the surface: the edge's vertices must share exactly
+    #   the two vertices opposite the edge.
+    adjacency.data = np.ones( 2 * E, dtype=np.int8 )
+    common = np.asarray( adjacency[ u[ chosen ] ].multiply( adjacency[ v[ chosen ] ] ).sum( axis=1 ) ).ravel()
+    chosen = chosen[ common == 2 ]
+
+    # Collapses which fold triangles over: the triangles with exactly one
+    #   vertex of a collapsed edge (those with both disappear) are moved.
+    edge_of = np.empty( V, dtype=np.int64 )
+    edge_of.fill( -1 )
+    edge_of[ u[ chosen ] ] = chosen
+    edge_of[ v[ chosen ] ] = chosen
+    corner_edges = edge_of[ triangles ]
+    moved = corner_edges >= 0
+    single = np.flatnonzero( np.sum( moved, axis=1 ) == 1 )
+    corner = np.argmax( moved[ single ], axis=1 )
+    corners = positions[ triangles[ single ] ]
+    old_normals = np.cross( corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0] )
+    edge = corner_edges[ single, corner ]
+    corners[ np.arange( single.size ), corner ] = points[ edge ]
+    new_normals = np.cross( corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0] )
+    dots = np.sum( old_normals * new_normals, axis=1 )
+    lengths = np.sqrt( np.sum( old_normals ** 2, axis=1 ) * np.sum( new_normals ** 2, axis=1 ) )
+    flipped = np.zeros( E, dtype=np.bool )
+    flipped[ edge[ dots <= FLIP_COS * lengths ] ] = True
+    chosen = chosen[ ~flipped[ chosen ] ]
+    if ( chosen.size > limit ):
+        chosen = chosen[ np.argsort( costs[ chosen ], kind='mergesort' )[ :limit ] ]
+
+    # Each edge collapses into its first vertex.
+    positions[ u[ chosen ] ] = points[ chosen ]
+    quadrics[ u[ chosen ] ] += quadrics[ v[ chosen ] ]
+    vertex_map = np.arange( V )
+    vertex_map[ v[ chosen ] ] = u[ chosen ]
+    triangles = vertex_map[ triangles ]
+    keep = ( ( triangles[:, 0] != triangles[:, 1] ) & ( triangles[:, 1] != triangles[:, 2] ) &
+             ( triangles[:, 2] != triangles[:, 0] ) )
+    return triangles[ keep ], chosen.size
+
+def simplify( positions, triangles, target, quadrics=None ):
+    '''Simplifies a closed triangle mesh by collapsing edges until it has at
+    most the target number of triangles (or no more edges can be collapsed).
+
+    @param  positions   A Vx3 array of vertex positions.
+    @param  triangles   A Tx3 int array of (counter-clockwise) vertex indices.
+    @param  target      The desired number of triangles.
+    @param  quadrics    The vertices' quadrics (see triangleQuadrics()); if
+                        None, they are computed from the triangles.
+    @returns A 3-tuple ( positions, triangles, quadrics ) of the simplified
+    mesh (whose vertices are all used).
+    '''
+    positions = np.array( positions, dtype=np.float64 )
+    triangles = np.asarray( triangles, dtype=np.int64 )
+    if ( quadrics is None ):
+        quadrics = triangleQuadrics( positions, triangles )
+    else:
+        quadrics = np.array( quadrics, dtype=np.float64 )
+    while ( triangles.shape[0] > target ):
+        # Each collapse removes (about) two triangles.
+        limit = max( 1, ( triangles.shape[0] - target + 1 ) // 2 )
+        triangles, collapsed = collapseRound( positions, triangles, quadrics, limit )
+        if ( collapsed == 0 ):
+            break
+    used = np.unique( triangles )
+    vertex_map = np.zeros( positions.shape[0], dtype=np.int64 )
+    vertex_map[ used ] = np.arange( used.size )
+    return positions[ used ], vertex_map[ triangles ], quadrics[ used ]
+
+def buildLevels( positions, triangles, ratio=LEVEL_RATIO, min_triangles=MIN_TRIANGLES ):
+    '''Builds the simplified levels of a mesh; each is simplified from the
+    previous one.
+
+    @param  positions       A Vx3 array of vertex positions.
+    @param  triangles       A Tx3 int array of vertex indices.
+    @param  ratio           The fraction of the previous level's triangles
+                            in each level.
+    @param  min_triangles   No level is simplified to fewer triangles.
+    @returns A list of 2-tuples ( positions, triangles ), from the most to the
+    least detailed, not including the mesh itself. Empty if the mesh has
+    fewer than min_triangles / ratio triangles.
+    '''
+    levels = []
+    quadrics = None
+    count = triangles.shape[0]
+    while ( count * ratio >= min_triangles ):
+        positions, triangles, quadrics = simplify( positions, triangles, int( count * ratio ), quadrics )
+        if ( triangles.shape[0] >= count ):
+            break
+        count = triangles.shape[0]
+        levels.append( ( positions, triangles ) )
+    return levels
+
+def cachedLevels( mesh_entry, positions, triangles ):
+    '''Builds the simplified levels of the mesh read from an obj file (see
+    buildLevels()). The levels are cached alongside the mesh's other cached
+    arrays (see meshcache.py).
+
+    @param  mesh_entry  The path to the mesh's cache entry (see
+                        meshcache.cachePath()); the file isn't hashed again.
+                        If None, the levels are always built and not cached.
+    @param  positions   A Vx3 array of the mesh's vertex positions.
+    @param  triangles   A Tx3 int array of the mesh's triangles.
+    @returns The list of levels (see buildLevels()).
+    '''
+    if ( triangles.shape[0] * LEVEL_RATIO < MIN_TRIANGLES ):
+        return []
+    if ( mesh_entry is None ):
+        return buildLevels( positions, triangles )
+    entry = '%s.lod%d' % ( mesh_entry, LOD_VERSION )
+    counts = meshcache.loadArrays( entry, ( 'level_count', ) )
+    if ( counts is not None ):
+        count = int( counts[ 'level_count' ][0] )
+        names = [ '%s%d' % ( name, i ) for i in xrange( count ) for name in ( 'positions', 'triangles' ) ]
+        arrays = meshcache.loadArrays( entry, names )
+        if ( arrays is not None ):
+            return [ ( arrays[ 'positions%d' % i ], arrays[ 'triangles%d' % i ] ) for i in xrange( count ) ]
+    levels = buildLevels( positions, triangles )
+    arrays = { 'level_count' : np.array( [ len( levels ) ] ) }
+    for i, ( level_positions, level_triangles ) in enumerate( levels ):
+        arrays[ 'positions%d' % i ] = level_positions
+        arrays[ 'triangles%d' % i ] = level_triangles
+    meshcache.saveArrays( entry, arrays )
+    return levels
+
+def projectedBoxArea( box_min, box_max, modelview, projection, viewport ):
+    '''Estimates the number of pixels a bounding box covers on screen: the
+    area of the screen-space rectangle bounding its projected corners, clipped
+    to the viewport. A box which reaches behind the camera covers the whole
+    viewport.
+
+    @param  box_min     The minimum corner of the box (a length-3 array).
+    @param  box_max     The maximum corner of the box (a length-3 array).
+    @param  modelview   The 4x4 model-view matrix (as returned by OpenGL, i.e.,
+                        column major).
+    @param  projection  The 4x4 projection matrix (as returned by OpenGL).
+    @param  viewport    The viewport ( x, y, width, height ).
+    @returns The area (in pixels).
+    '''
+    x, y, width, height = viewport
+    # Bit j of corner i selects the maximum of axis j.
+    corners = np.ones( ( 8, 4 ) )
+    corners[:, :3] = np.where( ( np.arange( 8 )[:, np.newaxis] >> np.arange( 3 ) ) & 1, box_max, box_min )
+    clip = np.dot( np.dot( corners, np.asarray( modelview ) ), np.asarray( projection ) )
+    if ( np.any( clip[:, 3] <= 0 ) ):
+        return float( width * height )
+    ndc = clip[:, :2] / clip[:, 3:]
+    lo = np.clip( ndc.min( axis=0 ), -1.0, 1.0 )
+    hi = np.clip( ndc.max( axis=0 ), -1.0, 1.0 )
+    return float( ( hi[0] - lo[0] ) * 0.5 * width * ( hi[1] - lo[1] ) * 0.5 * height )
+
+def selectLevel( triangle_counts, pixels, pixels_per_triangle=PIXELS_PER_TRIANGLE ):
+    '''Selects the least detailed level which still provides a triangle for
+    every pixels_per_triangle pixels.
+
+    @param  triangle_counts The number of triangles of each level, from the
+                            most to the least detailed.
+    @param  pixels          The number of pixels the mesh covers (see
+                            projectedBoxArea()).
+    @param  pixels_per_triangle The screen area (in pixels) per triangle.
+    @returns The index of the level.
+    '''
+    needed = pixels / pixels_per_triangle
+    level = 0
+    for i, count in enumerate( triangle_counts ):
+        if ( count >= needed ):
+            level = i
+    return level
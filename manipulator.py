@@ -6,49 +6,15 @@ from node import unionBB
 from OpenGL.GL import *
 from OpenGL.GLU import gluProject
 import numpy as np
-from scipy.spatial import HalfspaceIntersection, ConvexHull
+import offset
+import offset_worker
+import vbo
+import timing
 import mouse
 from numpy import pi, tan
 import sys
 import itertools
 
-def basisFromZ(z_axis):
-    '''Creates an orthonormal basis from the z_axis.
-
-    @param z_axis   A numpy array of shape (3,). Assumed to be unit length.
-                    This will serve as the z-axis (third column) of the basis.
-    @returns A (3, 3) matrix.
-    '''
-    small_axis = np.argmin(np.abs(z_axis))
-    axes = [ [1, 0, 0], [0, 1, 0], [0, 0, 1]]
-    perp_axis = np.array(axes[small_axis])
-    x_axis = np.cross(z_axis, perp_axis)
-    x_axis /= np.sqrt(np.sum(np.dot(x_axis, x_axis)))
-    y_axis = np.cross(z_axis, x_axis)
-    return np.column_stack((x_axis, y_axis, z_axis))
-
-def orderVertices(vert_idx, normal, vertex_data):
-    '''Given a list of vertex indices, a plane normal, and vertex data,
-    orders the indexed vertices in a counter-clockwise order.
-    Assumes that all:
-        1. indexed vertices are part of the convex hull.
-        2. The points are all lie on a plane perpendicular to the given
-            normal.
-
-    @param  vert_idx    A list of indices in the range [0, N)
-    @param  normal      An (3,) array of floats -- the normal to a plane.
-    @param  vertex-data A (N, 3) array of floats -- the vertex data. One per row.
-    @returns A list of indices, ordered in counter-clockwise direction (relative
-    to the provided normal.
-    '''
-    basis = basisFromZ(normal)
-    face_verts = vertex_data[vert_idx, :]  # (M, 3) matrix, vertex per row
-    origin = face_verts[:1, :]
-    local = face_verts - origin
-    on_plane = np.dot(local, basis[:, :2])
-    hull = ConvexHull(on_plane)
-    return [vert_idx[i] for i in hull.vertices ]
-
 def distSqToSegment( p0, p1, q ):
     '''Determines the distance between q and the segment defined by p0 and p1.
 
@@ -72,122 +38,86 @@ def distSqToSegment( p0, p1, q ):
         return disp.lengthSq()
 
 
-    
-class SimpleMesh:
-    def __init__( self, vertices, faces, normals ):
-        '''Constructor
-        @param vertices An nx3 numpy array of vertex locations.
-        @param faces a list of lists of indexes -- indices into the faces in counter clockwise order.
-        @param normals: A 3XF array of normals (where there are F faces.
-        '''
-        self.vertices = vertices
-        self.faces = faces
-        self.normals = normals
-
-    def drawGL( self ):
-        for f_idx, face in enumerate( self.faces ):
-            if not face: continue
-            v_count = len(face)
-            if ( v_count == 3 ):
-                glBegin(GL_TRIANGLES)
-                glNormal3fv( self.normals[:, f_idx] )
-                glVertex3fv( self.vertices[ face[0], : ] )
-                glVertex3fv( self.vertices[ face[1], : ] )
-                glVertex3fv( self.vertices[ face[2], : ] )
-                glEnd()
-            elif ( v_count == 4 ):
-                glBegin(GL_QUADS)
-                glNormal3fv( self.normals[:, f_idx] )
-                glVertex3fv( self.vertices[ face[0], : ] )
-                glVertex3fv( self.vertices[ face[1], : ] )
-                glVertex3fv( self.vertices[ face[2], : ] )
-                glVertex3fv( self.vertices[ face[3], : ] )
-                glEnd()
-            else:
-                glBegin(GL_POLYGON)
-                glNormal3fv( self.normals[:, f_idx] )
-                for v_idx in face:
-                    glVertex3fv( self.vertices[ v_idx, : ] )
-                glEnd()
-
-class OffsetSurface( object ):
-    '''Definition of an offset surface from a polygonal object'''
-    # TODO: Document how this works.
-    class Face:
-        def __init__( self, id ):
-            self.id = id
-            self.vertices = []
-
-        def __str__( self ):
-            return 'F(%d) - %s' % ( self.id, self.vertices )
-    
-    def __init__( self, mesh ):
-        '''Ctor.
-        Initialize the surface from a watertight mesh instance..
-        '''
-        self.mesh = mesh
+def pointInPolygon( q, polygon ):
+    '''Determines if the point q lies inside the polygon (by the even-odd rule).
+
+    @param:     q           The query point (an x-y pair).
+    @param:     polygon     An Nx2 array of the polygon's vertices (in order).
+    @returns:   True if q is inside the polygon.
+    '''
+    x, y = q
+    p0 = polygon
+    p1 = np.roll( polygon, -1, axis=0 )
+    # The polygon edges which cross the horizontal line through q and where.
+    crossing = ( p0[:, 1] > y ) != ( p1[:, 1] > y )
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        xCross = p0[:, 0] + ( y - p0[:, 1] ) * ( p1[:, 0] - p0[:, 0] ) / ( p1[:, 1] - p0[:, 1] )
+    return bool( np.count_nonzero( crossing & ( x < xCross ) ) % 2 )
+
+class HoverPicker( object ):
+    '''Schedules the picking of the face under the mouse. A mouse move only
+    records the point to pick; the pick is done later (once the pending events
+    have been handled, see OffsetManipulator.processDeferred), so all of the
+    moves between two picks cost a single pick.
+
+    The screen-space polygon (the "footprint") of the last picked face is
+    cached. As long as the view and the hull are unchanged and the mouse stays
+    inside the footprint, no pick is needed at all.'''
+    def __init__( self ):
+        # The screen-space point waiting to be picked.
+        self.pending = None
+        # The footprint: the face, its Nx2 screen-space polygon and the view
+        #   state (see CameraControl.viewState) and hull it was computed for.
+        self.face = -1
+        self.polygon = None
+        self.view = None
         self.hull = None
-        self.deltas = np.zeros( (mesh.face_count(),), dtype=np.float )
-        self.planes = np.zeros( (mesh.face_count(), 4), dtype=np.float )
-        self.feasible_point = np.mean( mesh.vertex_pos, axis=1 )[:3]
-
-        self.vertices = self.mesh.vertex_pos[:3, :].T
-
-        # this is necessary to get an index *back* from a face for OpenGL
-        # selection.
-        self.faces = []
-        for f_idx, mesh_face in enumerate( mesh.faces ):
-            self.planes[f_idx, :3] = self.normals[:, f_idx].T
-            point = self.vertices[ mesh_face.vertices[0] ]
-            d = -np.dot(self.normals[:, f_idx], point)
-            self.planes[f_idx, 3] = d
-            
-            face_vertices = []
-            f = self.Face( f_idx )
-            f.vertices = mesh_face.vertices
-            self.faces.append( f )
 
-    normals = property( lambda self: self.mesh.face_normals )
+    def clear( self ):
+        '''Forgets the pending point and the footprint.'''
+        self.pending = None
+        self.polygon = self.view = self.hull = None
+        self.face = -1
 
-    def get_face_centroid( self, face_index, with_offset=False ):
-        '''Computes the centroid of the given face.'''
-        face = self.faces[ face_index ]
-        offset = np.zeros_like(self.normals[:, face_index])
-        if (with_offset):
-            offset = self.normals[:, face_index] * self.deltas[face_index]
-        pos = np.mean(self.vertices[face.vertices, :] + offset, axis=0)
-        return pos
-            
-    def set_offset( self, offset, face_index ):
-        '''Sets the offset value of one or all faces.
-        @param  offset      The offset value. Must be a float >= 0.0.
-        @param  face_index  If < 0, sets *all* faces, otherwise a valid index sets
-                            the single, indexed face.
+    def set_footprint( self, face, polygon, view, hull ):
+        '''Sets the footprint of the picked face.
+
+        @param:     face        The index of the picked face (-1 for none).
+        @param:     polygon     The Nx2 screen-space polygon of the face; None
+                                if it is unknown.
+        @param:     view        The view state the polygon was computed in.
+        @param:     hull        The hull the polygon was computed for.
         '''
-        if ( offset < 0 ): offset = 0.0
-        if ( face_index < 0 ):
-            self.deltas[ : ] = offset
-        else:
-            self.deltas[ face_index ] = offset
-        temp_planes = self.planes.copy()
-        temp_planes[:, 3] -= self.deltas
-        hs = HalfspaceIntersection( temp_planes, self.feasible_point )
-        verts = hs.intersections  # (N, 3) shape -- each row is a vertex
-        # TODO: Due to numerical imprecision, I can end up with vertices in verts that are
-        # *almost* the same (and *should* be the same. I should go through and merge them.
-        # Implications:
-        #   
-        faces = []
-        for i, f in enumerate( self.faces ):
-            d = temp_planes[i, 3]   # the const for the ith plane
-            n = self.normals[:, i]  # The norm for the ith plane, (3,) shape
-            dist = np.dot(verts, n ) + d  # (N, 3) * (3,) -> (N,)
-            indices = np.where( np.abs( dist ) < 1e-6 )[ 0 ] # (M,) matrix
-            if (list(indices)):
-                faces.append( orderVertices(list(indices), n, verts) )
-            else:
-                faces.append([])
-        self.hull = SimpleMesh( verts, faces, self.normals )
+        self.face = face
+        self.polygon = polygon
+        self.view = view
+        self.hull = hull
+
+    def covers( self, q, view, hull ):
+        '''Reports if the footprint is known to still hold the point.
+
+        @param:     q           The screen-space point (an x-y pair).
+        @param:     view        The current view state.
+        @param:     hull        The current hull.
+        @returns:   True if picking q would find the cached face.
+        '''
+        return ( self.polygon is not None and hull is self.hull and view == self.view and
+                 pointInPolygon( q, self.polygon ) )
+
+class OffsetSurface( offset.OffsetSurface ):
+    '''An offset surface which can be drawn and selected in OpenGL.'''
+    def __init__( self, mesh, **kwargs ):
+        offset.OffsetSurface.__init__( self, mesh, **kwargs )
+        # The hull's triangles. The hull changes with every drag step, so a
+        #   single buffer is reused for all of them.
+        self.hull_buffer = vbo.DynamicTriangleBuffer()
+        # The hull whose triangles are in the buffer.
+        self._buffered_hull = None
+        # The offset faces drawn in id colors for picking (see pick_faces()).
+        #   The face of each triangle is fixed; the positions follow the deltas.
+        self.pick_buffer = vbo.PickBuffer( idColors( np.repeat( self._fan[1] + 1, 3 ) ) )
+        # The cache key of the deltas whose positions are in the pick buffer.
+        self._picked_key = None
 
     def draw_offset_face( self, face_index ):
         face = self.faces[ face_index ]
@@ -235,6 +165,15 @@ class OffsetSurface( object ):
         for f, face in enumerate(self.faces):
             glLoadName( face.id + 1 )
             self.draw_offset_face( f )
+
+    def pick_faces( self ):
+        '''Renders the offset faces for color-id picking; the id of a face is
+        its index plus one (as in select_face()).'''
+        if ( self._cache_key is None or self._cache_key != self._picked_key ):
+            positions, faces = self.offset_triangles()
+            self.pick_buffer.set_positions( positions.reshape( -1, 3 ).astype( np.float32 ) )
+            self._picked_key = self._cache_key
+        self.pick_buffer.drawGL()
     
     def drawGL( self, hover_index, select ):
         '''Simply draws the mesh to the viewer'''
@@ -242,14 +181,41 @@ class OffsetSurface( object ):
             self.select_face()
         else:
             if ( self.hull ):
-                self.hull.drawGL()
+                if ( self.hull is not self._buffered_hull ):
+                    self.hull_buffer.set_triangles( *vbo.meshCorners( self.hull.vertices, self.hull.normals,
+                                                                      self.hull.triangles(),
+                                                                      self.hull.vertex_normals ) )
+                    self._buffered_hull = self.hull
+                self.hull_buffer.drawGL()
             self.draw_normal( hover_index )
     
 class OffsetManipulator( SelectContext ):
     '''A manipulator for editing the offset surface.'''
-    def __init__( self ):
+    def __init__( self, ray_pick=False, mode=offset.OffsetSurface.MITERED, background=True,
+                  skeleton=False ):
+        '''Constructor.
+
+        @param:     ray_pick        If True, hovered faces are found by casting a ray
+                                    on the CPU (see OffsetSurface.pick_ray), otherwise
+                                    by color-id picking in OpenGL.
+        @param:     mode            The offset mode (see OffsetSurface.set_mode).
+        @param:     background      If True, the offset surface is computed in a
+                                    background thread (see offset_worker.py); the last
+                                    computed surface is drawn until the next one is
+                                    ready.
+        @param:     skeleton        If True, the uniform offsets of each object are
+                                    precomputed (see OffsetSurface.build_skeleton).
+        '''
         SelectContext.__init__( self )
+        self.ray_pick = ray_pick
+        self.mode = mode
+        self.background = background
+        self.skeleton = skeleton
+        self.hover = HoverPicker()
         self.offset_surface = None
+        # Computes the offset surface in the background (None if it is
+        #   computed in the GUI thread).
+        self.worker = None
         self.dragging = False
         self.mouseDown = None  # screen coords of mouse at button press
         self.delta_cache = None
@@ -257,14 +223,77 @@ class OffsetManipulator( SelectContext ):
 
     def set_object( self, mesh_node ):
         '''Sets the underlying object that this manipulator operates on.'''
+        self.clear_object()
         self.offset_surface = OffsetSurface( mesh_node )
+        self.offset_surface.set_mode( self.mode )
+        if ( self.skeleton ):
+            self.offset_surface.build_skeleton()
     
         self.hover_index = -1
-        self.offset_surface.set_offset(0.0, -1)
+        self.hover.clear()
+        if ( self.background ):
+            # The initial surface is waited for.
+            self.worker = offset_worker.OffsetWorker( self.offset_surface )
+            self.worker.set_offset( 0.0, -1 )
+            self.worker.wait()
+            self.worker.poll()
+        else:
+            self.offset_surface.set_offset(0.0, -1)
         
+    def set_mode( self, mode ):
+        '''Sets the offset mode of the surface (see OffsetSurface.set_mode). When
+        computing in the background, the new surface is polled for by
+        processDeferred().'''
+        self.mode = mode
+        if ( self.offset_surface ):
+            if ( self.worker ):
+                self.offset_surface.set_mode( mode, recompute=False )
+                self.worker.request()
+            else:
+                self.offset_surface.set_mode( mode )
+            self.hover.clear()
+
+    def set_background( self, background ):
+        '''Sets whether the offset surface is computed in a background thread.'''
+        self.background = background
+        if ( self.offset_surface ):
+            if ( background and not self.worker ):
+                self.worker = offset_worker.OffsetWorker( self.offset_surface )
+                self.worker.request()
+            elif ( not background and self.worker ):
+                self.worker.stop()
+                self.worker = None
+                # The surface's own polytope is out of date.
+                self.offset_surface.set_offsets( self.offset_surface.deltas.copy() )
+                self.hover.clear()
+
+    def set_skeleton( self, skeleton ):
+        '''Sets whether the uniform offsets are precomputed (see
+        OffsetSurface.build_skeleton), so that shift-dragging doesn't compute a
+        polytope.'''
+        self.skeleton = skeleton
+        if ( self.offset_surface ):
+            if ( skeleton ):
+                self.offset_surface.build_skeleton()
+            else:
+                self.offset_surface.skeleton = None
+
+    def set_offset( self, offset, face_index ):
+        '''Sets the offset value of one or all faces (see
+        OffsetSurface.set_offset), computing the surface in the background if
+        enabled.'''
+        if ( self.worker ):
+            self.worker.set_offset( offset, face_index )
+        else:
+            self.offset_surface.set_offset( offset, face_index )
+
     def clear_object( self ):
         '''Clears the underlying object'''
+        if ( self.worker ):
+            self.worker.stop()
+            self.worker = None
         self.offset_surface = None
+        self.hover.clear()
 
     def draw3DGL( self, camControl, select=False ):
         '''Draws the 3D UI elements to the view.
@@ -272,7 +301,9 @@ class OffsetManipulator( SelectContext ):
         @param:     camControl      The scene's camera control
         @param:     select          Indicator if this draw call is made for selection purposes
         '''
-        if ( self.offset_surface ):
+        if ( self.offset_surface and select == SelectState.PICK ):
+            self.offset_surface.pick_faces()
+        elif ( self.offset_surface ):
             glPushAttrib( GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT )
             if ( not select ):
                 glDisable(GL_BLEND)
@@ -373,25 +404,78 @@ class OffsetManipulator( SelectContext ):
                 new_delta = self.delta_value + delta_delta
                 new_delta = np.clip( new_delta, 0, np.infty )
                 if ( not hasShift):
-                    self.offset_surface.set_offset(new_delta, self.hover_index)
+                    self.set_offset(new_delta, self.hover_index)
                 else:
-                    self.offset_surface.set_offset(new_delta, -1)
+                    self.set_offset(new_delta, -1)
                 result.set(True, True, False)
+                # The computed surface is polled for.
+                result.hasDeferred = self.worker is not None
             else:
-                new_index = -1
-                selected = self.selectSingle( None, camControl,
-                                              (event.x(), event.y()) )
-                if ( len( selected ) ):
-                    new_index = selected.pop() - 1
+                point = ( event.x(), event.y() )
+                if ( self.hover.covers( point, camControl.viewState(), self.offset_surface.hull ) ):
+                    self.hover.pending = None
                 else:
-                    new_index = -1
-                
-                redraw = False
-                if ( new_index != self.hover_index ):
-                    redraw = True
-                    self.hover_index = new_index
-                result.set( True, redraw, False )
+                    self.hover.pending = point
+                    result.hasDeferred = True
+                result.set( True, False, False )
         return result
+
+    def processDeferred( self, camControl, scene ):
+        '''Picks up the surface computed in the background (if it is ready) and
+        picks the face under the last mouse position (see HoverPicker).
+
+        @param:     camControl  The scene's camera control.
+        @param:     scene       The scene.
+        @returns:   An instance of EventReport.
+        '''
+        result = EventReport()
+        if ( self.worker ):
+            if ( self.worker.poll() ):
+                result.set( True, True, False )
+            # Until the latest surface is ready, it is polled for.
+            result.hasDeferred = self.worker.busy()
+        point = self.hover.pending
+        if ( self.offset_surface and not self.dragging and point is not None ):
+            self.hover.pending = None
+            new_index = self.pick_face( camControl, point )
+            polygon = None
+            if ( new_index > -1 ):
+                polygon, valid = camControl.screenPoints( self.face_polygon( new_index ) )
+                if ( polygon.shape[0] < 3 or not np.all( valid ) ):
+                    polygon = None
+            self.hover.set_footprint( new_index, polygon, camControl.viewState(),
+                                      self.offset_surface.hull )
+            result.set( True, result.needsRedraw or new_index != self.hover_index, False )
+            self.hover_index = new_index
+        return result
+
+    def pick_face( self, camControl, point ):
+        '''Picks the face under the given screen-space point.
+
+        @param:     camControl  The scene's camera control.
+        @param:     point       The screen-space point.
+        @returns:   The index of the face (-1 if there is none).
+        '''
+        with timing.stage( 'pick' ):
+            if ( self.ray_pick ):
+                origin, direction = camControl.pickRay( point )
+                return self.offset_surface.pick_ray( origin, direction )
+            else:
+                return self.pickSingle( camControl, point ) - 1
+
+    def face_polygon( self, face_index ):
+        '''Reports the polygon which pick_face() finds for the given face: the
+        hull's face when casting rays at a convex mesh, otherwise the offset
+        face. Offset faces can overlap where they stick out of the hull; there,
+        the hovered face is kept until the mouse leaves it.
+
+        @param:     face_index  The index of the face.
+        @returns:   An Nx3 array of the polygon's vertices.
+        '''
+        if ( self.ray_pick and self.offset_surface.convex ):
+            return self.offset_surface.hull_face_polygon( face_index )
+        else:
+            return self.offset_surface.offset_face_polygon( face_index )
         
 class MoveManipulator( SelectContext ):
     '''A manipulator for moving objects in the scene.'''
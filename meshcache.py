@@ -0,0 +1,100 @@
+# An on-disk cache of mesh data computed from obj files.
+#
+# Parsing a large obj file and computing its topology dominates the time it
+# takes to open it. The resulting arrays are saved, as .npy files, in a
+# directory keyed by a hash of the obj file's contents and the cache version.
+# Re-opening the file memory-maps the arrays instead.
+#
+# By default, the cache lives in a .meshcache directory next to the obj file.
+# Entries are never invalidated (a changed file simply has a new hash); stale
+# entries can be removed by deleting the directory.
+
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import numpy as np
+
+# Increment whenever the cached arrays change in content or meaning.
+CACHE_VERSION = 1
+
+# The name of the default cache directory (created next to the obj file).
+CACHE_DIR_NAME = '.meshcache'
+
+def fileHash( fileName ):
+    '''Computes the hash of a file's contents.
+
+    @param  fileName    The path to the file.
+    @returns The hex digest of the file's contents (a string).
+    '''
+    digest = hashlib.sha1()
+    with open( fileName, 'rb' ) as f:
+        while ( True ):
+            block = f.read( 1 << 20 )
+            if ( not block ):
+                break
+            digest.update( block )
+    return digest.hexdigest()
+
+def cachePath( fileName, cacheDir=None ):
+    '''Reports the path of the cache entry for the given file.
+
+    @param  fileName    The path to the source file.
+    @param  cacheDir    The cache directory. If None, a .meshcache directory
+                        next to the source file is used.
+    @returns The path to the entry's directory (which may not exist).
+    '''
+    if ( cacheDir is None ):
+        cacheDir = os.path.join( os.path.dirname( os.path.abspath( fileName ) ), CACHE_DIR_NAME )
+    return os.path.join( cacheDir, '%s.v%d' % ( fileHash( fileName ), CACHE_VERSION ) )
+
+def loadArrays( entry, names ):
+    '''Loads the named arrays from a cache entry. The arrays are memory-mapped
+    (read-only).
+
+    @param  entry       The path to the cache entry (see cachePath()).
+    @param  names       The names of the arrays to load.
+    @returns A dictionary mapping name to array or None if the entry doesn't
+    exist or is incomplete.
+    '''
+    arrays = {}
+    for name in names:
+        path = os.path.join( entry, name + '.npy' )
+        if ( not os.path.isfile( path ) ):
+            return None
+        try:
+            arrays[ name ] = np.load( path, mmap_mode='r' )
+        except ValueError:
+            # Empty arrays can't be memory-mapped.
+            arrays[ name ] = np.load( path )
+    return arrays
+
+def saveArrays( entry, arrays ):
+    '''Saves the arrays as a cache entry. The entry is written to a temporary
+    directory and then moved into place, so a partially written entry is never
+    visible (e.g., to other processes reading the same file). Failures to write
+    the cache are ignored; the cache is only an optimization.
+
+    @param  entry       The path to the cache entry (see cachePath()).
+    @param  arrays      A dictionary mapping name to array.
+    @returns True if the entry was written.
+    '''
+    temp = None
+    try:
+        parent = os.path.dirname( entry )
+        if ( not os.path.isdir( parent ) ):
+            os.makedirs( parent )
+        temp = tempfile.mkdtemp( dir=parent )
+        for name, array in arrays.iteritems():
+            np.save( os.path.join( temp, name + '.npy' ), np.ascontiguousarray( array ) )
+        # mkdtemp() makes the directory private; the entry gets the permissions
+        #   of the cache directory, so whoever can read the cache can read it.
+        os.chmod( temp, stat.S_IMODE( os.stat( parent ).st_mode ) )
+        os.rename( temp, entry )
+        return True
+    except ( IOError, OSError ):
+        # Either unwritable or another process wrote the entry first.
+        if ( temp is not None ):
+            shutil.rmtree( temp, ignore_errors=True )
+        return False
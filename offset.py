@@ -0,0 +1,820 @@
+# The offset surface of a convex polytope, computed without any OpenGL
+# dependencies. The interactive tool (manipulator.py) extends these classes
+# with drawing; this module can be used directly by scripts (see offset_batch.py).
+
+import bisect
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+import numpy as np
+from polytope import HalfspacePolytope, PLANE_TOLERANCE, collapseEdges, faceEdges
+from raypick import rayConvex, TriangleBVH
+from rounded import roundedSurface, ROUND_ANGLE
+import timing
+from watertight import WatertightMesh, fanTriangles
+
+def offsetSurfaceFromObj( fileName ):
+    '''Creates an offset surface (with zero offset) for the polytope in an obj file.
+
+    @param  fileName    The path to a valid obj file. It must define a
+                        watertight, convex polytope.
+    @returns An instance of OffsetSurface.
+    '''
+    mesh = WatertightMesh()
+    mesh.from_obj_file( fileName )
+    surface = OffsetSurface( mesh )
+    surface.set_offset( 0.0, -1 )
+    return surface
+
+class SimpleMesh( object ):
+    def __init__( self, vertices, faces, normals ):
+        '''Constructor
+        @param vertices An nx3 numpy array of vertex locations.
+        @param faces a list of lists of indexes -- indices into the faces in counter clockwise order.
+        @param normals: A 3XF array of normals (where there are F faces.
+        '''
+        self.vertices = vertices
+        self.faces = faces
+        self.normals = normals
+        # The normal at each vertex (an nx3 array) of a smooth mesh; None if
+        #   the faces are flat shaded.
+        self.vertex_normals = None
+        # The fan triangulation of the faces (see triangles()).
+        self._triangles = None
+
+    def face_count( self ):
+        '''Reports the number of non-empty faces'''
+        return sum( 1 for face in self.faces if face )
+
+    def vertex_count( self ):
+        '''Reports the number of vertices'''
+        return self.vertices.shape[0]
+
+    def triangles( self ):
+        '''Triangulates the faces (see watertight.fanTriangles). The result is
+        computed once; the mesh is never modified.
+
+        @returns A 3-tuple of arrays ( vertices, faces, edge_flags ): the Tx3
+        vertex indices of the triangles, the face of each triangle and the Tx3
+        edge flags.
+        '''
+        if ( self._triangles is None ):
+            sizes = np.fromiter( ( len( face ) for face in self.faces ), dtype=np.int64,
+                                 count=len( self.faces ) )
+            offsets = np.concatenate( ( [ 0 ], np.cumsum( sizes ) ) )
+            indices = np.fromiter( itertools.chain.from_iterable( self.faces ), dtype=np.int64,
+                                   count=offsets[-1] )
+            corners, faces, edge_flags = fanTriangles( offsets )
+            self._triangles = ( indices[ corners ], faces, edge_flags )
+        return self._triangles
+
+    def volume( self ):
+        '''Computes the volume enclosed by the mesh. The faces are fan
+        triangulated and the signed volumes of the tetrahedra they form with
+        the origin are summed.'''
+        tris = self.triangles()[0]
+        if ( not tris.size ):
+            return 0.0
+        corners = self.vertices[ tris ]   # (T, 3, 3)
+        dets = np.sum( corners[:, 0] * np.cross( corners[:, 1], corners[:, 2] ), axis=1 )
+        return np.sum( dets ) / 6.0
+
+    def writeOBJ( self, outfile ):
+        '''Writes the mesh to the file object in obj format. Empty faces are
+        omitted and each face uses its normal.'''
+        outfile.write( "# Offset surface -- %d vertices, %d faces\n" % ( self.vertex_count(), self.face_count() ) )
+        for v in self.vertices:
+            outfile.write( "v %.9g %.9g %.9g\n" % ( v[0], v[1], v[2] ) )
+        normal_index = 0
+        for f_idx, face in enumerate( self.faces ):
+            if not face: continue
+            n = self.normals[:, f_idx]
+            normal_index += 1
+            outfile.write( "vn %.9g %.9g %.9g\n" % ( n[0], n[1], n[2] ) )
+            outfile.write( "f %s\n" % ' '.join( '%d//%d' % ( v + 1, normal_index ) for v in face ) )
+
+class RoundedMesh( SimpleMesh ):
+    '''The rounded offset of a convex polytope (see rounded.py): its faces,
+    translated along their normals, joined by cylinders along its edges and
+    spheres around its vertices. The faces are those of a SimpleMesh; the
+    cylinders and spheres are triangles which belong to no face.'''
+    def __init__( self, vertices, faces, normals, vertex_normals, patches, patch_flags ):
+        '''Constructor
+
+        @param  vertices        An nx3 numpy array of vertex locations.
+        @param  faces           A list of lists of vertex indices: the translated
+                                faces in counter clockwise order.
+        @param  normals         A 3xF array of the faces' normals.
+        @param  vertex_normals  An nx3 array of the surface's normal at each vertex.
+        @param  patches         A Tx3 int array of the cylinders' and spheres'
+                                triangles.
+        @param  patch_flags     A Tx3 bool array of the triangles' edge flags.
+        '''
+        SimpleMesh.__init__( self, vertices, faces, normals )
+        self.vertex_normals = vertex_normals
+        self.patches = patches
+        self.patch_flags = patch_flags
+
+    def face_count( self ):
+        '''Reports the number of non-empty faces and patch triangles'''
+        return SimpleMesh.face_count( self ) + self.patches.shape[0]
+
+    def triangles( self ):
+        '''Triangulates the faces (see SimpleMesh.triangles()) and appends the
+        patch triangles, whose face is -1.'''
+        if ( self._triangles is None ):
+            tri_vertices, faces, edge_flags = SimpleMesh.triangles( self )
+            patch_faces = np.empty( self.patches.shape[0], dtype=np.int64 )
+            patch_faces.fill( -1 )
+            self._triangles = ( np.concatenate( ( tri_vertices, self.patches ) ),
+                                np.concatenate( ( faces, patch_faces ) ),
+                                np.concatenate( ( edge_flags, self.patch_flags ) ) )
+        return self._triangles
+
+    def byte_size( self ):
+        '''Estimates the memory used by the mesh's data (in bytes).'''
+        index_count = sum( len( f ) for f in self.faces )
+        return ( self.vertices.nbytes + self.vertex_normals.nbytes + self.patches.nbytes +
+                 self.patch_flags.nbytes + 72 * len( self.faces ) + 32 * index_count )
+
+    def writeOBJ( self, outfile ):
+        '''Writes the mesh to the file object in obj format. Every vertex has
+        its own normal; the faces are followed by the patch triangles.'''
+        outfile.write( "# Rounded offset surface -- %d vertices, %d faces\n" % ( self.vertex_count(), self.face_count() ) )
+        for v in self.vertices:
+            outfile.write( "v %.9g %.9g %.9g\n" % ( v[0], v[1], v[2] ) )
+        for n in self.vertex_normals:
+            outfile.write( "vn %.9g %.9g %.9g\n" % ( n[0], n[1], n[2] ) )
+        for face in itertools.chain( self.faces, self.patches.tolist() ):
+            if not face: continue
+            outfile.write( "f %s\n" % ' '.join( '%d//%d' % ( v + 1, v + 1 ) for v in face ) )
+
+class HullCache( object ):
+    '''A least-recently-used cache of offset surface results, keyed by the
+    offset values. The offsets are quantized before being hashed, so offsets
+    which differ by less than the quantum share a cache entry.
+
+    The cache holds entries up to a memory budget; when it is exceeded, the
+    least recently used entries are discarded. It can be shared by surfaces
+    computed in different threads (see offset_worker.py).
+    '''
+    def __init__( self, max_bytes, quantum ):
+        '''Constructor.
+
+        @param  max_bytes   The memory budget (in bytes). Zero disables the cache.
+        @param  quantum     The resolution at which offsets are distinguished.
+        '''
+        self.max_bytes = max_bytes
+        self.quantum = quantum
+        self.byte_count = 0
+        # Maps key -> ( entry, size ), in order of use (most recent last).
+        self._entries = OrderedDict()
+        # Guards the entries and the byte count.
+        self._lock = threading.Lock()
+
+    def __len__( self ):
+        with self._lock:
+            return len( self._entries )
+
+    def key( self, deltas, settings=() ):
+        '''Computes the key for the given offset values.
+
+        @param  deltas      An (F,) array of offset values.
+        @param  settings    A tuple of any other values the entry depends on
+                            (e.g., the offset mode).
+        @returns A hashable key.
+        '''
+        quantized = np.round( deltas / self.quantum ).astype( np.int64 )
+        return hashlib.sha1( quantized.tostring() + repr( settings ) ).digest()
+
+    def get( self, key ):
+        '''Returns the entry for the key (marking it as most recently used) or
+        None if there is no such entry.'''
+        with self._lock:
+            item = self._entries.pop( key, None )
+            if ( item is None ):
+                return None
+            self._entries[ key ] = item
+            return item[0]
+
+    def put( self, key, entry, size ):
+        '''Adds an entry to the cache, replacing any entry with the same key and
+        evicting the least recently used entries to stay within budget.
+
+        @param  key         The entry's key (see key()).
+        @param  entry       The cached value.
+        @param  size        The estimated size of the entry (in bytes).
+        '''
+        with self._lock:
+            old = self._entries.pop( key, None )
+            if ( old is not None ):
+                self.byte_count -= old[1]
+            if ( size > self.max_bytes ):
+                return
+            self._entries[ key ] = ( entry, size )
+            self.byte_count += size
+            while ( self.byte_count > self.max_bytes ):
+                old_key, old = self._entries.popitem( last=False )
+                self.byte_count -= old[1]
+
+    def clear( self ):
+        '''Removes all entries.'''
+        with self._lock:
+            self._entries.clear()
+            self.byte_count = 0
+
+# The distance past an event at which the structure of the following interval is
+#   found (see OffsetSurface.face_events()), relative to the size of the polytope.
+EVENT_STEP = 1e-5
+
+class FaceEvents( object ):
+    '''The offsets of a single face at which the combinatorial structure of
+    the offset polytope changes (the "events"), with the other faces' offsets
+    held fixed. Between consecutive events, the structure is fixed: only the
+    vertices on the face move, each along a line, so the polytope for any
+    offset in the interval is found by solving the 3x3 systems of those
+    vertices (see HalfspacePolytope.set_plane_constant).
+    '''
+    def __init__( self, face_index, constant, deltas, radius, events, intervals ):
+        '''Constructor.
+
+        @param  face_index  The index of the face.
+        @param  constant    The constant term of the face's plane in the
+                            polytope when the face's offset is zero.
+        @param  deltas      The offsets of every face (the face's own is ignored).
+                            The array is copied.
+        @param  radius      The ball radius of the polytope (see
+                            OffsetSurface.ball_radius()).
+        @param  events      The increasing offsets of the face at which the
+                            structure changes.
+        @param  intervals   A list of 3-tuples ( start, end, polytope ): a
+                            polytope with the structure for the face's offsets
+                            in [start, end]; in increasing order.
+        '''
+        self.face_index = face_index
+        self.constant = constant
+        self.radius = radius
+        self.offsets = np.array( events, dtype=np.float )
+        self._deltas = np.array( deltas, dtype=np.float )
+        self._intervals = intervals
+        self._starts = [ start for start, end, polytope in intervals ]
+
+    def __len__( self ):
+        return self.offsets.size
+
+    def matches( self, face_index, deltas, radius ):
+        '''Reports if the events apply to the given face and offsets.
+
+        @param  face_index  The index of the face being offset.
+        @param  deltas      The offsets of every face.
+        @param  radius      The ball radius of the polytope.
+        @returns True if the other faces' offsets and the radius are unchanged.
+        '''
+        if ( face_index != self.face_index or radius != self.radius ):
+            return False
+        return ( np.array_equal( deltas[ :face_index ], self._deltas[ :face_index ] ) and
+                 np.array_equal( deltas[ face_index + 1: ], self._deltas[ face_index + 1: ] ) )
+
+    def interval( self, offset ):
+        '''Finds the interval of the face's offsets with a fixed structure
+        which contains the given offset.
+
+        @param  offset      The face's offset.
+        @returns A 2-tuple ( start, end ) -- end may be infinite -- or None if
+        the offset isn't in a known interval.
+        '''
+        i = bisect.bisect_right( self._starts, offset ) - 1
+        if ( i < 0 or offset > self._intervals[ i ][1] ):
+            return None
+        return self._intervals[ i ][:2]
+
+    def polytope( self, offset ):
+        '''Computes the polytope for the given offset of the face from the
+        structure of its interval.
+
+        @param  offset      The face's offset.
+        @returns A new HalfspacePolytope or None if the offset isn't in a known
+        interval.
+        '''
+        i = bisect.bisect_right( self._starts, offset ) - 1
+        if ( i < 0 or offset > self._intervals[ i ][1] ):
+            return None
+        polytope = self._intervals[ i ][2].copy()
+        polytope.set_plane_constant( self.face_index, self.constant - offset )
+        return polytope
+
+class OffsetSkeleton( object ):
+    '''The mitered offset surfaces of a polytope for every uniform offset,
+    precomputed.
+
+    Offsetting every face by t moves every plane outward by t. Between the
+    offsets at which the polytope's combinatorial structure changes (the
+    "events"; e.g., a face shrinking away), each vertex moves along a straight
+    line at a fixed speed. The skeleton records, for each interval between
+    events, the faces, the vertices at its start and their velocities, so the
+    surface for any uniform offset is found by interpolation in O(V). The
+    intervals are contiguous, from zero to the largest precomputed offset.
+    '''
+    def __init__( self, planes, feasible_point, max_offset=np.inf ):
+        '''Constructor. Computes the events and intervals.
+
+        @param  planes          An (F, 4) array of floats; the planes of the
+                                polytope with zero offset (unit normals).
+        @param  feasible_point  A (3,) array of floats. A point strictly inside
+                                all of the half spaces.
+        @param  max_offset      The largest offset to precompute.
+        '''
+        self.max_offset = max_offset
+        # The increasing offsets at which the structure changes.
+        self.offsets = []
+        # The offset at which each interval starts and ends, in increasing order;
+        #   each interval ends where the next starts.
+        self._starts = []
+        self._ends = []
+        # The vertices at the start of each interval, their velocities and the
+        #   faces (one list of vertex indices per plane) of the interval.
+        self._vertices = []
+        self._velocities = []
+        self._faces = []
+        # The edges of each interval, their lengths at its start and the change
+        #   of their lengths per unit of offset.
+        self._edges = []
+        self._lengths = []
+        self._length_rates = []
+        with timing.stage( 'offset skeleton' ):
+            self._build( np.array( planes, dtype=np.float ), feasible_point )
+        self.offsets = np.array( self.offsets, dtype=np.float )
+
+    def _build( self, planes, feasible_point ):
+        '''Steps through the events, finding the structure just past each one
+        (see _structure_after()).'''
+        polytope = HalfspacePolytope( planes, feasible_point )
+        vertices = polytope.vertices
+        size = np.max( vertices.max( axis=0 ) - vertices.min( axis=0 ) ) if vertices.shape[0] else 1.0
+        step = max( EVENT_STEP * size, 10 * PLANE_TOLERANCE )
+        start = 0.0
+        while ( start < self.max_offset ):
+            probe, high, velocities = self._structure_after( polytope, planes, start, step )
+            self._starts.append( start )
+            self._ends.append( high )
+            vertices = polytope.vertices + ( start - probe ) * velocities
+            self._vertices.append( vertices )
+            self._velocities.append( velocities )
+            self._faces.append( polytope.faces )
+            edges = faceEdges( polytope.faces )
+            directions = vertices[ edges[:, 1] ] - vertices[ edges[:, 0] ]
+            # The directions are taken where the edges aren't (nearly) collapsed.
+            probe_directions = polytope.vertices[ edges[:, 1] ] - polytope.vertices[ edges[:, 0] ]
+            probe_directions /= np.sqrt( np.sum( probe_directions ** 2, axis=1 ) )[:, np.newaxis]
+            self._edges.append( edges )
+            self._lengths.append( np.sum( directions * probe_directions, axis=1 ) )
+            self._length_rates.append( np.sum( ( velocities[ edges[:, 1] ] - velocities[ edges[:, 0] ] ) *
+                                               probe_directions, axis=1 ) )
+            if ( high >= self.max_offset ):
+                break
+            self.offsets.append( high )
+            start = high
+
+    def _structure_after( self, polytope, planes, start, step ):
+        '''Finds the structure of the polytope just past an offset.
+
+        The structure is found at a probe offset past the given offset. If an
+        event lies between the two (the structure's range doesn't reach back
+        to the offset), the probe is moved halfway toward the event until none
+        does.
+
+        @param  polytope    The HalfspacePolytope to probe with; its planes are
+                            set to the probe offset.
+        @param  planes      The planes with zero offset.
+        @param  start       The offset (e.g., of the previous event).
+        @param  step        The initial distance of the probe past the offset.
+        @returns A 3-tuple ( probe, end, velocities ): the offset of the probe,
+        the offset at which the structure ends and the velocities of the
+        vertices (see HalfspacePolytope.translation_range()).
+        '''
+        rates = -np.ones( planes.shape[0] )
+        probe = start + step
+        # If nothing can be resolved within the tolerance of the offset, the
+        #   structure farther on is extended back to it.
+        extend = False
+        while ( True ):
+            polytope.set_plane_constants( planes[:, 3] - probe )
+            motion = polytope.translation_range( rates )
+            near = probe - start <= PLANE_TOLERANCE
+            if ( motion is not None ):
+                lower, upper, velocities = motion
+                if ( probe + lower <= start + PLANE_TOLERANCE or near or extend ):
+                    return probe, probe + upper, velocities
+                # An event lies between the offset and the probe.
+                probe = start + 0.5 * ( probe + lower - start )
+            elif ( not near and not extend ):
+                # The probe is (nearly) at an event.
+                probe = start + 0.5 * ( probe - start )
+            else:
+                extend = True
+                step *= 2
+                probe = start + step
+
+    def __len__( self ):
+        '''Reports the number of intervals.'''
+        return len( self._starts )
+
+    def surface( self, offset ):
+        '''Computes the offset surface for a uniform offset. Edges too short to
+        tell apart from a vertex (e.g., at an event) are collapsed.
+
+        @param  offset      The offset of every face.
+        @returns A 2-tuple ( vertices, faces ): an (N, 3) array of the vertices
+        and a list of lists of vertex indices (one, possibly empty, per face).
+        None if the offset wasn't precomputed.
+        '''
+        i = bisect.bisect_right( self._starts, offset ) - 1
+        if ( i < 0 or offset > self._ends[ i ] ):
+            return None
+        t = offset - self._starts[ i ]
+        vertices = self._vertices[ i ] + t * self._velocities[ i ]
+        short = self._lengths[ i ] + t * self._length_rates[ i ] < PLANE_TOLERANCE
+        if ( np.any( short ) ):
+            return collapseEdges( vertices, self._faces[ i ], self._edges[ i ][ short ] )
+        return vertices, self._faces[ i ]
+
+class OffsetSurface( object ):
+    '''Definition of an offset surface from a polygonal object'''
+    # TODO: Document how this works.
+    class Face:
+        def __init__( self, id ):
+            self.id = id
+            self.vertices = []
+
+        def __str__( self ):
+            return 'F(%d) - %s' % ( self.id, self.vertices )
+    
+    # The offset modes. A MITERED offset moves each face's plane along its
+    #   normal by the face's offset. A ROUNDED offset is the Minkowski sum of a
+    #   ball and the mitered offset by the amount each offset exceeds the
+    #   smallest; the ball's radius is the smallest offset. With uniform
+    #   offsets, it is the set of points within the offset of the polytope.
+    MITERED = 'mitered'
+    ROUNDED = 'rounded'
+    # The default memory budget of the hull cache (in bytes).
+    CACHE_BYTES = 64 * 1024 * 1024
+    # The default resolution at which the hull cache distinguishes offsets.
+    CACHE_QUANTUM = 1e-9
+
+    def __init__( self, mesh, cache_bytes=CACHE_BYTES, cache_quantum=CACHE_QUANTUM, cache=None ):
+        '''Ctor.
+        Initialize the surface from a watertight mesh instance..
+
+        @param  mesh            The watertight mesh.
+        @param  cache_bytes     The memory budget of the cache of previously
+                                computed hulls; zero disables the cache.
+        @param  cache_quantum   The resolution at which the cache distinguishes
+                                offset values.
+        @param  cache           A HullCache to share with other surfaces of the
+                                same mesh (e.g., see offset_worker.py); if
+                                given, cache_bytes and cache_quantum are ignored.
+        '''
+        self.mesh = mesh
+        self.hull = None
+        # The offset mode (see set_mode()).
+        self.mode = self.MITERED
+        # The largest angle (in radians) between the normals of adjacent
+        #   samples of a rounded offset's cylinders and spheres.
+        self.round_angle = ROUND_ANGLE
+        # The half space intersection which produces the hull. For a rounded
+        #   offset, it is the polytope the ball is added to.
+        self.polytope = None
+        # The ball radius the polytope was computed for.
+        self._polytope_radius = 0.0
+        # Previously computed hulls (and their polytopes) keyed by the deltas
+        #   and the mode (see _hull_key()).
+        self.cache = HullCache( cache_bytes, cache_quantum ) if cache is None else cache
+        self._cache_key = None
+        # The events of the face most recently analyzed (see face_events()).
+        self.events = None
+        # The precomputed uniform offsets (see build_skeleton()); None if they
+        #   are computed as needed.
+        self.skeleton = None
+        self.deltas = np.zeros( (mesh.face_count(),), dtype=np.float )
+        self.planes = np.zeros( (mesh.face_count(), 4), dtype=np.float )
+        # The initial point inside the polytope's half spaces; the polytope
+        #   moves it toward the Chebyshev center as the offsets change.
+        self.feasible_point = np.mean( mesh.vertex_pos, axis=1 )[:3]
+
+        self.vertices = self.mesh.vertex_pos[:3, :].T
+        # Convex meshes are picked directly against their planes, others
+        #   against a hierarchy of the offset faces' triangles (see pick_ray()).
+        self.convex = mesh.is_convex()
+        # The fan triangulation of the faces: the vertices of each triangle and
+        #   its face.
+        corners, faces, edge_flags = fanTriangles( mesh.face_offsets )
+        self._fan = ( mesh.face_vertices[ corners ], faces )
+        # The hierarchy of the offset triangles and the cache key of the deltas
+        #   it was built for.
+        self._bvh = None
+        self._bvh_key = None
+
+        # this is necessary to get an index *back* from a face for OpenGL
+        # selection.
+        self.faces = []
+        for f_idx, mesh_face in enumerate( mesh.faces ):
+            self.planes[f_idx, :3] = self.normals[:, f_idx].T
+            point = self.vertices[ mesh_face.vertices[0] ]
+            d = -np.dot(self.normals[:, f_idx], point)
+            self.planes[f_idx, 3] = d
+            
+            face_vertices = []
+            f = self.Face( f_idx )
+            f.vertices = mesh_face.vertices
+            self.faces.append( f )
+
+    normals = property( lambda self: self.mesh.face_normals )
+
+    def get_face_centroid( self, face_index, with_offset=False ):
+        '''Computes the centroid of the given face.'''
+        face = self.faces[ face_index ]
+        offset = np.zeros_like(self.normals[:, face_index])
+        if (with_offset):
+            offset = self.normals[:, face_index] * self.deltas[face_index]
+        pos = np.mean(self.vertices[face.vertices, :] + offset, axis=0)
+        return pos
+            
+    def offset_face_polygon( self, face_index ):
+        '''Reports the vertices of the given face, moved along its normal by
+        its offset.
+
+        @param  face_index  The index of the face.
+        @returns An Nx3 array of the face's vertices (counter-clockwise).
+        '''
+        offset = self.normals[:, face_index] * self.deltas[ face_index ]
+        return self.vertices[ self.faces[ face_index ].vertices ] + offset
+
+    def hull_face_polygon( self, face_index ):
+        '''Reports the vertices of the hull's face which lies in the given
+        face's (offset) plane.
+
+        @param  face_index  The index of the face.
+        @returns An Nx3 array of the hull face's vertices (counter-clockwise);
+        empty if the face doesn't contribute to the hull.
+        '''
+        return self.hull.vertices[ np.asarray( self.hull.faces[ face_index ], dtype=np.int64 ) ]
+
+    def offset_triangles( self ):
+        '''Triangulates the offset faces: each face of the mesh, moved along
+        its normal by its offset. Unlike the hull, the offset faces can overlap.
+
+        @returns A 2-tuple of arrays ( positions, faces ): the Tx3x3 vertex
+        positions of the triangles and the face of each triangle.
+        '''
+        tri_vertices, faces = self._fan
+        offsets = ( self.normals[:, faces] * self.deltas[ faces ] ).T
+        return self.vertices[ tri_vertices ] + offsets[:, None, :], faces
+
+    def pick_ray( self, origin, direction ):
+        '''Determines the face hit by a ray (e.g., see GLCamera.pickRay()).
+        For a convex mesh, this is the face of the hull through which the ray
+        enters it. Otherwise, it is the nearest offset face (see
+        offset_triangles()) facing the ray.
+
+        @param  origin      The origin of the ray (a length-3 array).
+        @param  direction   The direction of the ray (a length-3 array).
+        @returns The index of the hit face or -1 if there is none.
+        '''
+        if ( self.convex ):
+            planes = self.planes.copy()
+            planes[:, 3] -= self.deltas
+            t, face = rayConvex( origin, direction, planes )
+            return face
+        if ( self._bvh is None or self._cache_key is None or self._cache_key != self._bvh_key ):
+            positions, faces = self.offset_triangles()
+            self._bvh = TriangleBVH( positions )
+            self._bvh_key = self._cache_key
+        t, triangle = self._bvh.intersect( origin, direction )
+        if ( triangle < 0 ):
+            return -1
+        return self._fan[1][ triangle ]
+
+    def set_mode( self, mode, round_angle=None, recompute=True ):
+        '''Sets the offset mode and recomputes the hull.
+
+        @param  mode        One of MITERED or ROUNDED.
+        @param  round_angle If not None, the largest angle (in radians) between
+                            the normals of adjacent samples of a rounded
+                            offset's cylinders and spheres.
+        @param  recompute   If False, the hull is not recomputed (e.g., because
+                            it is computed elsewhere; see offset_worker.py).
+        '''
+        if ( mode not in ( self.MITERED, self.ROUNDED ) ):
+            raise ValueError( "Unknown offset mode: %s" % mode )
+        if ( round_angle is not None ):
+            if ( round_angle <= 0 ):
+                raise ValueError( "The rounding angle must be positive, not %g" % round_angle )
+            self.round_angle = round_angle
+        self.mode = mode
+        # The cached hulls of the previous mode remain valid; they have other keys.
+        self._cache_key = self._hull_key()
+        if ( recompute and self.hull is not None ):
+            self.set_offsets( self.deltas.copy() )
+
+    def ball_radius( self ):
+        '''Reports the radius of the ball added to the polytope: the smallest
+        offset of a ROUNDED offset and zero for a MITERED offset.'''
+        if ( self.mode == self.ROUNDED and self.deltas.size ):
+            return self.deltas.min()
+        return 0.0
+
+    def assign_offset( self, offset, face_index ):
+        '''Sets the offset value of one or all faces without computing the hull
+        (e.g., because it is computed elsewhere; see offset_worker.py).
+        @param  offset      The offset value. Negative values are treated as zero.
+        @param  face_index  If < 0, sets *all* faces, otherwise a valid index sets
+                            the single, indexed face.
+        @returns The offset value assigned (i.e., clamped at zero).
+        '''
+        if ( offset < 0 ): offset = 0.0
+        if ( face_index < 0 ):
+            self.deltas[ : ] = offset
+        else:
+            self.deltas[ face_index ] = offset
+        self._cache_key = self._hull_key()
+        return offset
+
+    def set_offset( self, offset, face_index ):
+        '''Sets the offset value of one or all faces.
+        @param  offset      The offset value. Negative values are treated as zero.
+        @param  face_index  If < 0, sets *all* faces, otherwise a valid index sets
+                            the single, indexed face.
+        '''
+        offset = self.assign_offset( offset, face_index )
+        with timing.stage( 'set_offset' ):
+            if ( self._use_cached_hull() ):
+                return
+            if ( face_index < 0 and self._use_skeleton( offset ) ):
+                return
+            radius = self.ball_radius()
+            if ( face_index < 0 or self.polytope is None or radius != self._polytope_radius ):
+                self._rebuild_polytope()
+            elif ( self.events is not None and self.events.matches( face_index, self.deltas, radius ) and
+                   self.events.interval( offset ) is not None ):
+                # The structure for the offset is known (see face_events()).
+                self.polytope = self.events.polytope( offset )
+            else:
+                # Only a single plane moved; the polytope can usually be updated
+                #   incrementally.
+                self.polytope.set_plane_constant( face_index,
+                                                  self.planes[ face_index, 3 ] - offset + radius )
+            self._update_hull()
+
+    def set_offsets( self, deltas ):
+        '''Sets the offset value of every face.
+        @param  deltas      An (F,) array of offset values. Negative values are
+                            treated as zero.
+        '''
+        self.deltas[ : ] = np.clip( deltas, 0.0, np.inf )
+        self._cache_key = self._hull_key()
+        with timing.stage( 'set_offset' ):
+            if ( self._use_cached_hull() ):
+                return
+            self._rebuild_polytope()
+            self._update_hull()
+
+    def face_events( self, face_index, max_offset=np.inf ):
+        '''Finds the offsets of a face at which the combinatorial structure of
+        the offset polytope changes -- edges collapse, faces vanish or appear --
+        with every other face's offset held at its current value. The
+        structure between the events is kept, so that set_offset() computes
+        the polytope for any offset of the face in a known interval without
+        qhull. (The events are kept until another face is analyzed.)
+
+        For a ROUNDED offset, the ball radius is held at its current value; the
+        events no longer apply once the radius changes.
+
+        @param  face_index  The index of the face.
+        @param  max_offset  The largest offset of the face to analyze.
+        @returns A FaceEvents instance.
+        '''
+        if ( self.polytope is None ):
+            self._rebuild_polytope()
+        radius = self._polytope_radius
+        constant = self.planes[ face_index, 3 ] + radius
+        work = self.polytope.copy()
+        vertices = work.vertices
+        size = np.max( vertices.max( axis=0 ) - vertices.min( axis=0 ) ) if vertices.shape[0] else 1.0
+        step = max( EVENT_STEP * size, 10 * PLANE_TOLERANCE )
+        events = []
+        intervals = []
+        with timing.stage( 'face events' ):
+            start = 0.0
+            advance = step
+            while ( start < max_offset ):
+                # The structure is found just past the previous event.
+                probe = start + advance
+                work.set_plane_constant( face_index, constant - probe )
+                bounds = work.plane_range( face_index )
+                if ( bounds is None ):
+                    # The probe is (nearly) at an event, e.g., an edge which
+                    #   just appeared is still too short to tell apart from a
+                    #   vertex.
+                    advance *= 2
+                    continue
+                advance = step
+                low, high = constant - bounds[1], constant - bounds[0]
+                if ( low > start + PLANE_TOLERANCE ):
+                    # The probe skipped over an event (and its interval).
+                    events.append( low )
+                else:
+                    low = start
+                intervals.append( ( low, high, work.copy() ) )
+                if ( high >= max_offset ):
+                    break
+                events.append( high )
+                start = high
+        self.events = FaceEvents( face_index, constant, self.deltas, radius, events, intervals )
+        return self.events
+
+    def build_skeleton( self, max_offset=np.inf ):
+        '''Precomputes the mitered offset surfaces for every uniform offset (see
+        OffsetSkeleton). Afterwards, setting the offset of every face at once in
+        MITERED mode doesn't compute a polytope.
+
+        @param  max_offset  The largest uniform offset to precompute.
+        @returns The OffsetSkeleton.
+        '''
+        self.skeleton = OffsetSkeleton( self.planes, self.feasible_point, max_offset )
+        return self.skeleton
+
+    def _use_skeleton( self, offset ):
+        '''Computes the hull for a uniform offset from the skeleton, if there is
+        one (see build_skeleton()).
+
+        @param  offset      The offset of every face.
+        @returns True if the hull was computed.
+        '''
+        if ( self.skeleton is None or self.mode != self.MITERED ):
+            return False
+        surface = self.skeleton.surface( offset )
+        if ( surface is None ):
+            return False
+        self.hull = self._make_hull( *surface )
+        # The polytope is rebuilt when it is next needed.
+        self.polytope = None
+        return True
+
+    def _rebuild_polytope( self ):
+        '''Recomputes the polytope for the current deltas. An existing polytope
+        is only rebuilt from scratch if it isn't simple or its structure
+        changes (see HalfspacePolytope.set_plane_constants).'''
+        radius = self.ball_radius()
+        if ( self.polytope is None ):
+            temp_planes = self.planes.copy()
+            temp_planes[:, 3] -= self.deltas - radius
+            self.polytope = HalfspacePolytope( temp_planes, self.feasible_point )
+        else:
+            self.polytope.set_plane_constants( self.planes[:, 3] - self.deltas + radius )
+        self._polytope_radius = radius
+
+    def _hull_key( self ):
+        '''Computes the cache key of the current deltas and mode.'''
+        return self.cache.key( self.deltas, ( self.mode, self.round_angle ) )
+
+    def _use_cached_hull( self ):
+        '''Looks up the current deltas (whose key is _cache_key) in the cache. If
+        they are found, the cached hull (and a copy of its polytope) become
+        current.
+
+        @returns True if the cached hull was used.
+        '''
+        entry = self.cache.get( self._cache_key )
+        if ( entry is None ):
+            return False
+        self.hull, polytope = entry
+        self.polytope = polytope.copy()
+        self._polytope_radius = self.ball_radius()
+        return True
+
+    def _update_hull( self ):
+        '''Creates the hull from the current polytope and caches it.'''
+        radius = self._polytope_radius
+        if ( radius > 0 ):
+            with timing.stage( 'rounding' ):
+                self.hull = self._make_rounded_hull( self.polytope.vertices, self.polytope.faces, radius )
+            size = self.polytope.byte_size() + self.hull.byte_size()
+        else:
+            self.hull = self._make_hull( self.polytope.vertices, self.polytope.faces )
+            size = self.polytope.byte_size()
+        self.cache.put( self._cache_key, ( self.hull, self.polytope.copy() ), size )
+
+    def _make_hull( self, vertices, faces ):
+        '''Creates the mesh representing the offset surface from the polytope's
+        vertices and faces. Sub-classes can override this to produce a
+        different type of mesh.'''
+        return SimpleMesh( vertices, faces, self.normals )
+
+    def _make_rounded_hull( self, vertices, faces, radius ):
+        '''Creates the mesh representing the rounded offset surface: the
+        Minkowski sum of the polytope (given by its vertices and faces) and a
+        ball of the given radius.'''
+        positions, vertex_normals, flat_faces, patches, patch_flags = \
+            roundedSurface( vertices, faces, self.normals, radius, self.round_angle )
+        return RoundedMesh( positions, flat_faces, self.normals, vertex_normals, patches, patch_flags )
@@ -0,0 +1,105 @@
+# Computes offset surfaces from the command line -- no OpenGL or Qt required.
+
+import sys
+import numpy as np
+from offset import offsetSurfaceFromObj, OffsetSurface
+from rounded import ROUND_ANGLE
+import timing
+
+def readDeltas( fileName ):
+    '''Reads offset configurations from a text file. Each non-empty line (not
+    starting with #) is one configuration: either a single value (a uniform
+    offset) or one whitespace-separated value per face.
+
+    @param  fileName    The path to the file.
+    @returns A list of 1D numpy arrays.
+    '''
+    configs = []
+    with open( fileName, 'r' ) as f:
+        for line in f:
+            line = line.strip()
+            if ( not line or line.startswith( '#' ) ):
+                continue
+            configs.append( np.array( [ float( x ) for x in line.split() ], dtype=np.float ) )
+    return configs
+
+def applyDeltas( surface, deltas ):
+    '''Sets the offset surface's offsets to the given configuration.
+
+    @param  surface     An instance of offset.OffsetSurface.
+    @param  deltas      A 1D array of floats. Either a single, uniform offset or
+                        one offset per face.
+    '''
+    if ( deltas.size == 1 ):
+        surface.set_offset( deltas[0], -1 )
+    elif ( deltas.size == surface.mesh.face_count() ):
+        surface.set_offsets( deltas )
+    else:
+        raise ValueError( "Expected 1 or %d offset values, found %d" % ( surface.mesh.face_count(), deltas.size ) )
+
+if __name__ == '__main__':
+    import os, optparse
+    parser = optparse.OptionParser( usage="%prog [options] file.obj" )
+    parser.add_option( '-o', '--out', help='The obj file to write the offset surface to. If there are multiple configurations, it must contain a %d (replaced by the configuration index). Defaults to file_offset.obj (or file_offset_%d.obj).',
+                       action='store', dest='outObj', default=None )
+    parser.add_option( '-u', '--uniform', help='Offset every face by this amount.',
+                       action='store', dest='uniform', type='float', default=None )
+    parser.add_option( '-d', '--deltas', help='A text file of offset configurations; each line is either a single (uniform) offset or one offset per face.',
+                       action='store', dest='deltas', default=None )
+    parser.add_option( '-r', '--rounded', help='Round the offset surface\'s edges and vertices (the Minkowski sum with a ball of the smallest offset) instead of mitering them.',
+                       action='store_true', dest='rounded', default=False )
+    parser.add_option( '-a', '--round-angle', help='The largest angle (in degrees) between the normals of adjacent samples of the rounded edges and vertices (default %g).' % np.degrees( ROUND_ANGLE ),
+                       action='store', dest='roundAngle', type='float', default=np.degrees( ROUND_ANGLE ) )
+    parser.add_option( '-s', '--skeleton', help='Precompute the surfaces of every uniform offset (see OffsetSurface.build_skeleton); faster for many uniform configurations, e.g., the frames of an animation. Mitered offsets only.',
+                       action='store_true', dest='skeleton', default=False )
+    parser.add_option( '-t', '--timings', help='A csv (or .json) file to write the durations of the offset computation stages to.',
+                       action='store', dest='timings', default=None )
+    options, args = parser.parse_args()
+
+    if ( len( args ) != 1 ):
+        parser.print_help()
+        print( "\n !! You must specify exactly one input obj file" )
+        sys.exit( 1 )
+
+    if ( ( options.uniform is None ) == ( options.deltas is None ) ):
+        parser.print_help()
+        print( "\n !! You must specify exactly one of --uniform or --deltas" )
+        sys.exit( 1 )
+
+    if ( options.uniform is not None ):
+        configs = [ np.array( [ options.uniform ], dtype=np.float ) ]
+    else:
+        configs = readDeltas( options.deltas )
+
+    out_name = options.outObj
+    if ( out_name is None ):
+        base = os.path.splitext( args[0] )[0]
+        if ( len( configs ) == 1 ):
+            out_name = base + '_offset.obj'
+        else:
+            out_name = base + '_offset_%d.obj'
+    elif ( len( configs ) > 1 and '%d' not in out_name ):
+        print( "\n !! The output name must contain %d when there are multiple configurations" )
+        sys.exit( 1 )
+
+    if ( options.roundAngle <= 0 ):
+        print( "\n !! The rounding angle must be positive" )
+        sys.exit( 1 )
+
+    surface = offsetSurfaceFromObj( args[0] )
+    if ( options.rounded ):
+        surface.set_mode( OffsetSurface.ROUNDED, np.radians( options.roundAngle ) )
+    if ( options.skeleton ):
+        surface.build_skeleton()
+    for i, deltas in enumerate( configs ):
+        applyDeltas( surface, deltas )
+        if ( len( configs ) > 1 ):
+            file_name = out_name % i
+        else:
+            file_name = out_name
+        with open( file_name, 'w' ) as outFile:
+            surface.hull.writeOBJ( outFile )
+        print( "%s: %d vertices, %d faces" % ( file_name, surface.hull.vertex_count(), surface.hull.face_count() ) )
+
+    if ( options.timings is not None ):
+        timing.TIMINGS.dump( options.timings )
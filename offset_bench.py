@@ -0,0 +1,265 @@
+# Benchmarks the offset surface computation -- no OpenGL or Qt required.
+#
+# The benchmark runs over the polytopes shipped with the repository and over
+# random convex polytopes of a range of sizes (generated reproducibly from a
+# seed). For each polytope it times:
+#   - parsing the obj file and building the mesh (WatertightMesh.from_obj),
+#   - creating the offset surface (OffsetSurface.__init__),
+#   - offsetting a single face and offsetting every face (set_offset), and
+#   - the polytope stages within set_offset (qhull, welding, face extraction and
+#     ordering, incremental updates), as recorded by timing.py.
+# Each measurement is repeated and summarized (min, median, mean, max) in a csv
+# or json file, so results can be tracked over time.
+
+import csv
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import scipy
+from scipy.spatial import ConvexHull
+import timing
+from ObjReader import ObjFile
+from offset import OffsetSurface, SimpleMesh
+from polytope import HalfspacePolytope
+from watertight import WatertightMesh
+
+# The polytopes shipped with the repository.
+SHIPPED = ( 'tetra.obj', 'cube.obj', 'pyramid.obj', 'pyr5.obj', 'trunc.obj', 'facet.obj',
+            'dodec.obj', 'icos.obj', 'gem.obj' )
+
+# The default face counts of the random polytopes.
+SIZES = ( 10, 100, 1000, 10000, 100000 )
+
+# The polytope stages (see polytope.py) reported for each set_offset benchmark.
+POLYTOPE_STAGES = ( 'qhull', 'weld', 'face extraction', 'face ordering', 'incremental update' )
+
+CSV_FIELDS = ( 'polytope', 'faces', 'vertices', 'stage', 'repeats', 'min_ms', 'median_ms', 'mean_ms', 'max_ms' )
+
+def randomPolytope( face_count, seed=0 ):
+    '''Creates a random convex polytope: the intersection of the half spaces
+    bounded by planes tangent to a sphere. Every plane touches the sphere --
+    and therefore the polytope -- so the polytope has exactly face_count
+    faces. The sphere grows with the face count, so the faces are about the
+    same size regardless of their number. The points of tangency are a randomly rotated and
+    jittered Fibonacci lattice; evenly spread points avoid sliver faces (which
+    don't survive being written to an obj file).
+
+    @param  face_count  The number of faces (at least 4).
+    @param  seed        The seed of the random rotation and jitter.
+    @returns An instance of SimpleMesh.
+    '''
+    if ( face_count < 4 ):
+        raise ValueError( "A polytope needs at least 4 faces, not %d" % face_count )
+    rand = np.random.RandomState( seed )
+    while ( True ):
+        # The lattice, with each point moved by up to a quarter of the spacing.
+        i = np.arange( face_count ) + 0.5 + rand.uniform( -0.25, 0.25, face_count )
+        z = 1.0 - 2.0 * i / face_count
+        theta = np.pi * ( 1.0 + np.sqrt( 5.0 ) ) * ( i + rand.uniform( -0.25, 0.25, face_count ) )
+        r = np.sqrt( 1.0 - z * z )
+        normals = np.column_stack( ( r * np.cos( theta ), r * np.sin( theta ), z ) )
+        # The polytope is bounded if the origin is inside the convex hull of the
+        #   normals; with few faces, that may take a few tries.
+        if ( np.all( ConvexHull( normals ).equations[:, 3] < -1e-3 ) ):
+            break
+    rotation = np.linalg.qr( rand.normal( size=( 3, 3 ) ) )[0]
+    normals = np.dot( normals, rotation.T )
+    normals /= np.sqrt( np.sum( normals * normals, axis=1 ) )[:, np.newaxis]
+    radius = np.sqrt( face_count / 4.0 )
+    planes = np.hstack( ( normals, np.empty( ( face_count, 1 ) ) ) )
+    planes[:, 3] = -radius
+    polytope = HalfspacePolytope( planes, np.zeros( 3 ) )
+    # Obj faces get their normals from their first corner (see
+    #   ObjFile.getFaceNormals); each face starts at its widest corner so that
+    #   short edges don't leave it without a normal.
+    vertices = polytope.vertices
+    faces = []
+    for face in polytope.faces:
+        corners = vertices[ face ]
+        areas = np.sum( np.cross( np.roll( corners, -1, axis=0 ) - corners,
+                                  np.roll( corners, -2, axis=0 ) - corners ) ** 2, axis=1 )
+        start = np.argmax( areas )
+        faces.append( face[ start: ] + face[ :start ] )
+    return SimpleMesh( vertices, faces, normals.T )
+
+def summarize( polytope, mesh, stage, durations ):
+    '''Summarizes the durations of a benchmark as a result row.
+
+    @param  polytope    The name of the polytope.
+    @param  mesh        The polytope's WatertightMesh.
+    @param  stage       The name of the benchmarked stage.
+    @param  durations   The durations (in seconds) of each repetition.
+    @returns A dictionary keyed by CSV_FIELDS.
+    '''
+    ms = np.array( durations ) * 1000.0
+    return { 'polytope' : polytope,
+             'faces' : mesh.face_count(),
+             'vertices' : mesh.vertex_count(),
+             'stage' : stage,
+             'repeats' : ms.size,
+             'min_ms' : ms.min(),
+             'median_ms' : np.median( ms ),
+             'mean_ms' : ms.mean(),
+             'max_ms' : ms.max() }
+
+def timed( function, repeat ):
+    '''Calls the function repeatedly, timing each call.
+
+    @param  function    A callable taking the index of the repetition.
+    @param  repeat      The number of calls.
+    @returns A 2-tuple ( durations, result ): the durations (in seconds) and the
+    result of the last call.
+    '''
+    durations = []
+    result = None
+    for i in xrange( repeat ):
+        start = timing.clock()
+        result = function( i )
+        durations.append( timing.clock() - start )
+    return durations, result
+
+def benchmarkObj( obj_file, name, repeat, seed=0 ):
+    '''Benchmarks the offset surface computation for a single polytope.
+
+    @param  obj_file    The path to the obj file of a convex polytope.
+    @param  name        The name of the polytope (reported in the results).
+    @param  repeat      The number of times each stage is run.
+    @param  seed        The seed of the random single-face offsets.
+    @returns A list of result rows (see summarize()).
+    '''
+    def loadMesh( i ):
+        mesh = WatertightMesh()
+        mesh.from_obj( ObjFile( obj_file ) )
+        return mesh
+    load_times, mesh = timed( loadMesh, repeat )
+    rows = [ summarize( name, mesh, 'from_obj', load_times ) ]
+
+    # The hull cache is disabled; every offset is computed.
+    init_times, surface = timed( lambda i: OffsetSurface( mesh, cache_bytes=0 ), repeat )
+    rows.append( summarize( name, mesh, 'OffsetSurface.__init__', init_times ) )
+    surface.set_offset( 0.0, -1 )
+
+    # Every face offset by the same, increasing amount.
+    timing.TIMINGS.clear()
+    times, _ = timed( lambda i: surface.set_offset( 0.01 * ( i + 1 ), -1 ), repeat )
+    rows.append( summarize( name, mesh, 'set_offset uniform', times ) )
+    rows += stageRows( name, mesh, 'set_offset uniform' )
+
+    # A single, random face offset by a random amount; the polytope may be
+    #   updated incrementally or rebuilt.
+    surface.set_offset( 0.0, -1 )
+    rand = np.random.RandomState( seed )
+    faces = rand.randint( 0, mesh.face_count(), repeat )
+    offsets = rand.uniform( 0.0, 0.1, repeat )
+    timing.TIMINGS.clear()
+    times, _ = timed( lambda i: surface.set_offset( offsets[ i ], faces[ i ] ), repeat )
+    rows.append( summarize( name, mesh, 'set_offset single', times ) )
+    rows += stageRows( name, mesh, 'set_offset single' )
+    return rows
+
+def stageRows( name, mesh, prefix ):
+    '''Summarizes the polytope stages recorded by timing.py since it was last
+    cleared.
+
+    @param  name        The name of the polytope.
+    @param  mesh        The polytope's WatertightMesh.
+    @param  prefix      The prefix of the stage names in the results.
+    @returns A list of result rows (see summarize()).
+    '''
+    rows = []
+    for stage in POLYTOPE_STAGES:
+        durations = timing.TIMINGS.durations( stage )
+        if ( durations ):
+            rows.append( summarize( name, mesh, '%s: %s' % ( prefix, stage ), durations ) )
+    return rows
+
+def environment():
+    '''Reports the environment the benchmark runs in.'''
+    return { 'date' : time.strftime( '%Y-%m-%d %H:%M:%S' ),
+             'platform' : platform.platform(),
+             'python' : platform.python_version(),
+             'numpy' : np.__version__,
+             'scipy' : scipy.__version__ }
+
+def writeResults( file_name, rows, settings ):
+    '''Writes the results to a csv file or, if the file name ends in .json, to a
+    json file (which also records the settings and environment).
+
+    @param  file_name   The path to the file to write.
+    @param  rows        A list of result rows (see summarize()).
+    @param  settings    A dictionary of the benchmark's settings.
+    '''
+    if ( file_name.lower().endswith( '.json' ) ):
+        data = { 'environment' : environment(),
+                 'settings' : settings,
+                 'results' : [ dict( ( field, row[ field ] if isinstance( row[ field ], str ) else
+                                       row[ field ].item() if hasattr( row[ field ], 'item' ) else row[ field ] )
+                                     for field in CSV_FIELDS ) for row in rows ] }
+        with open( file_name, 'w' ) as f:
+            json.dump( data, f, indent=1 )
+    else:
+        with open( file_name, 'wb' ) as f:
+            writer = csv.DictWriter( f, CSV_FIELDS )
+            writer.writeheader()
+            writer.writerows( rows )
+
+if __name__ == '__main__':
+    import optparse
+    parser = optparse.OptionParser( usage="%prog [options]" )
+    parser.add_option( '-s', '--sizes', help='A comma-separated list of the face counts of the random polytopes (default %s). Use "" for none.' % ','.join( str( s ) for s in SIZES ),
+                       action='store', dest='sizes', default=','.join( str( s ) for s in SIZES ) )
+    parser.add_option( '-r', '--repeat', help='The number of times each stage is run (default 5).',
+                       action='store', dest='repeat', type='int', default=5 )
+    parser.add_option( '', '--seed', help='The seed of the random polytopes and offsets (default 0).',
+                       action='store', dest='seed', type='int', default=0 )
+    parser.add_option( '', '--no-shipped', help='Skip the polytopes shipped with the repository.',
+                       action='store_false', dest='shipped', default=True )
+    parser.add_option( '-k', '--keep', help='A directory to write the random polytopes to. By default, they are written to a temporary directory which is deleted.',
+                       action='store', dest='keepDir', default=None )
+    parser.add_option( '-o', '--out', help='The csv (or .json) file to write results to (default bench.csv).',
+                       action='store', dest='out', default='bench.csv' )
+    options, args = parser.parse_args()
+
+    if ( args ):
+        parser.print_help()
+        print( "\n !! Unexpected arguments: %s" % ' '.join( args ) )
+        sys.exit( 1 )
+    try:
+        sizes = [ int( s ) for s in options.sizes.split( ',' ) if s.strip() ]
+    except ValueError:
+        parser.print_help()
+        print( "\n !! Invalid sizes: %s" % options.sizes )
+        sys.exit( 1 )
+
+    polytopes = []
+    if ( options.shipped ):
+        root = os.path.dirname( os.path.abspath( __file__ ) )
+        polytopes += [ ( os.path.splitext( f )[0], os.path.join( root, f ) ) for f in SHIPPED ]
+    poly_dir = options.keepDir or tempfile.mkdtemp( prefix='offset_bench' )
+    if ( not os.path.isdir( poly_dir ) ):
+        os.makedirs( poly_dir )
+    try:
+        for size in sizes:
+            file_name = os.path.join( poly_dir, 'random_%d_%d.obj' % ( size, options.seed ) )
+            with open( file_name, 'w' ) as f:
+                randomPolytope( size, options.seed ).writeOBJ( f )
+            polytopes.append( ( 'random_%d' % size, file_name ) )
+
+        rows = []
+        for name, file_name in polytopes:
+            start = time.time()
+            rows += benchmarkObj( file_name, name, options.repeat, options.seed )
+            print( "%s: %.2f s" % ( name, time.time() - start ) )
+    finally:
+        if ( options.keepDir is None ):
+            shutil.rmtree( poly_dir, ignore_errors=True )
+
+    settings = { 'sizes' : sizes, 'repeat' : options.repeat, 'seed' : options.seed,
+                 'shipped' : options.shipped }
+    writeResults( options.out, rows, settings )
+    print( "%d results in %s" % ( len( rows ), options.out ) )
@@ -10,10 +10,12 @@ if ( sys.version_info[0] != 2 ):
 from PyQt4 import QtCore, QtGui
 ##from Context import SelectContext
 from manipulator import OffsetManipulator
+from offset import OffsetSurface
 from GLWidget import GLWidget
 from scene import Scene
 import mouse
 import key as keys
+import timing
 
 class Window(QtGui.QMainWindow):
     def __init__(self):
@@ -38,8 +40,11 @@ class Window(QtGui.QMainWindow):
                                  triggered=self.spawnOpenFileDlg, shortcut="Ctrl+o")
         clear = QtGui.QAction("&Clear", self, statusTip="Clear the scene",
                                  triggered=self.clear, shortcut="Ctrl+x")
+        save_timings = QtGui.QAction("Save &Timings", self, statusTip="Save the recent stage timings to a csv or json file",
+                                 triggered=self.spawnSaveTimingsDlg)
         fileMenu.addAction( open_obj )
         fileMenu.addAction( clear )
+        fileMenu.addAction( save_timings )
 
         viewMenu = self.menuBar().addMenu( "View" )
         toggle_cam_widget = QtGui.QAction("Show Camera Movement Widgets", self,
@@ -48,6 +53,36 @@ class Window(QtGui.QMainWindow):
         toggle_cam_widget.setCheckable(True)
         toggle_cam_widget.setChecked(True)
         viewMenu.addAction( toggle_cam_widget )
+        ray_pick = QtGui.QAction("Pick Faces on the CPU", self,
+                                 statusTip="Find the face under the mouse by casting a ray instead of rendering face ids",
+                                 triggered=self.toggle_ray_pick)
+        ray_pick.setCheckable(True)
+        ray_pick.setChecked(self.manip.ray_pick)
+        viewMenu.addAction( ray_pick )
+        rounded = QtGui.QAction("Rounded Offset", self,
+                                statusTip="Round the offset surface's edges and vertices (the polytope grown by a ball) instead of mitering them",
+                                triggered=self.toggle_rounded, shortcut="Ctrl+r")
+        rounded.setCheckable(True)
+        rounded.setChecked(self.manip.mode == OffsetSurface.ROUNDED)
+        viewMenu.addAction( rounded )
+        background = QtGui.QAction("Compute Offsets in the Background", self,
+                                   statusTip="Compute the offset surface in a background thread, drawing the last computed surface until the next one is ready",
+                                   triggered=self.toggle_background)
+        background.setCheckable(True)
+        background.setChecked(self.manip.background)
+        viewMenu.addAction( background )
+        skeleton = QtGui.QAction("Precompute Uniform Offsets", self,
+                                 statusTip="Precompute the offset surface for every uniform offset when an object is loaded, so that shift-dragging is immediate",
+                                 triggered=self.toggle_skeleton)
+        skeleton.setCheckable(True)
+        skeleton.setChecked(self.manip.skeleton)
+        viewMenu.addAction( skeleton )
+        show_timings = QtGui.QAction("Show Timings", self,
+                                     statusTip="Draw the recent durations of drawing, picking and computing the offset surface over the view",
+                                     triggered=self.glWidget.toggleTimings, shortcut="Ctrl+t")
+        show_timings.setCheckable(True)
+        show_timings.setChecked(self.glWidget.showTimings)
+        viewMenu.addAction( show_timings )
 
         self.setCentralWidget( mainFrame )
 
@@ -59,6 +94,35 @@ class Window(QtGui.QMainWindow):
         '''Toggles the display of camera control widgets on the camera control'''
         self.glWidget.toggle_cam_control_widget_display( state )
         
+    def toggle_ray_pick( self, state ):
+        '''Toggles between picking faces by casting rays and by rendering face ids'''
+        self.manip.ray_pick = state
+
+    def toggle_rounded( self, state ):
+        '''Toggles between rounded and mitered offset surfaces'''
+        self.manip.set_mode( OffsetSurface.ROUNDED if state else OffsetSurface.MITERED )
+        if ( self.manip.worker ):
+            self.glWidget.scheduleDeferred()
+        self.glWidget.updateGL()
+
+    def toggle_background( self, state ):
+        '''Toggles between computing the offset surface in a background thread
+        and in the GUI thread'''
+        self.manip.set_background( state )
+        if ( self.manip.worker ):
+            self.glWidget.scheduleDeferred()
+        self.glWidget.updateGL()
+
+    def toggle_skeleton( self, state ):
+        '''Toggles precomputing the uniform offset surfaces'''
+        self.manip.set_skeleton( state )
+
+    def spawnSaveTimingsDlg( self ):
+        fileName = QtGui.QFileDialog.getSaveFileName( self, "Save timings", self.last_dir,
+                                                      "CSV files (*.csv);;JSON files (*.json)" )
+        if ( fileName ):
+            timing.TIMINGS.dump( str( fileName ) )
+
     def spawnOpenFileDlg( self ):
         fileName = QtGui.QFileDialog.getOpenFileName( self, "Read OBJ file",
                                                       self.last_dir, "OBJ files (*.obj)" )
@@ -0,0 +1,181 @@
+# Evaluates many offset configurations of a single polytope across a pool of
+# processes -- no OpenGL or Qt required.
+#
+# Each worker process loads the polytope once and reuses its offset surface for
+# every configuration it is given. The configurations themselves are small
+# specifications (see below); random per-face offsets are generated in the
+# worker from a seed so that large offset vectors never cross process
+# boundaries. Results are written to a csv file as they complete.
+
+import csv
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+from offset import offsetSurfaceFromObj
+from offset_batch import applyDeltas
+
+# Offset specifications:
+#   ( UNIFORM, offset )                         -- every face offset by the same amount.
+#   ( RANDOM, seed, max_offset, fraction )      -- each face, with probability
+#                                                  fraction, is offset by a random
+#                                                  amount in [0, max_offset).
+UNIFORM = 0
+RANDOM = 1
+
+CSV_FIELDS = ( 'index', 'uniform', 'seed', 'vertices', 'faces', 'volume', 'seconds', 'file', 'error' )
+
+def uniformSweep( max_offset, steps ):
+    '''Creates the specifications for uniform offsets evenly spaced in the
+    range [0, max_offset].
+
+    @param  max_offset  The largest offset.
+    @param  steps       The number of offsets in the sweep.
+    @returns A list of offset specifications.
+    '''
+    return [ ( UNIFORM, x ) for x in np.linspace( 0.0, max_offset, steps ) ]
+
+def randomSweep( count, max_offset, fraction=1.0, seed=0 ):
+    '''Creates the specifications for random, per-face offsets.
+
+    @param  count       The number of configurations.
+    @param  max_offset  The upper bound on each face's offset.
+    @param  fraction    The probability that any single face is offset.
+    @param  seed        The seed of the first configuration; the ith
+                        configuration uses seed + i.
+    @returns A list of offset specifications.
+    '''
+    return [ ( RANDOM, seed + i, max_offset, fraction ) for i in xrange( count ) ]
+
+def specDeltas( spec, face_count ):
+    '''Produces the offset values for an offset specification.
+
+    @param  spec        An offset specification.
+    @param  face_count  The number of faces in the polytope.
+    @returns A 1D array of floats: either a single, uniform offset or one
+    offset per face.
+    '''
+    if ( spec[0] == UNIFORM ):
+        return np.array( [ spec[1] ], dtype=np.float )
+    elif ( spec[0] == RANDOM ):
+        seed, max_offset, fraction = spec[1:]
+        rand = np.random.RandomState( seed )
+        deltas = rand.uniform( 0.0, max_offset, face_count )
+        deltas[ rand.uniform( size=face_count ) >= fraction ] = 0.0
+        return deltas
+    raise ValueError( "Unknown offset specification: %s" % ( spec, ) )
+
+# The per-process state of a worker.
+_SURFACE = None
+_MESH_DIR = None
+
+def _initWorker( obj_file, mesh_dir ):
+    '''Initializes a worker process: loads the polytope once.'''
+    global _SURFACE, _MESH_DIR
+    _SURFACE = offsetSurfaceFromObj( obj_file )
+    _MESH_DIR = mesh_dir
+
+def _evaluate( task ):
+    '''Evaluates a single configuration in a worker process.
+
+    @param  task        A 2-tuple (index, spec).
+    @returns A dictionary keyed by CSV_FIELDS.
+    '''
+    index, spec = task
+    row = dict( ( field, '' ) for field in CSV_FIELDS )
+    row[ 'index' ] = index
+    if ( spec[0] == UNIFORM ):
+        row[ 'uniform' ] = spec[1]
+    else:
+        row[ 'seed' ] = spec[1]
+    start = time.time()
+    try:
+        applyDeltas( _SURFACE, specDeltas( spec, _SURFACE.mesh.face_count() ) )
+        hull = _SURFACE.hull
+        row[ 'vertices' ] = hull.vertex_count()
+        row[ 'faces' ] = hull.face_count()
+        row[ 'volume' ] = hull.volume()
+        if ( _MESH_DIR ):
+            row[ 'file' ] = os.path.join( _MESH_DIR, 'offset_%06d.obj' % index )
+            with open( row[ 'file' ], 'w' ) as f:
+                hull.writeOBJ( f )
+    except Exception as e:
+        # A single failed configuration shouldn't end the sweep.
+        row[ 'error' ] = str( e ).replace( '\n', ' ' )
+    row[ 'seconds' ] = time.time() - start
+    return row
+
+def runSweep( obj_file, specs, csv_file, mesh_dir=None, processes=None, chunk_size=16 ):
+    '''Evaluates the offset specifications for the polytope in the obj file,
+    writing one csv row per specification as it completes. The rows are
+    written in order of completion (not specification order).
+
+    @param  obj_file    The path to the obj file.
+    @param  specs       A list of offset specifications.
+    @param  csv_file    The path to the csv file to write.
+    @param  mesh_dir    If not None, the directory to write each offset surface
+                        to (as offset_<index>.obj).
+    @param  processes   The number of worker processes; defaults to the number
+                        of cpus.
+    @param  chunk_size  The number of specifications handed to a worker at a time.
+    @returns The number of specifications that failed.
+    '''
+    if ( mesh_dir and not os.path.isdir( mesh_dir ) ):
+        os.makedirs( mesh_dir )
+    failures = 0
+    pool = multiprocessing.Pool( processes, _initWorker, ( obj_file, mesh_dir ) )
+    try:
+        with open( csv_file, 'wb' ) as f:
+            writer = csv.DictWriter( f, CSV_FIELDS )
+            writer.writeheader()
+            for row in pool.imap_unordered( _evaluate, enumerate( specs ), chunk_size ):
+                writer.writerow( row )
+                f.flush()
+                if ( row[ 'error' ] ):
+                    failures += 1
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return failures
+
+if __name__ == '__main__':
+    import optparse
+    parser = optparse.OptionParser( usage="%prog [options] file.obj" )
+    parser.add_option( '-u', '--uniform', help='Sweep uniform offsets from 0 to MAX in STEPS steps.',
+                       nargs=2, dest='uniform', type='float', default=None, metavar='MAX STEPS' )
+    parser.add_option( '-r', '--random', help='Evaluate COUNT random per-face offset vectors, each offset in [0, MAX).',
+                       nargs=2, dest='random', type='float', default=None, metavar='COUNT MAX' )
+    parser.add_option( '', '--fraction', help='The probability that a face is offset in a random configuration (default 1).',
+                       action='store', dest='fraction', type='float', default=1.0 )
+    parser.add_option( '', '--seed', help='The seed of the first random configuration (default 0).',
+                       action='store', dest='seed', type='int', default=0 )
+    parser.add_option( '-o', '--out', help='The csv file to write results to (default sweep.csv).',
+                       action='store', dest='csv', default='sweep.csv' )
+    parser.add_option( '-m', '--meshes', help='A directory to write every offset surface to. By default, no meshes are written.',
+                       action='store', dest='meshDir', default=None )
+    parser.add_option( '-p', '--processes', help='The number of worker processes (defaults to the number of cpus).',
+                       action='store', dest='processes', type='int', default=None )
+    options, args = parser.parse_args()
+
+    if ( len( args ) != 1 ):
+        parser.print_help()
+        print( "\n !! You must specify exactly one input obj file" )
+        sys.exit( 1 )
+
+    specs = []
+    if ( options.uniform ):
+        specs += uniformSweep( options.uniform[0], int( options.uniform[1] ) )
+    if ( options.random ):
+        specs += randomSweep( int( options.random[0] ), options.random[1], options.fraction, options.seed )
+    if ( not specs ):
+        parser.print_help()
+        print( "\n !! You must specify a sweep (--uniform and/or --random)" )
+        sys.exit( 1 )
+
+    start = time.time()
+    failures = runSweep( args[0], specs, options.csv, options.meshDir, options.processes )
+    print( "Evaluated %d configurations in %.2f s (%d failed); results in %s" % ( len( specs ), time.time() - start, failures, options.csv ) )
@@ -0,0 +1,174 @@
+# Computes offset surfaces in a background thread.
+#
+# Computing a hull (qhull, welding, rounding) can take far longer than a frame,
+# so dragging an offset shouldn't wait for it. The caller's OffsetSurface (the
+# one being drawn) only records the requested offsets (see
+# OffsetSurface.assign_offset) and hands them to an OffsetWorker. The worker
+# computes hulls with its own OffsetSurface in a thread and the caller picks up
+# the finished hulls when it is ready (see OffsetWorker.poll).
+#
+# Only the latest request matters: a request replaces any request that hasn't
+# been started, so while a hull is being computed the intermediate drag
+# positions are dropped and the next hull is computed for the newest offsets.
+# Requests hold the offsets of every face (not a change to them), so dropping
+# one loses nothing.
+#
+# No OpenGL or Qt dependencies.
+
+import sys
+import threading
+import time
+import numpy as np
+import offset
+
+class OffsetWorker( object ):
+    '''Computes the hulls of an offset surface in a background thread. The
+    worker's methods are called from a single (e.g., the GUI) thread.'''
+    def __init__( self, surface ):
+        '''Constructor.
+
+        @param  surface     The offset.OffsetSurface whose hulls are computed. It
+                            is only read when a request is made and only
+                            written by poll().
+        '''
+        self.surface = surface
+        # The surface the hulls are computed with; only used by the thread. It
+        #   shares the surface's cache, so the hulls computed here are found by
+        #   the surface (e.g., when the worker is stopped) and vice versa.
+        self._compute = offset.OffsetSurface( surface.mesh, cache=surface.cache )
+        # Guards the request, the result and stopping.
+        self._condition = threading.Condition()
+        # The latest request which hasn't been started: ( serial, deltas, mode,
+        #   round_angle, skeleton ).
+        self._request = None
+        # The serial number of the latest request.
+        self._serial = 0
+        # The latest result: ( serial, hull, exc_info ).
+        self._result = None
+        # The serial number of the latest result given to the surface.
+        self._polled = 0
+        self._stopped = False
+        self._thread = threading.Thread( target=self._run, name='OffsetWorker' )
+        # The thread doesn't keep the application alive.
+        self._thread.daemon = True
+        self._thread.start()
+
+    def set_offset( self, offset, face_index ):
+        '''Sets the offset value of one or all faces of the surface and requests
+        its hull (see OffsetSurface.set_offset). The surface's hull doesn't
+        change until the new hull is polled.
+
+        @param  offset      The offset value. Negative values are treated as zero.
+        @param  face_index  If < 0, sets *all* faces, otherwise a valid index sets
+                            the single, indexed face.
+        '''
+        self.surface.assign_offset( offset, face_index )
+        self.request()
+
+    def request( self ):
+        '''Requests the hull for the surface's current offsets and mode,
+        replacing any request which hasn't been started.'''
+        with self._condition:
+            self._serial += 1
+            self._request = ( self._serial, self.surface.deltas.copy(), self.surface.mode,
+                              self.surface.round_angle, self.surface.skeleton )
+            self._condition.notify_all()
+
+    def busy( self ):
+        '''Reports if a requested hull hasn't been polled yet.'''
+        with self._condition:
+            return self._polled < self._serial
+
+    def wait( self, timeout=None ):
+        '''Waits until the latest requested hull has been computed.
+
+        @param  timeout     The longest time to wait (in seconds); None waits
+                            as long as it takes.
+        @returns True if the hull has been computed.
+        '''
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while ( not self._done() ):
+                if ( deadline is None ):
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if ( remaining <= 0 ):
+                        break
+                    self._condition.wait( remaining )
+            return self._done()
+
+    def _done( self ):
+        '''Reports if the latest request's result is available (the condition
+        must be held).'''
+        return self._result is not None and self._result[0] == self._serial
+
+    def poll( self ):
+        '''Gives the latest computed hull, if it is new, to the surface. An
+        error raised while computing the hull is raised here.
+
+        @returns True if the surface's hull was replaced.
+        '''
+        with self._condition:
+            result = self._result
+        if ( result is None or result[0] <= self._polled ):
+            return False
+        serial, hull, exc_info = result
+        self._polled = serial
+        if ( exc_info is not None ):
+            raise exc_info[0], exc_info[1], exc_info[2]
+        self.surface.hull = hull
+        return True
+
+    def stop( self ):
+        '''Stops the thread once it has finished the hull it is computing.'''
+        with self._condition:
+            self._stopped = True
+            self._request = None
+            self._condition.notify_all()
+
+    def _run( self ):
+        '''Computes the requested hulls until stopped.'''
+        while ( True ):
+            with self._condition:
+                while ( self._request is None and not self._stopped ):
+                    self._condition.wait()
+                if ( self._stopped ):
+                    return
+                serial, deltas, mode, round_angle, skeleton = self._request
+                self._request = None
+            hull = exc_info = None
+            try:
+                hull = self._compute_hull( deltas, mode, round_angle, skeleton )
+            except Exception:
+                exc_info = sys.exc_info()
+                # The polytope may not match the offsets; it is rebuilt next time.
+                self._compute.polytope = None
+            with self._condition:
+                self._result = ( serial, hull, exc_info )
+                self._condition.notify_all()
+
+    def _compute_hull( self, deltas, mode, round_angle, skeleton ):
+        '''Computes the hull for the given offsets and mode, updating the
+        polytope incrementally if only a single offset changed.
+
+        @returns The hull.
+        '''
+        surface = self._compute
+        # The skeleton is never modified; it is shared with the surface.
+        surface.skeleton = skeleton
+        new_mode = mode != surface.mode or round_angle != surface.round_angle
+        if ( new_mode ):
+            # The hull is computed for the new offsets below, rather than for
+            #   the old ones by set_mode().
+            surface.set_mode( mode, round_angle, recompute=False )
+        changed = np.flatnonzero( surface.deltas != deltas )
+        if ( not new_mode and surface.polytope is not None and changed.size == 0 ):
+            return surface.hull
+        if ( surface.polytope is not None and changed.size == 1 ):
+            surface.set_offset( deltas[ changed[0] ], changed[0] )
+        elif ( deltas.size and np.all( deltas == deltas[0] ) ):
+            surface.set_offset( deltas[0], -1 )
+        else:
+            surface.set_offsets( deltas )
+        return surface.hull
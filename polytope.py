@@ -0,0 +1,1046 @@
+# The convex polytope defined by the intersection of a set of half spaces.
+#
+# This module has no OpenGL dependencies; it only relies on numpy and scipy.
+
+import copy
+from distutils.version import LooseVersion
+import itertools
+import warnings
+import numpy as np
+import scipy
+from scipy.optimize import linprog, OptimizeWarning
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import HalfspaceIntersection, cKDTree
+from scipy.spatial.qhull import QhullError
+import timing
+
+# The distance within which a vertex is considered to lie on a plane.
+PLANE_TOLERANCE = 1e-6
+
+# The maximum number of entries in a block of the vertex-plane distance matrix.
+DIST_BLOCK_SIZE = 1 << 22
+
+# The number of planes the linear programs of chebyshevCenter() start with (and
+#   the most planes added to them at a time).
+CHEBYSHEV_PLANES = 32
+
+# The linear program solvers of chebyshevCenter(), in the order they are
+#   tried. The interior point method (scipy 1.0 and later) is much faster on
+#   larger programs than the simplex method, which older versions are limited
+#   to, but it fails to converge on some very symmetric polytopes (e.g., the
+#   dodecahedron) when the center is unbounded.
+if ( LooseVersion( scipy.__version__ ) >= LooseVersion( '1.0' ) ):
+    LINPROG_METHODS = ( 'interior-point', 'simplex' )
+else:
+    LINPROG_METHODS = ( 'simplex', )
+
+# The most iterations of the interior point method: it converges in a few dozen
+#   iterations or not at all.
+INTERIOR_POINT_ITERATIONS = 100
+
+# The distance (or rate, per unit of translation) below which a point off a plane
+#   is taken to be on it, as rounding error (see HalfspacePolytope._split_range()).
+DRIFT_TOLERANCE = 1e-12
+
+# The interior point given to qhull is replaced by the Chebyshev center when its
+#   distance to the nearest plane falls below this fraction of the (estimated)
+#   Chebyshev radius.
+CENTER_FRACTION = 0.5
+
+def basisFromZ(z_axis):
+    '''Creates an orthonormal basis from the z_axis.
+
+    @param z_axis   A numpy array of shape (3,). Assumed to be unit length.
+                    This will serve as the z-axis (third column) of the basis.
+    @returns A (3, 3) matrix.
+    '''
+    small_axis = np.argmin(np.abs(z_axis))
+    axes = [ [1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    perp_axis = np.array(axes[small_axis])
+    x_axis = np.cross(z_axis, perp_axis)
+    x_axis /= np.sqrt(np.sum(np.dot(x_axis, x_axis)))
+    y_axis = np.cross(z_axis, x_axis)
+    return np.column_stack((x_axis, y_axis, z_axis))
+
+def basesFromZ( z_axes ):
+    '''Creates an orthonormal basis for each of the given z-axes. It is the
+    vectorized form of basisFromZ.
+
+    @param z_axes   An (F, 3) array of floats. Each row is assumed to be unit length.
+    @returns An (F, 3, 3) array. The ith matrix is basisFromZ( z_axes[i] ).
+    '''
+    count = z_axes.shape[0]
+    perp_axes = np.zeros_like( z_axes )
+    perp_axes[ np.arange( count ), np.argmin( np.abs( z_axes ), axis=1 ) ] = 1.0
+    x_axes = np.cross( z_axes, perp_axes )
+    x_axes /= np.sqrt( np.sum( x_axes * x_axes, axis=1 ) )[:, np.newaxis]
+    y_axes = np.cross( z_axes, x_axes )
+    return np.stack( ( x_axes, y_axes, z_axes ), axis=2 )
+
+def orderFaces( vert_idx, face_idx, normals, vertex_data ):
+    '''Orders the vertices of many convex faces counter-clockwise at once.
+
+    The vertices of all faces are provided as a single flat list of
+    (vertex, face) pairs. Each vertex is projected into the basis of its
+    face's plane (centered on the face's centroid) and all of the vertices
+    are sorted by a single sort on (face, angle).
+
+    @param  vert_idx    An (M,) array of vertex indices in the range [0, N).
+    @param  face_idx    An (M,) array of face indices in the range [0, F). The
+                        face to which the corresponding vertex belongs.
+    @param  normals     An (F, 3) array of floats -- the unit normal of each
+                        face's plane.
+    @param  vertex_data An (N, 3) array of floats -- the vertex data. One per row.
+    @returns An (M,) array of indices into vert_idx/face_idx. It orders the
+    entries by increasing face index and each face's vertices in
+    counter-clockwise order (relative to the face normal).
+    '''
+    face_count = normals.shape[0]
+    positions = vertex_data[ vert_idx ]
+    sizes = np.bincount( face_idx, minlength=face_count )
+    centroids = np.empty( ( face_count, 3 ), dtype=np.float )
+    for axis in xrange( 3 ):
+        centroids[:, axis] = np.bincount( face_idx, weights=positions[:, axis],
+                                          minlength=face_count )
+    centroids /= np.maximum( sizes, 1 )[:, np.newaxis]
+    local = positions - centroids[ face_idx ]
+    bases = basesFromZ( normals )[ face_idx ]   # (M, 3, 3)
+    x = np.sum( local * bases[:, :, 0], axis=1 )
+    y = np.sum( local * bases[:, :, 1], axis=1 )
+    return np.lexsort( ( np.arctan2( y, x ), face_idx ) )
+
+def orderVertices(vert_idx, normal, vertex_data):
+    '''Given a list of vertex indices, a plane normal, and vertex data,
+    orders the indexed vertices in a counter-clockwise order.
+    Assumes that all:
+        1. indexed vertices are part of the convex hull.
+        2. The points are all lie on a plane perpendicular to the given
+            normal.
+
+    @param  vert_idx    A list of indices in the range [0, N)
+    @param  normal      An (3,) array of floats -- the normal to a plane.
+    @param  vertex-data A (N, 3) array of floats -- the vertex data. One per row.
+    @returns A list of indices, ordered in counter-clockwise direction (relative
+    to the provided normal.
+    '''
+    vert_idx = np.asarray( vert_idx, dtype=np.int )
+    face_idx = np.zeros( vert_idx.shape, dtype=np.int )
+    order = orderFaces( vert_idx, face_idx, normal[np.newaxis, :], vertex_data )
+    return vert_idx[ order ].tolist()
+
+def weldVertices( vertices, tolerance=PLANE_TOLERANCE ):
+    '''Merges vertices which are (nearly) coincident. Any two vertices closer than
+    the tolerance are merged and merging is transitive.
+
+    @param  vertices    An (N, 3) array of floats -- one vertex per row.
+    @param  tolerance   The distance below which two vertices are merged.
+    @returns A 2-tuple (welded, vertex_map). welded is a (K, 3) array of the
+    merged vertices (K <= N), each the mean of the vertices merged into it.
+    vertex_map is an (N,) int array; the ith vertex became welded[ vertex_map[i] ].
+    '''
+    vert_count = vertices.shape[0]
+    close = np.array( list( cKDTree( vertices ).query_pairs( tolerance ) ),
+                      dtype=np.int ).reshape( -1, 2 )
+    if ( close.size == 0 ):
+        return vertices, np.arange( vert_count )
+    graph = coo_matrix( ( np.ones( close.shape[0] ), ( close[:, 0], close[:, 1] ) ),
+                        shape=( vert_count, vert_count ) )
+    weld_count, vertex_map = connected_components( graph, directed=False )
+    counts = np.bincount( vertex_map, minlength=weld_count )
+    welded = np.empty( ( weld_count, 3 ), dtype=np.float )
+    for axis in xrange( 3 ):
+        welded[:, axis] = np.bincount( vertex_map, weights=vertices[:, axis],
+                                       minlength=weld_count ) / counts
+    return welded, vertex_map
+
+def weldRange( vertices, velocities, tolerance=PLANE_TOLERANCE ):
+    '''Computes how long moving vertices remain welded into one (see
+    weldVertices()): how long the vertices closer than the tolerance connect
+    all of them.
+
+    @param  vertices    An (N, 3) array of floats -- one vertex per row.
+    @param  velocities  An (N, 3) array of floats -- the velocity of each vertex.
+    @param  tolerance   The distance below which two vertices are merged.
+    @returns The time (>= 0) after which the vertices no longer weld into one;
+    infinite if they always do and zero if they don't to begin with.
+    '''
+    vert_count = vertices.shape[0]
+    if ( vert_count < 2 ):
+        return np.inf
+    first, second = np.triu_indices( vert_count, 1 )
+    gaps = vertices[ second ] - vertices[ first ]
+    speeds = velocities[ second ] - velocities[ first ]
+    # Each pair is closer than the tolerance until the positive root of
+    #   |gap + t * speed|^2 = tolerance^2.
+    a = np.sum( speeds ** 2, axis=1 )
+    b = np.sum( gaps * speeds, axis=1 )
+    c = np.sum( gaps ** 2, axis=1 ) - tolerance ** 2
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        times = ( np.sqrt( b ** 2 - a * c ) - b ) / a
+    times[ a == 0 ] = np.inf
+    times[ c >= 0 ] = -1.0
+    # The longest lasting pairs are merged until all of the vertices are one
+    #   (Kruskal's algorithm, on a union-find forest).
+    roots = range( vert_count )
+    def find( i ):
+        while ( roots[ i ] != i ):
+            roots[ i ] = roots[ roots[ i ] ]
+            i = roots[ i ]
+        return i
+    remaining = vert_count - 1
+    for pair in np.argsort( -times, kind='mergesort' ):
+        if ( times[ pair ] < 0 ):
+            break
+        root, other = find( first[ pair ] ), find( second[ pair ] )
+        if ( root != other ):
+            roots[ root ] = other
+            remaining -= 1
+            if ( remaining == 0 ):
+                return times[ pair ]
+    return 0.0
+
+def planeIncidence( planes, vertices, dual_facets, vertex_map=None, plane_map=None ):
+    '''Determines which vertices lie on which planes (to within PLANE_TOLERANCE).
+
+    Rather than measuring the distance of every vertex to every plane, this
+    relies on the dual facets reported by the half space intersection -- the
+    planes which define each intersection point. Those aren't complete:
+        1. A vertex on more than three planes may be reported as several
+           (nearly) coincident points, each with a subset of the planes. The
+           points should be welded (see weldVertices) and the vertex_map
+           provided; the welded vertex lies on the planes of all of its points.
+        2. Planes which don't contribute a facet to the polytope (e.g., a
+           duplicate of another plane or a plane that merely touches the
+           polytope) are omitted. These are tested against all vertices.
+
+    @param  planes      An (F, 4) array of floats -- one plane per row.
+    @param  vertices    An (N, 3) array of floats -- one vertex per row.
+    @param  dual_facets A list of lists of plane indices; the planes reported
+                        to define each intersection point.
+    @param  vertex_map  An optional array of ints mapping each intersection
+                        point to a row of vertices. If omitted, the ith dual
+                        facet belongs to the ith vertex.
+    @param  plane_map   An optional array of ints mapping the half spaces of
+                        the dual facets to rows of planes. If omitted, the
+                        dual facets index planes directly.
+    @returns A 2-tuple of (M,) int arrays (vertex indices, plane indices). The
+    ith entries indicate that a vertex lies on a plane.
+    '''
+    vert_count = vertices.shape[0]
+    plane_count = planes.shape[0]
+    lengths = np.array( [ len( f ) for f in dual_facets ], dtype=np.int )
+    if ( vertex_map is None ):
+        vertex_map = np.arange( lengths.size )
+    # The map may be 32-bit (e.g., from connected_components); the keys below
+    #   would overflow.
+    vert_idx = np.repeat( np.asarray( vertex_map, dtype=np.int ), lengths )
+    plane_idx = np.fromiter( itertools.chain.from_iterable( dual_facets ),
+                             dtype=np.int, count=lengths.sum() )
+    if ( plane_map is not None ):
+        plane_idx = np.asarray( plane_map, dtype=np.int )[ plane_idx ]
+    # Welded vertices can report the same plane more than once.
+    keys = np.unique( vert_idx * plane_count + plane_idx )
+    vert_idx = keys // plane_count
+    plane_idx = keys % plane_count
+
+    # Test the omitted planes against all vertices.
+    omitted = np.nonzero( np.bincount( plane_idx, minlength=plane_count ) == 0 )[0]
+    if ( omitted.size and vert_count ):
+        extra_verts = [ vert_idx ]
+        extra_planes = [ plane_idx ]
+        block = max( 1, DIST_BLOCK_SIZE // vert_count )
+        for start in xrange( 0, omitted.size, block ):
+            block_planes = omitted[ start:start + block ]
+            dist = np.dot( vertices, planes[ block_planes, :3 ].T ) + planes[ block_planes, 3 ]
+            rows, cols = np.nonzero( np.abs( dist ) < PLANE_TOLERANCE )
+            extra_verts.append( rows )
+            extra_planes.append( block_planes[ cols ] )
+        vert_idx = np.concatenate( extra_verts )
+        plane_idx = np.concatenate( extra_planes )
+    return vert_idx, plane_idx
+
+def faceEdges( faces ):
+    '''Finds the edges of a closed polyhedron from its faces. Each edge is a
+    pair of consecutive vertices in the two faces it borders (in opposite
+    order); it is kept from one of them.
+
+    @param  faces       A list of lists of vertex indices, each in
+                        counter-clockwise order. Empty faces are ignored.
+    @returns An (E, 2) int array of the vertex indices of each edge (the first
+    index is the smaller).
+    '''
+    face_sizes = np.array( [ len( f ) for f in faces ], dtype=np.int )
+    face_sizes = face_sizes[ face_sizes > 0 ]
+    starts = np.cumsum( face_sizes ) - face_sizes
+    first = np.fromiter( itertools.chain.from_iterable( faces ), dtype=np.int,
+                         count=face_sizes.sum() )
+    following = np.arange( 1, first.size + 1 )
+    following[ starts + face_sizes - 1 ] = starts
+    second = first[ following ]
+    keep = first < second
+    return np.column_stack( ( first[ keep ], second[ keep ] ) )
+
+def collapseEdges( vertices, faces, edges ):
+    '''Collapses edges of a polyhedron (e.g., edges too short to tell apart from
+    a vertex): the vertices joined by the edges are merged and merging is
+    transitive (see weldVertices()).
+
+    @param  vertices    An (N, 3) array of floats -- one vertex per row.
+    @param  faces       A list of lists of vertex indices, each in
+                        counter-clockwise order.
+    @param  edges       An (E, 2) int array of the vertex indices of the edges
+                        to collapse.
+    @returns A 2-tuple ( vertices, faces ) of the merged vertices (each the mean
+    of the vertices merged into it) and the faces with the merged vertices; a
+    face left with fewer than three vertices becomes empty.
+    '''
+    vert_count = vertices.shape[0]
+    graph = coo_matrix( ( np.ones( edges.shape[0] ), ( edges[:, 0], edges[:, 1] ) ),
+                        shape=( vert_count, vert_count ) )
+    weld_count, vertex_map = connected_components( graph, directed=False )
+    counts = np.bincount( vertex_map, minlength=weld_count )
+    welded = np.empty( ( weld_count, 3 ), dtype=np.float )
+    for axis in xrange( 3 ):
+        welded[:, axis] = np.bincount( vertex_map, weights=vertices[:, axis],
+                                       minlength=weld_count ) / counts
+
+    # A collapsed edge leaves two consecutive copies of a vertex in its faces.
+    face_sizes = np.array( [ len( f ) for f in faces ], dtype=np.int )
+    face_idx = np.repeat( np.arange( face_sizes.size ), face_sizes )
+    mapped = vertex_map[ np.fromiter( itertools.chain.from_iterable( faces ), dtype=np.int,
+                                      count=face_sizes.sum() ) ]
+    starts = np.cumsum( face_sizes ) - face_sizes
+    following = np.arange( 1, mapped.size + 1 )
+    nonempty = face_sizes > 0
+    following[ ( starts + face_sizes - 1 )[ nonempty ] ] = starts[ nonempty ]
+    keep = mapped != mapped[ following ]
+    kept_sizes = np.bincount( face_idx[ keep ], minlength=face_sizes.size )
+    keep &= kept_sizes[ face_idx ] >= 3
+    kept_sizes[ kept_sizes < 3 ] = 0
+    new_faces = [ f.tolist() for f in np.split( mapped[ keep ], np.cumsum( kept_sizes )[:-1] ) ]
+    return welded, new_faces
+
+def planeClearance( planes, point ):
+    '''Measures how far inside the half spaces a point is: its signed distance
+    to the nearest plane (negative if it is outside a half space).
+
+    @param  planes      An (F, 4) array of floats -- one plane per row.
+    @param  point       A (3,) array of floats.
+    @returns The distance (a float).
+    '''
+    lengths = np.sqrt( np.sum( planes[:, :3] ** 2, axis=1 ) )
+    return np.min( -( np.dot( planes[:, :3], point ) + planes[:, 3] ) / lengths )
+
+def _solveChebyshev( A, b, bounds ):
+    '''Solves the linear program of chebyshevCenter() for a set of planes,
+    trying each of LINPROG_METHODS until one solves it (or finds it
+    unbounded).
+
+    @param  A           An (N, 4) array: each plane's normal and its length.
+    @param  b           An (N,) array: the negated plane constants.
+    @param  bounds      The bounds of the center's coordinates and radius.
+    @returns The scipy.optimize.OptimizeResult of the last method tried; None
+    if its linear solves failed.
+    '''
+    result = None
+    for method in LINPROG_METHODS:
+        try:
+            with warnings.catch_warnings():
+                # Redundant and nearly degenerate constraints are expected; the
+                #   result's status reports whether the program was solved.
+                warnings.simplefilter( 'ignore', OptimizeWarning )
+                options = { 'maxiter' : INTERIOR_POINT_ITERATIONS } if method == 'interior-point' else {}
+                result = linprog( ( 0.0, 0.0, 0.0, -1.0 ), A_ub=A, b_ub=b, bounds=bounds, method=method,
+                                  options=options )
+        except ( np.linalg.LinAlgError, ValueError ):
+            # The interior point method's linear solves can fail on (nearly)
+            #   degenerate problems.
+            result = None
+            continue
+        if ( result.status in ( 0, 3 ) ):
+            break
+    return result
+
+def chebyshevCenter( planes, lower=None, upper=None, point=None ):
+    '''Finds the Chebyshev center of the intersection of half spaces: the center
+    of the largest ball inside all of them. It is the linear program
+
+        maximize r subject to n.x + |n| r <= -d for every plane [ n, d ].
+
+    Solving it for every plane is far too slow for large polytopes, so it is
+    solved for a small set of planes (those nearest the point); the planes the
+    solution lies outside of are added and it is solved again, until the
+    solution is inside all of the half spaces.
+
+    @param  planes      An (F, 4) array of floats -- one plane per row.
+    @param  lower       An optional (3,) array -- the smallest coordinates of
+                        the center (e.g., of the polytope's bounding box).
+    @param  upper       An optional (3,) array -- the largest coordinates.
+    @param  point       An optional (3,) array -- a point near the center.
+    @returns A 2-tuple ( center, radius ): a (3,) array and the distance of the
+    center to the nearest plane. The radius is not positive if the half
+    spaces have no common interior. If no linear program can be solved, the
+    center is None.
+    '''
+    plane_count = planes.shape[0]
+    lengths = np.sqrt( np.sum( planes[:, :3] ** 2, axis=1 ) )
+    A = np.column_stack( ( planes[:, :3], lengths ) )
+    b = -planes[:, 3]
+    if ( point is None ):
+        point = np.zeros( 3 )
+    # The planes are tried in order of their distance to the point.
+    by_distance = np.argsort( ( b - np.dot( planes[:, :3], point ) ) / lengths, kind='mergesort' )
+    active = np.zeros( plane_count, dtype=np.bool )
+    active[ by_distance[ :CHEBYSHEV_PLANES ] ] = True
+    tried = min( CHEBYSHEV_PLANES, plane_count )
+    if ( lower is None or upper is None ):
+        bounds = [ ( None, None ) ] * 4
+    else:
+        bounds = [ ( lo, hi ) for lo, hi in zip( lower, upper ) ] + [ ( None, None ) ]
+    tolerance = PLANE_TOLERANCE * ( 1.0 + np.max( np.abs( b ) ) )
+    while ( True ):
+        result = _solveChebyshev( A[ active ], b[ active ], bounds )
+        if ( result is None ):
+            return None, -np.inf
+        if ( result.status == 3 ):
+            # Unbounded: too few planes to enclose the center.
+            if ( tried == plane_count ):
+                return None, np.inf
+            active[ by_distance[ tried:tried + CHEBYSHEV_PLANES ] ] = True
+            tried = min( tried + CHEBYSHEV_PLANES, plane_count )
+            continue
+        if ( result.status != 0 ):
+            return None, -np.inf
+        excess = np.dot( A, result.x ) - b
+        excess[ active ] = -np.inf
+        violated = np.flatnonzero( excess > tolerance )
+        if ( violated.size == 0 ):
+            break
+        if ( violated.size > CHEBYSHEV_PLANES ):
+            violated = violated[ np.argpartition( -excess[ violated ], CHEBYSHEV_PLANES - 1 )[ :CHEBYSHEV_PLANES ] ]
+        active[ violated ] = True
+    center = result.x[:3]
+    return center, planeClearance( planes, center )
+
+class HalfspacePolytope( object ):
+    '''The convex polytope formed by the intersection of a set of half spaces.
+
+    Each half space is a row [nx, ny, nz, d] of the planes array; the point x
+    lies in the half space if n.x + d <= 0. The polytope's vertices and its
+    faces (one per plane) are kept consistent with the planes.
+
+    Translating a single plane along its normal usually leaves the
+    combinatorial structure of the polytope unchanged: every vertex keeps the
+    same three defining planes and only the vertices lying on the translated
+    plane move. In that case, those vertices are recomputed by solving the 3x3
+    systems of their defining planes. The half space intersection is only
+    recomputed from scratch when the structure changes.
+
+    The same holds when every plane is translated at once (e.g., a uniform
+    offset) as long as the polytope is simple -- every vertex lies on exactly
+    three planes. Each vertex's position is then a linear function of the
+    plane constants: the product of the inverse of its three planes' normals
+    (computed once per structure) with their constants. The structure is
+    unchanged if every edge keeps a positive length along its direction and no
+    plane that doesn't touch the polytope starts to. (Both tests are linear in
+    the constants, so they hold for the entire translation if they hold at its
+    end.)
+
+    The vertex and face data (vertices, faces, vertex_planes, degenerate) are
+    never modified in place; changes replace them. So they can be safely shared
+    with other objects (and copies of this polytope).
+
+    Qhull needs a point inside all of the half spaces and is most robust when
+    the point is well inside. The point is kept near the Chebyshev center (see
+    chebyshevCenter()): it is only recomputed when the planes have moved
+    enough that the point is much closer to a plane than the center could be.
+
+    When a plane moves inward and the structure changes, the new half space is
+    added to the previous half space intersection (in qhull's incremental
+    mode) rather than recomputing it; the plane's old half space no longer
+    touches the polytope. A plane moving outward can't be added that way.
+    '''
+    def __init__( self, planes, feasible_point ):
+        '''Constructor.
+
+        @param  planes          An (F, 4) array of floats -- one plane per row.
+                                The array is copied.
+        @param  feasible_point  A (3,) array of floats. A point strictly inside
+                                all of the half spaces.
+        '''
+        self.planes = np.array( planes, dtype=np.float )
+        self.feasible_point = feasible_point
+        # The lengths of the planes' normals.
+        self._normal_lengths = np.sqrt( np.sum( self.planes[:, :3] ** 2, axis=1 ) )
+        # An upper bound on the distance of the Chebyshev center to the nearest
+        #   plane (-inf if it is unknown).
+        self._chebyshev_radius = -np.inf
+        # The incremental half space intersection of the current polytope (None
+        #   if there is none), the plane of each of its half spaces and the
+        #   constant term each plane had when it was (last) added.
+        self._qhull = None
+        self._qhull_planes = None
+        self._qhull_constants = None
+        # The data for translating every plane without changing the structure
+        #   (see _simple_structure()); None until it is needed.
+        self._structure = None
+        # The range of a plane's constant over which its face's vertices remain
+        #   clear of the planes away from the face (see _clear_of_remote_planes()):
+        #   ( index, lower, upper ) or None.
+        self._clearance = None
+        # An (N, 3) array of vertex positions -- one vertex per row.
+        self.vertices = None
+        # A length F list of lists of vertex indices. The ith list is the face
+        #   lying on the ith plane in counter-clockwise order; it is empty if the
+        #   plane doesn't touch the polytope.
+        self.faces = []
+        # An (N, 3) array of the indices of the three planes each vertex lies on.
+        #   The row is meaningless for degenerate vertices.
+        self.vertex_planes = None
+        # An (N,) array of bools. True for the vertices that do not lie on
+        #   exactly three planes.
+        self.degenerate = None
+        self.rebuild()
+
+    def face_count( self ):
+        '''Reports the number of planes (and, therefore, faces)'''
+        return self.planes.shape[0]
+
+    def copy( self ):
+        '''Creates an independent copy of the polytope. Only the planes are
+        copied; the vertex and face data are shared.'''
+        result = copy.copy( self )
+        result.planes = self.planes.copy()
+        # Adding half spaces to a shared intersection would change both.
+        result._qhull = result._qhull_planes = result._qhull_constants = None
+        return result
+
+    def byte_size( self ):
+        '''Estimates the memory used by the polytope's data (in bytes).'''
+        index_count = sum( len( f ) for f in self.faces )
+        # Each face is a python list of python ints.
+        face_bytes = 72 * len( self.faces ) + 32 * index_count
+        return ( self.planes.nbytes + self.vertices.nbytes + self.vertex_planes.nbytes +
+                 self.degenerate.nbytes + face_bytes )
+
+    def set_plane_constants( self, d ):
+        '''Sets the constant term of every plane. If the polytope is simple and
+        its combinatorial structure doesn't change, only the vertices are
+        recomputed; otherwise the polytope is rebuilt.
+
+        @param  d       A scalar or an (F,) array of floats.
+        @returns True if only the vertices were recomputed, False if the
+                 polytope was rebuilt.
+        '''
+        self._moved_planes( self.planes[:, 3] - d )
+        self.planes[:, 3] = d
+        self._clearance = None
+        with timing.stage( 'batched solve' ):
+            translated = self._translate_planes()
+        if ( not translated ):
+            self.rebuild()
+        return translated
+
+    def set_plane_constant( self, index, d ):
+        '''Sets the constant term of a single plane -- translating it along its
+        normal. The polytope is updated incrementally when the translation
+        doesn't change its combinatorial structure and rebuilt otherwise.
+
+        @param  index   The index of the plane to translate.
+        @param  d       The new constant term of the plane.
+        @returns True if the polytope was updated incrementally, False if its
+                 vertices and faces were recomputed.
+        '''
+        old_d = self.planes[ index, 3 ]
+        if ( d == old_d ):
+            return True
+        self._moved_planes( np.array( [ old_d - d ] ), np.array( [ index ] ) )
+        self.planes[ index, 3 ] = d
+        if ( self._clearance is not None and self._clearance[0] != index ):
+            self._clearance = None
+        inward = d > old_d
+        with timing.stage( 'incremental update' ):
+            translated = self._translate_plane( index, inward )
+        if ( translated ):
+            return True
+        if ( not inward or not self._add_halfspace( index ) ):
+            self.rebuild()
+        return False
+
+    def plane_range( self, index ):
+        '''Computes the range of the indexed plane's constant term over which
+        translating the plane leaves the polytope's combinatorial structure
+        unchanged (see _translate_plane()). At either end of the range, a vertex
+        reaches another plane: e.g., an edge collapses, a face vanishes or a
+        plane starts touching the polytope.
+
+        @param  index   The index of the plane.
+        @returns A 2-tuple ( lower, upper ) of the range's ends; either may be
+        infinite. None if any translation changes the structure (a degenerate
+        vertex lies on the plane).
+        '''
+        plane = self.planes[ index ]
+        lower, upper = -np.inf, np.inf
+        moved = np.array( self.faces[ index ], dtype=np.int )
+        if ( np.any( self.degenerate[ moved ] ) ):
+            return None
+        # Raising the constant moves the plane inward, toward the fixed vertices.
+        fixed = np.ones( self.vertices.shape[0], dtype=np.bool )
+        fixed[ moved ] = False
+        if ( np.any( fixed ) ):
+            dist = np.dot( self.vertices[ fixed ], plane[:3] ) + plane[3]
+            upper = plane[3] - dist.max()
+        if ( moved.size == 0 ):
+            return lower, upper
+
+        # Each moved vertex solves A x = -b, so it moves by the negated column of
+        #   the inverse of A corresponding to the plane per unit of the constant.
+        vert_planes = self.vertex_planes[ moved ]                         # (M, 3)
+        inverses = np.linalg.inv( self.planes[ vert_planes, :3 ] )        # (M, 3, 3)
+        column = np.argmax( vert_planes == index, axis=1 )
+        velocity = -inverses[ np.arange( moved.size ), :, column ]        # (M, 3)
+        positions = self.vertices[ moved ]
+        block = max( 1, DIST_BLOCK_SIZE // moved.size )
+        for start in xrange( 0, self.face_count(), block ):
+            block_planes = self.planes[ start:start + block ]
+            dist = np.dot( positions, block_planes[:, :3].T ) + block_planes[:, 3]   # (M, B)
+            rate = np.dot( velocity, block_planes[:, :3].T )
+            # A vertex's own planes are never reached.
+            own = ( vert_planes >= start ) & ( vert_planes < start + block_planes.shape[0] )
+            rows = np.repeat( np.arange( moved.size ), 3 ).reshape( -1, 3 )
+            rate[ rows[ own ], vert_planes[ own ] - start ] = 0.0
+            rising = rate > 0
+            if ( np.any( rising ) ):
+                upper = min( upper, plane[3] + np.min( -dist[ rising ] / rate[ rising ] ) )
+            falling = rate < 0
+            if ( np.any( falling ) ):
+                lower = max( lower, plane[3] + np.max( -dist[ falling ] / rate[ falling ] ) )
+        return lower, upper
+
+    def translation_range( self, rates ):
+        '''Computes how the vertices move when every plane is translated at
+        once -- the constant term of each plane changing at its own rate -- and
+        the range of the translation over which the polytope's combinatorial
+        structure is unchanged.
+
+        Each vertex moves so that it stays on all of its planes (in the least
+        squares sense for a degenerate vertex). At either end of the range an
+        edge collapses, a plane without a face starts touching the polytope or a
+        degenerate vertex splits apart: the points its planes meet in (three at
+        a time) no longer weld into one (see _split_range()).
+
+        @param  rates   An (F,) array of floats: the change of each plane's
+                        constant per unit of translation.
+        @returns A 3-tuple ( lower, upper, velocities ): the ends of the range
+        (relative to the current planes; lower <= 0 <= upper, either may be
+        infinite) and an (N, 3) array of the change of each vertex per unit of
+        translation. None if the current planes are already outside the range
+        (a degenerate vertex is farther than the tolerance from a plane).
+        '''
+        vert_count = self.vertices.shape[0]
+        if ( vert_count == 0 ):
+            return None
+        # The velocity of a vertex satisfies n.v = -rate for each of its planes;
+        #   it is solved in the least squares sense (exactly, for three planes).
+        face_sizes = np.array( [ len( f ) for f in self.faces ], dtype=np.int )
+        vert_idx = np.fromiter( itertools.chain.from_iterable( self.faces ), dtype=np.int,
+                                count=face_sizes.sum() )
+        plane_idx = np.repeat( np.arange( self.face_count() ), face_sizes )
+        normals = self.planes[ plane_idx, :3 ]
+        products = normals[:, :, np.newaxis] * normals[:, np.newaxis, :]
+        A = np.empty( ( vert_count, 3, 3 ) )
+        for i in xrange( 3 ):
+            for j in xrange( 3 ):
+                A[:, i, j] = np.bincount( vert_idx, weights=products[:, i, j], minlength=vert_count )
+        b = np.empty( ( vert_count, 3 ) )
+        for i in xrange( 3 ):
+            b[:, i] = np.bincount( vert_idx, weights=-rates[ plane_idx ] * normals[:, i],
+                                   minlength=vert_count )
+        velocities = np.linalg.solve( A, b[:, :, np.newaxis] )[:, :, 0]
+
+        lower, upper = -np.inf, np.inf
+        # A degenerate vertex stands for the vertices it splits into (see
+        #   weldVertices()) only while they remain welded together.
+        degenerate = self.degenerate[ vert_idx ]
+        dist = np.sum( normals[ degenerate ] * self.vertices[ vert_idx[ degenerate ] ], axis=1 )
+        dist += self.planes[ plane_idx[ degenerate ], 3 ]
+        if ( np.any( np.abs( dist ) > PLANE_TOLERANCE ) ):
+            return None
+        order = np.argsort( vert_idx, kind='mergesort' )
+        bounds = np.searchsorted( vert_idx[ order ], np.arange( vert_count + 1 ) )
+        for vertex in np.flatnonzero( self.degenerate ):
+            planes = plane_idx[ order[ bounds[ vertex ]:bounds[ vertex + 1 ] ] ]
+            forward, backward = self._split_range( planes, rates )
+            upper = min( upper, forward )
+            lower = max( lower, -backward )
+        edges = faceEdges( self.faces )
+        offsets = self.vertices[ edges[:, 1] ] - self.vertices[ edges[:, 0] ]
+        lengths = np.sqrt( np.sum( offsets ** 2, axis=1 ) )
+        rate = np.sum( ( velocities[ edges[:, 1] ] - velocities[ edges[:, 0] ] ) * offsets, axis=1 ) / lengths
+        if ( np.any( rate < 0 ) ):
+            upper = min( upper, np.min( -lengths[ rate < 0 ] / rate[ rate < 0 ] ) )
+        if ( np.any( rate > 0 ) ):
+            lower = max( lower, np.max( -lengths[ rate > 0 ] / rate[ rate > 0 ] ) )
+        # The planes without a face must remain clear of the polytope (farther
+        #   than the tolerance from each vertex; see planeIncidence()).
+        empty = np.flatnonzero( face_sizes == 0 )
+        block = max( 1, DIST_BLOCK_SIZE // vert_count )
+        for start in xrange( 0, empty.size, block ):
+            block_planes = self.planes[ empty[ start:start + block ] ]
+            dist = np.dot( self.vertices, block_planes[:, :3].T ) + block_planes[:, 3] + PLANE_TOLERANCE
+            rate = np.dot( velocities, block_planes[:, :3].T ) + rates[ empty[ start:start + block ] ]
+            if ( np.any( rate > 0 ) ):
+                upper = min( upper, np.min( -dist[ rate > 0 ] / rate[ rate > 0 ] ) )
+            if ( np.any( rate < 0 ) ):
+                lower = max( lower, np.max( -dist[ rate < 0 ] / rate[ rate < 0 ] ) )
+        if ( lower > 0 or upper < 0 ):
+            return None
+        return lower, upper, velocities
+
+    def _split_range( self, planes, rates ):
+        '''Computes how far a degenerate vertex may be translated (see
+        translation_range()) before it splits apart.
+
+        Three of its planes at a time meet in a point; while a point is on
+        the inner side of the vertex's other planes, it is one of the vertices
+        the vertex splits into. It splits apart once those no longer weld into
+        one (see weldRange()).
+
+        @param  planes  The indices of the vertex's planes.
+        @param  rates   An (F,) array of floats: the change of each plane's
+                        constant per unit of translation.
+        @returns A 2-tuple ( forward, backward ) of non-negative floats: how
+        far the translation may go in either direction (either may be infinite).
+        '''
+        triples = np.array( list( itertools.combinations( planes, 3 ) ), dtype=np.int )
+        A = self.planes[ triples, :3 ]
+        # Three (nearly) parallel planes don't meet in a point.
+        solvable = np.abs( np.linalg.det( A ) ) > DRIFT_TOLERANCE
+        triples, A = triples[ solvable ], A[ solvable ]
+        points = np.linalg.solve( A, -self.planes[ triples, 3:4 ] )[:, :, 0]
+        velocities = np.linalg.solve( A, -rates[ triples ][:, :, np.newaxis] )[:, :, 0]
+        # The distance of each point outside each plane and its rate of change.
+        outside = np.dot( points, self.planes[ planes, :3 ].T ) + self.planes[ planes, 3 ]
+        drift = np.dot( velocities, self.planes[ planes, :3 ].T ) + rates[ planes ]
+        ranges = []
+        for sign in ( 1, -1 ):
+            # Each point is a vertex from when it has crossed to the inner side
+            #   of all of the planes until it crosses back over one of them.
+            with np.errstate( divide='ignore', invalid='ignore' ):
+                crossing = ( DRIFT_TOLERANCE - outside ) / ( sign * drift )
+            inside = outside <= DRIFT_TOLERANCE
+            entering = np.where( inside, 0.0, np.where( sign * drift < -DRIFT_TOLERANCE, crossing, np.inf ) )
+            leaving = np.where( sign * drift > DRIFT_TOLERANCE, crossing, np.inf )
+            enter = np.max( entering, axis=1 )
+            leave = np.min( leaving, axis=1 )
+            times = np.unique( np.concatenate( ( [ 0.0 ], enter, leave ) ) )
+            times = times[ ( times >= 0 ) & np.isfinite( times ) ]
+            limit = np.inf
+            for time, end in zip( times, np.append( times[1:], np.inf ) ):
+                current = ( enter <= time ) & ( leave > time )
+                life = weldRange( points[ current ] + sign * time * velocities[ current ],
+                                  sign * velocities[ current ] )
+                if ( time + life < end ):
+                    limit = time + life
+                    break
+            ranges.append( limit )
+        return tuple( ranges )
+
+    def _moved_planes( self, outward, indices=None ):
+        '''Accounts for planes moving in the bound on the Chebyshev radius: it
+        grows by (at most) the farthest any plane moved outward.
+
+        @param  outward     The decrease of the constant term of each moved
+                            plane (the distance it moved outward, scaled by
+                            the length of its normal).
+        @param  indices     The indices of the moved planes; all of them if None.
+        '''
+        lengths = self._normal_lengths if indices is None else self._normal_lengths[ indices ]
+        if ( np.size( outward ) ):
+            self._chebyshev_radius += max( 0.0, np.max( outward / lengths ) )
+
+    def _update_feasible_point( self, force=False ):
+        '''Moves the point given to qhull to the Chebyshev center of the planes
+        if it has become too close to a plane (see CENTER_FRACTION).
+
+        @param  force   If True, the Chebyshev center is computed regardless.
+        @returns True if the Chebyshev center was computed.
+        '''
+        clearance = planeClearance( self.planes, self.feasible_point )
+        if ( self._chebyshev_radius == -np.inf ):
+            # The initial point is assumed to be near the center.
+            self._chebyshev_radius = clearance
+        if ( not force and clearance > 0 and clearance >= CENTER_FRACTION * self._chebyshev_radius ):
+            return False
+        with timing.stage( 'chebyshev center' ):
+            if ( self.vertices is not None and self.vertices.shape[0] ):
+                # Moved planes don't move the polytope far; its previous bounds
+                #   keep the linear programs bounded.
+                extent = self.vertices.max( axis=0 ) - self.vertices.min( axis=0 )
+                center, radius = chebyshevCenter( self.planes, self.vertices.min( axis=0 ) - extent,
+                                                  self.vertices.max( axis=0 ) + extent, self.feasible_point )
+            else:
+                center, radius = chebyshevCenter( self.planes, point=self.feasible_point )
+        if ( center is not None and radius > clearance ):
+            self.feasible_point = center
+            self._chebyshev_radius = radius
+        else:
+            self._chebyshev_radius = clearance
+        return True
+
+    def rebuild( self ):
+        '''Computes the vertices and faces from scratch from the current planes.'''
+        centered = self._update_feasible_point()
+        try:
+            with timing.stage( 'qhull' ):
+                self._qhull = HalfspaceIntersection( self.planes, self.feasible_point, incremental=True )
+        except QhullError:
+            # A point near a plane can make qhull fail; it is tried once more
+            #   from the Chebyshev center.
+            if ( centered ):
+                raise
+            self._update_feasible_point( force=True )
+            with timing.stage( 'qhull' ):
+                self._qhull = HalfspaceIntersection( self.planes, self.feasible_point, incremental=True )
+        self._qhull_planes = np.arange( self.face_count() )
+        self._qhull_constants = self.planes[:, 3].copy()
+        self._extract()
+
+    def _add_halfspace( self, index ):
+        '''Adds the indexed plane's (moved inward) half space to the
+        incremental half space intersection and extracts the vertices and
+        faces. The half spaces of any other planes which have moved inward
+        since they were added (see _translate_plane()) are added as well.
+
+        @param  index   The index of the plane.
+        @returns True if the half spaces were added, False if the polytope must
+        be rebuilt instead (e.g., a plane has moved outward or no longer has
+        the feasible point well inside).
+        '''
+        if ( self._qhull is None ):
+            return False
+        inward = self.planes[:, 3] - self._qhull_constants
+        if ( np.any( inward < 0 ) ):
+            return False
+        added = np.flatnonzero( inward > 0 )
+        if ( self._qhull_planes.size + added.size > 2 * self.face_count() ):
+            return False
+        planes = self.planes[ added ]
+        clearance = -( np.dot( planes[:, :3], self.feasible_point ) + planes[:, 3] ) / self._normal_lengths[ added ]
+        if ( np.any( clearance < CENTER_FRACTION * self._chebyshev_radius ) ):
+            return False
+        try:
+            with timing.stage( 'qhull' ):
+                # Some versions of scipy can only add one half space at a time.
+                for plane in planes:
+                    self._qhull.add_halfspaces( plane[ np.newaxis, : ] )
+        except QhullError:
+            self._qhull = None
+            return False
+        self._qhull_planes = np.append( self._qhull_planes, added )
+        self._qhull_constants[ added ] = planes[:, 3]
+        self._extract()
+        return True
+
+    def _extract( self ):
+        '''Computes the vertices and faces from the half space intersection.'''
+        hs = self._qhull
+        # Vertices on more than three planes are reported as multiple (nearly)
+        #   coincident intersections; merge them into a single vertex.
+        with timing.stage( 'weld' ):
+            verts, vertex_map = weldVertices( hs.intersections )
+        vert_count = verts.shape[0]
+        with timing.stage( 'face extraction' ):
+            vert_idx, plane_idx = planeIncidence( self.planes, verts, hs.dual_facets, vertex_map,
+                                                  self._qhull_planes )
+
+        # The faces: the vertices on each plane in counter-clockwise order.
+        with timing.stage( 'face ordering' ):
+            order = orderFaces( vert_idx, plane_idx, self.planes[:, :3], verts )
+            face_sizes = np.bincount( plane_idx, minlength=self.face_count() )
+            faces = [ f.tolist() for f in np.split( vert_idx[ order ], np.cumsum( face_sizes )[:-1] ) ]
+
+        # The planes incident to each vertex.
+        order = np.lexsort( ( plane_idx, vert_idx ) )
+        vert_degree = np.bincount( vert_idx, minlength=vert_count )
+        self.degenerate = vert_degree != 3
+        first = np.cumsum( vert_degree ) - vert_degree
+        simple = np.nonzero( ~self.degenerate )[0]
+        self.vertex_planes = np.zeros( ( vert_count, 3 ), dtype=np.int )
+        self.vertex_planes[ simple ] = plane_idx[ order ][ first[ simple, np.newaxis ] + np.arange( 3 ) ]
+        self.vertices = verts
+        self.faces = faces
+        self._structure = None
+        self._clearance = None
+
+    def _translate_plane( self, index, inward ):
+        '''Attempts to update the vertices for the translation of the indexed
+        plane without changing the polytope's combinatorial structure. The plane
+        has already been set to its new value.
+
+        Each vertex on the plane moves linearly along the line where its other
+        two planes meet and every other vertex is fixed. The structure is
+        unchanged if the moved vertices remain strictly inside the other half
+        spaces and the fixed vertices remain strictly inside the translated
+        half space. (A vertex landing *on* another plane changes the structure
+        as well.) Only the planes and vertices near the plane's face are
+        tested, unless the moved vertices come near any other plane.
+
+        @param  index   The index of the translated plane.
+        @param  inward  True if the plane moved toward the inside of its half
+                        space (i.e., the polytope can only shrink).
+        @returns True if the vertices were updated, False if the structure
+                 changes (the vertices are left untouched).
+        '''
+        plane = self.planes[ index ]
+        moved = np.array( self.faces[ index ], dtype=np.int )
+        if ( moved.size == 0 ):
+            if ( inward ):
+                # The translated plane may cut off any vertex.
+                dist = np.dot( self.vertices, plane[:3] ) + plane[3]
+                if ( np.any( dist > -PLANE_TOLERANCE ) ):
+                    return False
+            # The plane doesn't touch the polytope and still doesn't.
+            return True
+        if ( np.any( self.degenerate[ moved ] ) ):
+            # A degenerate vertex splits apart when one of its planes moves.
+            return False
+
+        ring, local = self._neighborhood( index )
+        if ( inward ):
+            # The translated plane may cut off vertices that don't lie on it.
+            #   The polytope is convex, so the farthest of them along the
+            #   plane's normal shares an edge with the face.
+            dist = np.dot( self.vertices[ ring ], plane[:3] ) + plane[3]
+            if ( np.any( dist > -PLANE_TOLERANCE ) ):
+                return False
+
+        vert_planes = self.vertex_planes[ moved ]           # (M, 3)
+        A = self.planes[ vert_planes, :3 ]                  # (M, 3, 3)
+        b = -self.planes[ vert_planes, 3 ]                  # (M, 3)
+        positions = np.linalg.solve( A, b[:, :, np.newaxis] )[:, :, 0]
+
+        dist = np.dot( positions, self.planes[ local, :3 ].T ) + self.planes[ local, 3 ]  # (M, L)
+        dist[ np.any( local[np.newaxis, np.newaxis, :] == vert_planes[:, :, np.newaxis], axis=1 ) ] = -np.inf
+        if ( np.any( dist > -PLANE_TOLERANCE ) ):
+            return False
+        if ( not self._clear_of_remote_planes( index, local, A, positions ) ):
+            return False
+
+        # The vertex array is replaced, not modified, so that anyone holding on
+        #   to the previous vertices is unaffected.
+        verts = self.vertices.copy()
+        verts[ moved ] = positions
+        self.vertices = verts
+        return True
+
+    def _neighborhood( self, index ):
+        '''Finds the vertices and planes near the indexed plane's face: the
+        vertices sharing a face with its vertices (its one-ring) and the planes
+        of all of those vertices.
+
+        @param  index   The index of the plane; its face's vertices must not be
+                        degenerate.
+        @returns A 2-tuple of int arrays ( ring, planes ): the vertices of the
+        one-ring and the planes of the face's and the one-ring's vertices (only
+        three planes of a degenerate vertex are known; see vertex_planes).
+        '''
+        face = self.faces[ index ]
+        adjacent = np.unique( self.vertex_planes[ face ] )
+        neighbors = np.fromiter( itertools.chain.from_iterable( self.faces[ i ] for i in adjacent ),
+                                 dtype=np.int )
+        ring = np.setdiff1d( neighbors, face )
+        simple = ring[ ~self.degenerate[ ring ] ]
+        return ring, np.union1d( adjacent, self.vertex_planes[ simple ].ravel() )
+
+    def _clear_of_remote_planes( self, index, local, A, positions ):
+        '''Tests the moved vertices of a translated plane's face against the
+        planes not near the face. The vertices move linearly with the plane's
+        constant, so when they are tested one by one, the range of the constant
+        over which they remain clear is kept; the planes are tested again only
+        once the constant leaves it.
+
+        @param  index       The index of the translated plane.
+        @param  local       An int array of the indices of the planes near the
+                            face (see _neighborhood()); they aren't tested.
+        @param  A           An (M, 3, 3) array: the normals of each moved
+                            vertex's planes.
+        @param  positions   An (M, 3) array of the moved vertices' positions.
+        @returns True if every vertex is strictly inside the planes' half spaces.
+        '''
+        constant = self.planes[ index, 3 ]
+        if ( self._clearance is not None and self._clearance[0] == index ):
+            lower, upper = self._clearance[1:]
+            if ( lower < constant < upper ):
+                return True
+        self._clearance = None
+        remote = np.ones( self.face_count(), dtype=np.bool )
+        remote[ local ] = False
+        remote[ index ] = False
+        planes = self.planes[ remote ]
+        dist = np.dot( positions, planes[:, :3].T ) + planes[:, 3]       # (M, R)
+        if ( np.any( dist > -PLANE_TOLERANCE ) ):
+            return False
+        # The change of each vertex per unit of the constant (see plane_range()).
+        unit = -( self.vertex_planes[ self.faces[ index ] ] == index ).astype( np.float )
+        velocity = np.linalg.solve( A, unit[:, :, np.newaxis] )[:, :, 0]
+        rate = np.dot( velocity, planes[:, :3].T )                        # (M, R)
+        lower, upper = -np.inf, np.inf
+        if ( np.any( rate > 0 ) ):
+            upper = np.min( ( -PLANE_TOLERANCE - dist[ rate > 0 ] ) / rate[ rate > 0 ] )
+        if ( np.any( rate < 0 ) ):
+            lower = np.max( ( -PLANE_TOLERANCE - dist[ rate < 0 ] ) / rate[ rate < 0 ] )
+        self._clearance = ( index, constant + lower, constant + upper )
+        return True
+
+    def _simple_structure( self ):
+        '''Computes (once per structure) the data for translating every plane
+        of a simple polytope (see _translate_planes()).
+
+        @returns None if the polytope isn't simple, otherwise a 4-tuple
+        ( inverses, edges, directions, empty ). inverses is an (N, 3, 3) array:
+        the inverse of the normals of each vertex's planes. edges is an (E, 2)
+        int array of the vertex indices of each edge and directions an (E, 3)
+        array of the unit vectors from each edge's first vertex to its second.
+        empty is an int array of the indices of the planes without a face.
+        '''
+        if ( self._structure is None ):
+            vert_count = self.vertices.shape[0]
+            if ( vert_count == 0 or np.any( self.degenerate ) ):
+                return None
+            inverses = np.linalg.inv( self.planes[ self.vertex_planes, :3 ] )
+            edges = faceEdges( self.faces )
+            directions = self.vertices[ edges[:, 1] ] - self.vertices[ edges[:, 0] ]
+            directions /= np.sqrt( np.sum( directions ** 2, axis=1 ) )[:, np.newaxis]
+            empty = np.array( [ i for i, f in enumerate( self.faces ) if not f ], dtype=np.int )
+            self._structure = ( inverses, edges, directions, empty )
+        return self._structure
+
+    def _translate_planes( self ):
+        '''Attempts to update the vertices for the translation of every plane
+        without changing the polytope's combinatorial structure. The planes have
+        already been set to their new values.
+
+        @returns True if the vertices were updated, False if the polytope isn't
+                 simple or the structure changes (the vertices are left
+                 untouched).
+        '''
+        structure = None if self.degenerate is None else self._simple_structure()
+        if ( structure is None ):
+            return False
+        inverses, edges, directions, empty = structure
+        b = -self.planes[ self.vertex_planes, 3 ]                           # (N, 3)
+        positions = np.einsum( 'nij,nj->ni', inverses, b )
+        lengths = np.sum( ( positions[ edges[:, 1] ] - positions[ edges[:, 0] ] ) * directions, axis=1 )
+        if ( not np.all( lengths > PLANE_TOLERANCE ) ):
+            return False
+        # The planes without a face must remain clear of the polytope.
+        block = max( 1, DIST_BLOCK_SIZE // positions.shape[0] )
+        for start in xrange( 0, empty.size, block ):
+            block_planes = empty[ start:start + block ]
+            dist = np.dot( positions, self.planes[ block_planes, :3 ].T ) + self.planes[ block_planes, 3 ]
+            if ( np.any( dist > -PLANE_TOLERANCE ) ):
+                return False
+        self.vertices = positions
+        return True
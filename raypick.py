@@ -0,0 +1,208 @@
+# Picking by casting rays on the CPU, without any OpenGL dependencies.
+#
+# A ray (e.g., from GLCamera.pickRay) is intersected with the geometry directly.
+# Convex polytopes, given as the intersection of half spaces, are tested against
+# all of their planes at once (a "slab" test). Arbitrary triangle meshes are
+# tested through a bounding volume hierarchy, so only the triangles whose boxes
+# the ray passes through are tested.
+#
+# As with OpenGL picking (where back faces are culled), only surfaces which face
+# the ray's origin are hit.
+
+import numpy as np
+
+# Ray directions (dotted with plane normals) smaller than this are considered
+#   parallel to the plane.
+PARALLEL_EPS = 1e-12
+
+def rayConvex( origin, direction, planes ):
+    '''Intersects a ray with a convex polytope.
+
+    @param  origin      The origin of the ray (a length-3 array).
+    @param  direction   The direction of the ray (a length-3 array).
+    @param  planes      An Fx4 array of planes ( n, d ); the polytope is the
+                        intersection of the half spaces n.x + d <= 0.
+    @returns A 2-tuple ( t, plane ): the ray parameter of the point at which the
+    ray enters the polytope and the index of the plane it enters through. If the
+    ray misses the polytope (or starts inside of it), ( inf, -1 ).
+    '''
+    # The ray crosses plane i at t = -( n.o + d ) / n.dir.
+    heights = np.dot( planes[:, :3], origin ) + planes[:, 3]
+    speeds = np.dot( planes[:, :3], direction )
+    parallel = np.abs( speeds ) < PARALLEL_EPS
+    if ( np.any( heights[ parallel ] > 0 ) ):
+        # Parallel to, and outside of, one of the half spaces.
+        return np.inf, -1
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        t = -heights / speeds
+    entering = np.flatnonzero( ( speeds < 0 ) & ~parallel )
+    leaving = ( speeds > 0 ) & ~parallel
+    if ( entering.size == 0 ):
+        return np.inf, -1
+    plane = entering[ np.argmax( t[ entering ] ) ]
+    t_in = t[ plane ]
+    t_out = np.min( t[ leaving ] ) if np.any( leaving ) else np.inf
+    if ( t_in < 0 or t_in > t_out ):
+        return np.inf, -1
+    return t_in, plane
+
+def rayTriangles( origin, direction, triangles ):
+    '''Intersects a ray with a set of triangles (Moller-Trumbore). Triangles are
+    front facing when their vertices are counter-clockwise; back-facing
+    triangles are ignored.
+
+    @param  origin      The origin of the ray (a length-3 array).
+    @param  direction   The direction of the ray (a length-3 array).
+    @param  triangles   A Tx3x3 array of triangle vertices.
+    @returns A 2-tuple ( t, triangle ): the ray parameter of the nearest hit
+    and the index of the triangle hit. If there is no hit, ( inf, -1 ).
+    '''
+    v0 = triangles[:, 0]
+    e1 = triangles[:, 1] - v0
+    e2 = triangles[:, 2] - v0
+    p = np.cross( direction, e2 )
+    det = np.sum( e1 * p, axis=1 )
+    front = det > PARALLEL_EPS
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        inv_det = 1.0 / det
+        s = origin - v0
+        u = np.sum( s * p, axis=1 ) * inv_det
+        q = np.cross( s, e1 )
+        v = np.dot( q, direction ) * inv_det
+        t = np.sum( e2 * q, axis=1 ) * inv_det
+    hit = front & ( u >= 0 ) & ( v >= 0 ) & ( u + v <= 1 ) & ( t >= 0 )
+    if ( not np.any( hit ) ):
+        return np.inf, -1
+    t = np.where( hit, t, np.inf )
+    triangle = np.argmin( t )
+    return t[ triangle ], triangle
+
+def rayBoxes( origin, inv_direction, box_min, box_max ):
+    '''Computes the ray parameters at which a ray enters a set of axis-aligned
+    boxes.
+
+    @param  origin          The origin of the ray (a length-3 array).
+    @param  inv_direction   The reciprocal of the ray's direction components.
+    @param  box_min         An Nx3 array of the minimum corners of the boxes.
+    @param  box_max         An Nx3 array of the maximum corners of the boxes.
+    @returns A length-N array of entry parameters; inf for boxes which are missed.
+    '''
+    with np.errstate( invalid='ignore' ):
+        t0 = ( box_min - origin ) * inv_direction
+        t1 = ( box_max - origin ) * inv_direction
+    # A zero direction component gives nan for a ray in the box's slab.
+    t_near = np.nanmax( np.minimum( t0, t1 ), axis=1 )
+    t_far = np.nanmin( np.maximum( t0, t1 ), axis=1 )
+    t_near = np.maximum( t_near, 0.0 )
+    return np.where( t_near <= t_far, t_near, np.inf )
+
+class TriangleBVH( object ):
+    '''A bounding volume hierarchy of axis-aligned boxes over a set of
+    triangles. Nodes are split at the median of their triangles' centroids
+    along the axis in which the centroids are most spread out.'''
+    # The most triangles in a leaf.
+    LEAF_SIZE = 16
+
+    def __init__( self, triangles, leaf_size=LEAF_SIZE ):
+        '''Constructor.
+
+        @param  triangles   A Tx3x3 array of triangle vertices.
+        @param  leaf_size   The most triangles in a leaf.
+        '''
+        triangles = np.asarray( triangles, dtype=np.float64 )
+        count = triangles.shape[0]
+        centroids = triangles.mean( axis=1 )
+        # The triangles are reordered so that each node's triangles are
+        #   contiguous; order maps back to the original indices.
+        order = np.arange( count )
+        # The range of each node's triangles in order.
+        starts = [ 0 ]
+        ends = [ count ]
+        # The first child of each interior node (the second child follows it)
+        #   or -1 for a leaf. Children always follow their parents.
+        children = [ -1 ]
+        stack = [ 0 ]
+        while ( stack ):
+            node = stack.pop()
+            start = starts[ node ]
+            end = ends[ node ]
+            if ( end - start <= leaf_size ):
+                continue
+            indices = order[ start:end ]
+            spread = centroids[ indices ].max( axis=0 ) - centroids[ indices ].min( axis=0 )
+            axis = np.argmax( spread )
+            middle = start + ( end - start ) // 2
+            split = np.argpartition( centroids[ indices, axis ], middle - start )
+            order[ start:end ] = indices[ split ]
+            children[ node ] = len( children )
+            starts += [ start, middle ]
+            ends += [ middle, end ]
+            children += [ -1, -1 ]
+            stack += [ children[ node ], children[ node ] + 1 ]
+        self.children = np.array( children, dtype=np.int64 )
+        self.starts = np.array( starts, dtype=np.int64 )
+        self.ends = np.array( ends, dtype=np.int64 )
+        self.order = order
+        self.triangles = triangles[ order ]
+
+        # The leaves partition the triangles; their boxes are computed at once
+        #   and the interior nodes' boxes are merged from the bottom up.
+        node_count = self.children.size
+        self.box_min = np.zeros( ( node_count, 3 ) )
+        self.box_max = np.zeros( ( node_count, 3 ) )
+        if ( count ):
+            leaves = np.flatnonzero( self.children < 0 )
+            leaves = leaves[ np.argsort( self.starts[ leaves ] ) ]
+            self.box_min[ leaves ] = np.minimum.reduceat( self.triangles.min( axis=1 ),
+                                                          self.starts[ leaves ] )
+            self.box_max[ leaves ] = np.maximum.reduceat( self.triangles.max( axis=1 ),
+                                                          self.starts[ leaves ] )
+            for node in np.flatnonzero( self.children >= 0 )[::-1]:
+                child = self.children[ node ]
+                self.box_min[ node ] = self.box_min[ child:child + 2 ].min( axis=0 )
+                self.box_max[ node ] = self.box_max[ child:child + 2 ].max( axis=0 )
+
+    def __len__( self ):
+        return self.triangles.shape[0]
+
+    def intersect( self, origin, direction ):
+        '''Intersects a ray with the triangles (see rayTriangles()). Nodes are
+        visited nearest first and nodes beyond the nearest hit are skipped.
+
+        @param  origin      The origin of the ray (a length-3 array).
+        @param  direction   The direction of the ray (a length-3 array).
+        @returns A 2-tuple ( t, triangle ): the ray parameter of the nearest hit
+        and the (original) index of the triangle hit. If there is no hit,
+        ( inf, -1 ).
+        '''
+        origin = np.asarray( origin, dtype=np.float64 )
+        direction = np.asarray( direction, dtype=np.float64 )
+        with np.errstate( divide='ignore' ):
+            inv_direction = 1.0 / direction
+        best_t = np.inf
+        best = -1
+        if ( not len( self ) ):
+            return best_t, best
+        t_root = rayBoxes( origin, inv_direction, self.box_min[:1], self.box_max[:1] )[0]
+        # Nodes to visit and the parameter at which the ray enters them; the
+        #   nearest node is last.
+        stack = [ ( t_root, 0 ) ] if t_root < np.inf else []
+        while ( stack ):
+            t_node, node = stack.pop()
+            if ( t_node > best_t ):
+                continue
+            child = self.children[ node ]
+            if ( child < 0 ):
+                start = self.starts[ node ]
+                t, triangle = rayTriangles( origin, direction,
+                                            self.triangles[ start:self.ends[ node ] ] )
+                if ( t < best_t ):
+                    best_t = t
+                    best = self.order[ start + triangle ]
+            else:
+                t = rayBoxes( origin, inv_direction, self.box_min[ child:child + 2 ],
+                              self.box_max[ child:child + 2 ] )
+                for i in ( ( 0, 1 ) if t[0] > t[1] else ( 1, 0 ) ):
+                    if ( t[ i ] < best_t ):
+                        stack.append( ( t[ i ], child + i ) )
+        return best_t, best
@@ -0,0 +1,227 @@
+# The rounded offset of a convex polytope: its Minkowski sum with a ball.
+#
+# Offsetting a convex polytope by a distance r in every direction (rather than
+# moving its planes) produces a smooth surface made of three kinds of patches:
+#   - each face, translated along its normal by r,
+#   - each edge, swept into a cylinder of radius r between the normals of its
+#     two faces, and
+#   - each vertex, swept into a sphere of radius r spanning the normals of the
+#     faces around it.
+# Every point of the surface is a point of the polytope plus r times the
+# surface normal there, so the patches are tessellated by sampling normals:
+# arcs between adjacent face normals (the edges' cylinders) and, around each
+# vertex, arcs from the center of its normals out to those (the spheres).
+#
+# The number of samples on each arc depends on the angle it spans, so the
+# patches are tessellated all at once with ragged index arithmetic instead of
+# a loop per patch. The patches share their boundary vertices, so the result
+# is watertight.
+#
+# No OpenGL dependencies.
+
+import itertools
+import numpy as np
+from watertight import halfEdges
+
+# The default largest angle (in radians) between the normals of adjacent
+#   samples.
+ROUND_ANGLE = np.pi / 12
+# Unit vectors whose angle has a smaller sine are interpolated linearly.
+SLERP_EPS = 1e-9
+
+def raggedRange( counts ):
+    '''Enumerates the ranges 0, ..., count - 1 of a sequence of counts.
+
+    @param  counts      An (N,) array of non-negative ints.
+    @returns A 2-tuple of ( sum( counts ), ) int arrays ( owner, index ): the
+    count each entry belongs to and the entry's position in that count's range.
+    '''
+    counts = np.asarray( counts, dtype=np.int64 )
+    owner = np.repeat( np.arange( counts.size ), counts )
+    starts = np.cumsum( counts ) - counts
+    return owner, np.arange( owner.size ) - starts[ owner ]
+
+def slerp( p, q, t ):
+    '''Interpolates between unit vectors along the great arcs joining them.
+
+    @param  p           An Nx3 array of unit vectors (at t = 0).
+    @param  q           An Nx3 array of unit vectors (at t = 1).
+    @param  t           An (N,) array of interpolation parameters.
+    @returns An Nx3 array of unit vectors.
+    '''
+    angle = np.arccos( np.clip( np.sum( p * q, axis=1 ), -1.0, 1.0 ) )
+    sin_angle = np.sin( angle )
+    small = sin_angle < SLERP_EPS
+    sin_angle[ small ] = 1.0
+    w0 = np.where( small, 1.0 - t, np.sin( ( 1.0 - t ) * angle ) / sin_angle )
+    w1 = np.where( small, t, np.sin( t * angle ) / sin_angle )
+    result = w0[:, np.newaxis] * p + w1[:, np.newaxis] * q
+    result /= np.sqrt( np.sum( result * result, axis=1 ) )[:, np.newaxis]
+    return result
+
+def arcSegments( angles, max_angle ):
+    '''Reports the number of segments arcs are divided into.
+
+    @param  angles      An array of the angles (in radians) the arcs span.
+    @param  max_angle   The largest angle a segment may span.
+    @returns An int array (the shape of angles); at least one per arc.
+    '''
+    return np.maximum( np.ceil( angles / max_angle - 1e-9 ), 1 ).astype( np.int64 )
+
+def roundedSurface( vertices, faces, normals, radius, max_angle=ROUND_ANGLE ):
+    '''Tessellates the Minkowski sum of a convex polytope and a ball.
+
+    @param  vertices    A Vx3 array of the polytope's vertices.
+    @param  faces       A length F list of lists of vertex indices: the
+                        vertices of each face in counter-clockwise order.
+                        Faces with fewer than three vertices (planes which
+                        merely touch the polytope) and repeated faces
+                        (coincident planes) are ignored.
+    @param  normals     A 3xF array of the faces' unit normals.
+    @param  radius      The radius of the ball.
+    @param  max_angle   The largest angle (in radians) between the normals of
+                        adjacent samples on the cylinders and spheres.
+    @returns A 5-tuple ( positions, vertex_normals, flat_faces, triangles, edge_flags ):
+        positions:      An Nx3 array of the surface's vertices.
+        vertex_normals: An Nx3 array of the surface's normal at each vertex.
+        flat_faces:     A length F list of lists: the vertices of each
+                        translated face (indices into positions), in
+                        counter-clockwise order; empty for ignored faces.
+        triangles:      A Tx3 int array: the counter-clockwise triangles of
+                        the cylinders and spheres.
+        edge_flags:     A Tx3 bool array; True for the triangle edges which
+                        are edges of the tessellation's quads (see
+                        watertight.fanTriangles).
+    '''
+    vertices = np.asarray( vertices, dtype=np.float )
+    normals = np.asarray( normals, dtype=np.float ).T
+    V = vertices.shape[0]
+    # Coincident planes produce the same face more than once; only the first
+    #   is kept.
+    first = {}
+    kept = []
+    for i, f in enumerate( faces ):
+        if ( len( f ) >= 3 ):
+            j = first.setdefault( frozenset( f ), i )
+            kept.append( f if j == i else () )
+        else:
+            kept.append( () )
+    sizes = np.fromiter( ( len( f ) for f in kept ), dtype=np.int64, count=len( kept ) )
+    face_offsets = np.zeros( sizes.size + 1, dtype=np.int64 )
+    np.cumsum( sizes, out=face_offsets[1:] )
+    origin = np.fromiter( itertools.chain.from_iterable( kept ), dtype=np.int64,
+                          count=face_offsets[-1] )
+    H = origin.size
+    face, next_edge, prev_edge, twins = halfEdges( face_offsets, origin, V )
+
+    # Half-edge h (from vertex a in face f to vertex b) bounds the cylinder of
+    #   its edge. At a, the cylinder's normals sweep the arc from n_f to n_g
+    #   (g is the face across the edge) in k[ h ] segments. The arc's ends
+    #   are the normals of the translated faces' corners: corner h of face f
+    #   and corner after[ h ] (the half-edge leaving a in face g).
+    n_f = normals[ face ]
+    n_g = normals[ face[ twins ] ]
+    after = next_edge[ twins ]
+    k = arcSegments( np.arccos( np.clip( np.sum( n_f * n_g, axis=1 ), -1.0, 1.0 ) ), max_angle )
+
+    # The sphere at vertex a is divided into a sector for each half-edge
+    #   leaving a: the arcs from the center of a's normals to the samples of
+    #   the half-edge's arc, each in L[ a ] segments.
+    center = np.empty( ( V, 3 ) )
+    for axis in xrange( 3 ):
+        center[:, axis] = np.bincount( origin, weights=n_f[:, axis], minlength=V )
+    used = np.bincount( origin, minlength=V ) > 0
+    center[ used ] /= np.sqrt( np.sum( center[ used ] ** 2, axis=1 ) )[:, np.newaxis]
+    spread = np.arccos( np.clip( np.sum( center[ origin ] * n_f, axis=1 ), -1.0, 1.0 ) )
+    L = np.ones( V, dtype=np.int64 )
+    np.maximum.at( L, origin, arcSegments( spread, max_angle ) )
+    L_h = L[ origin ]
+
+    # The surface's vertices, in blocks:
+    #   corners: the corners of the translated faces (one per half-edge).
+    #   centers: the center of each vertex's sphere.
+    #   arcs:    the interior samples of each half-edge's arc (k - 1 each).
+    #   grid:    the interior samples of each sector; rows 1, ..., L - 1 of
+    #            the arcs from the center, columns 0, ..., k - 1 (column k
+    #            is column 0 of the next sector, after[ h ]).
+    center_index = H + np.cumsum( used ) - 1
+    arc_counts = k - 1
+    arc_start = H + np.count_nonzero( used ) + np.cumsum( arc_counts ) - arc_counts
+    grid_counts = ( L_h - 1 ) * k
+    grid_start = ( H + np.count_nonzero( used ) + arc_counts.sum() +
+                   np.cumsum( grid_counts ) - grid_counts )
+
+    arc_h, arc_j = raggedRange( arc_counts )
+    arc_normals = slerp( n_f[ arc_h ], n_g[ arc_h ], ( arc_j + 1.0 ) / k[ arc_h ] )
+    grid_h, grid_i = raggedRange( grid_counts )
+    grid_l = grid_i // k[ grid_h ] + 1
+    grid_j = grid_i % k[ grid_h ]
+    grid_normals = slerp( center[ origin[ grid_h ] ],
+                          slerp( n_f[ grid_h ], n_g[ grid_h ], grid_j / k[ grid_h ].astype( np.float ) ),
+                          grid_l / L_h[ grid_h ].astype( np.float ) )
+    points = np.concatenate( ( origin, np.flatnonzero( used ), origin[ arc_h ], origin[ grid_h ] ) )
+    vertex_normals = np.concatenate( ( n_f, center[ used ], arc_normals, grid_normals ) )
+    positions = vertices[ points ] + radius * vertex_normals
+
+    def arcVertex( h, j ):
+        '''The vertex of the jth sample (0, ..., k) of half-edge h's arc.'''
+        return np.where( j == 0, h, np.where( j == k[ h ], after[ h ], arc_start[ h ] + j - 1 ) )
+
+    def sectorVertex( h, l, j ):
+        '''The vertex of the jth sample (0, ..., k) of row l (0, ..., L) of
+        half-edge h's sector.'''
+        # Column k belongs to the next sector.
+        last = j == k[ h ]
+        s = np.where( last, after[ h ], h )
+        j = np.where( last, 0, j )
+        grid = grid_start[ s ] + ( l - 1 ) * k[ s ] + j
+        return np.where( l == 0, center_index[ origin[ h ] ],
+                         np.where( l == L_h[ h ], arcVertex( h, np.where( last, k[ h ], j ) ), grid ) )
+
+    # The cylinders: one per edge, from half-edge h's arc (at a) to its
+    #   twin's (at b, where the same normals are in reverse order).
+    edges = np.flatnonzero( np.arange( H ) < twins )
+    cyl_h, cyl_j = raggedRange( k[ edges ] )
+    cyl_h = edges[ cyl_h ]
+    a0 = arcVertex( cyl_h, cyl_j )
+    a1 = arcVertex( cyl_h, cyl_j + 1 )
+    b0 = arcVertex( twins[ cyl_h ], k[ cyl_h ] - cyl_j )
+    b1 = arcVertex( twins[ cyl_h ], k[ cyl_h ] - cyl_j - 1 )
+    quads = [ np.column_stack( ( b0, a0, a1, b1 ) ) ]
+
+    # The sectors: a fan of triangles around the center and quads beyond it.
+    sec_h, sec_i = raggedRange( L_h * k )
+    sec_l = sec_i // k[ sec_h ]
+    sec_j = sec_i % k[ sec_h ]
+    fan = sec_l == 0
+    fan_h = sec_h[ fan ]
+    fan_j = sec_j[ fan ]
+    fan_triangles = np.column_stack( ( sectorVertex( fan_h, 0, fan_j ),
+                                       sectorVertex( fan_h, 1, fan_j + 1 ),
+                                       sectorVertex( fan_h, 1, fan_j ) ) )
+    sec_h = sec_h[ ~fan ]
+    sec_l = sec_l[ ~fan ]
+    sec_j = sec_j[ ~fan ]
+    quads.append( np.column_stack( ( sectorVertex( sec_h, sec_l, sec_j ),
+                                     sectorVertex( sec_h, sec_l, sec_j + 1 ),
+                                     sectorVertex( sec_h, sec_l + 1, sec_j + 1 ),
+                                     sectorVertex( sec_h, sec_l + 1, sec_j ) ) ) )
+    quads = np.concatenate( quads )
+
+    # The quads aren't planar. Each is split along the diagonal which keeps
+    #   the surface convex: from corner 0 to corner 2 if corner 3 lies below
+    #   the triangle of corners 0, 1 and 2, otherwise from corner 1 to 3.
+    p = positions[ quads ]
+    above = np.sum( np.cross( p[:, 1] - p[:, 0], p[:, 2] - p[:, 0] ) * ( p[:, 3] - p[:, 0] ), axis=1 ) > 0
+    quads[ above ] = np.roll( quads[ above ], -1, axis=1 )
+    quad_triangles = np.empty( ( 2 * quads.shape[0], 3 ), dtype=np.int64 )
+    quad_triangles[ 0::2 ] = quads[:, :3]
+    quad_triangles[ 1::2 ] = quads[:, [ 0, 2, 3 ] ]
+    quad_flags = np.ones( quad_triangles.shape, dtype=np.bool )
+    quad_flags[ 0::2, 2 ] = False
+    quad_flags[ 1::2, 0 ] = False
+    triangles = np.concatenate( ( fan_triangles, quad_triangles ) )
+    edge_flags = np.concatenate( ( np.ones( fan_triangles.shape, dtype=np.bool ), quad_flags ) )
+
+    flat_faces = [ f.tolist() for f in np.split( np.arange( H ), face_offsets[1:-1] ) ]
+    return positions, vertex_normals, flat_faces, triangles, edge_flags
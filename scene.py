@@ -118,6 +118,18 @@ class Scene( object ):
         else:
             return EventReport()
 
+    def processDeferred( self, camControl ):
+        '''Allows the scene to complete work deferred by earlier events (see
+        EventReport.hasDeferred).
+
+        @param:     camControl  The scene's camera control.
+        @returns:   An EventReport indicating how the scene responded.
+        '''
+        if ( self._context ):
+            return self._context.processDeferred( camControl, self )
+        else:
+            return EventReport()
+
     def keyPressEvent( self, event, camControl ):
         '''Handles key press events.
 
@@ -0,0 +1,174 @@
+# Tests the levels of detail of large triangle meshes (lod.py) -- the quadrics,
+# the simplified meshes and the choice of level -- against summing each
+# triangle's plane at each vertex, checking the simplified meshes' topology
+# and distance to the original surface, and projecting a box's corners one
+# at a time.
+#
+# Run with: python -m unittest test_lod
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import lod
+from test_watertight import randomTriangles
+
+def bruteForceQuadricCost( positions, triangles, vertex, point ):
+    '''Sums the area-weighted squared distances from a point to the planes of
+    a vertex's triangles, one triangle at a time.'''
+    cost = 0.0
+    for t in triangles:
+        if ( vertex in t ):
+            p0, p1, p2 = positions[ t ]
+            n = np.cross( p1 - p0, p2 - p0 )
+            double_area = np.sqrt( np.dot( n, n ) )
+            cost += 0.5 * double_area * ( np.dot( n / double_area, point - p0 ) ) ** 2
+    return cost
+
+def perspective( fovy, aspect, near, far ):
+    '''The perspective projection matrix of gluPerspective (row major).'''
+    f = 1.0 / np.tan( fovy / 2.0 )
+    return np.array( [ [ f / aspect, 0, 0, 0 ],
+                       [ 0, f, 0, 0 ],
+                       [ 0, 0, ( far + near ) / ( near - far ), 2 * far * near / ( near - far ) ],
+                       [ 0, 0, -1, 0 ] ] )
+
+def randomView( rand ):
+    '''A random rotation and translation down the z axis (row major).'''
+    view = np.eye( 4 )
+    view[:3, :3] = np.linalg.qr( rand.normal( size=( 3, 3 ) ) )[0]
+    view[:3, 3] = rand.uniform( -1.0, 1.0, 3 ) + [ 0.0, 0.0, -rand.uniform( 1.0, 10.0 ) ]
+    return view
+
+class LodTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        rand = np.random.RandomState( 20 )
+        # A sphere of ( 2 * count - 4 ) triangles, enough for a level.
+        vertices, faces = randomTriangles( 9000, rand )
+        cls.positions = vertices
+        cls.triangles = np.array( faces, dtype=np.int64 )
+
+    def assertClosed( self, positions, triangles, message ):
+        '''Asserts that the triangles form a closed, consistently oriented
+        sphere and that all the vertices are used.'''
+        edges = set()
+        for t in triangles.tolist():
+            self.assertEqual( len( set( t ) ), 3, message )
+            for edge in zip( t, t[1:] + t[:1] ):
+                self.assertFalse( edge in edges, '%s: edge %s' % ( message, edge ) )
+                edges.add( edge )
+        self.assertTrue( all( ( w, v ) in edges for v, w in edges ), message )
+        self.assertEqual( np.unique( triangles ).tolist(), range( positions.shape[0] ), message )
+        # Euler's formula.
+        self.assertEqual( positions.shape[0] - len( edges ) // 2 + triangles.shape[0], 2, message )
+
+    def test_quadrics( self ):
+        '''A vertex's quadric measures the distances to its triangles' planes.'''
+        rand = np.random.RandomState( 21 )
+        positions, triangles = self.positions, self.triangles[ :200 ]
+        quadrics = lod.triangleQuadrics( positions, triangles )
+        vertices = rand.choice( np.unique( triangles ), 20, replace=False )
+        points = positions[ vertices ] + rand.normal( 0.0, 0.1, ( vertices.size, 3 ) )
+        costs = lod.quadricCost( quadrics[ vertices ], points )
+        for vertex, point, cost in zip( vertices, points, costs ):
+            self.assertAlmostEqual( cost, bruteForceQuadricCost( positions, triangles, vertex, point ), 12 )
+        # The collapsed point is no worse than the edge's ends and midpoint.
+        edges = lod.meshEdges( self.triangles )
+        quadrics = lod.triangleQuadrics( positions, self.triangles )
+        edge_quadrics = quadrics[ edges[:, 0] ] + quadrics[ edges[:, 1] ]
+        p0, p1 = positions[ edges[:, 0] ], positions[ edges[:, 1] ]
+        points, costs = lod.collapsePoints( edge_quadrics, p0, p1 )
+        np.testing.assert_allclose( costs, lod.quadricCost( edge_quadrics, points ), atol=1e-15 )
+        for p in ( p0, p1, 0.5 * ( p0 + p1 ) ):
+            self.assertLessEqual( ( costs - lod.quadricCost( edge_quadrics, p ) ).max(), 1e-15 )
+
+    def test_simplify( self ):
+        '''A simplified sphere is closed, has no more triangles than the target
+        and stays near the sphere.'''
+        triangles = self.triangles
+        for target in ( triangles.shape[0] // 2, 1000, 100 ):
+            positions, simplified, quadrics = lod.simplify( self.positions, triangles, target )
+            message = '%d triangles' % target
+            self.assertLessEqual( simplified.shape[0], target, message )
+            self.assertGreater( simplified.shape[0], target // 2, message )
+            self.assertEqual( quadrics.shape, ( positions.shape[0], 10 ), message )
+            self.assertClosed( positions, simplified, message )
+            radii = np.sqrt( np.sum( positions ** 2, axis=1 ) )
+            self.assertLess( np.abs( radii - 1.0 ).max(), 0.1, message )
+            # Every triangle faces out.
+            p0 = positions[ simplified[:, 0] ]
+            normals = np.cross( positions[ simplified[:, 1] ] - p0, positions[ simplified[:, 2] ] - p0 )
+            self.assertTrue( np.all( np.sum( normals * p0, axis=1 ) > 0 ), message )
+        # The input isn't modified.
+        np.testing.assert_array_equal( triangles, self.triangles )
+
+    def test_levels( self ):
+        '''Each level has at most the ratio of the previous level's triangles;
+        the cached levels are those built from scratch.'''
+        levels = lod.buildLevels( self.positions, self.triangles )
+        counts = [ self.triangles.shape[0] ] + [ t.shape[0] for p, t in levels ]
+        self.assertGreater( len( levels ), 0 )
+        for i, ( positions, triangles ) in enumerate( levels ):
+            self.assertGreaterEqual( counts[ i ] * lod.LEVEL_RATIO, lod.MIN_TRIANGLES, i )
+            self.assertLessEqual( counts[ i + 1 ], int( counts[ i ] * lod.LEVEL_RATIO ), i )
+            self.assertClosed( positions, triangles, 'level %d' % i )
+        self.assertLess( counts[-1] * lod.LEVEL_RATIO, lod.MIN_TRIANGLES )
+        self.assertEqual( lod.buildLevels( self.positions, self.triangles[ :100 ] ), [] )
+        temp_dir = tempfile.mkdtemp( prefix='test_lod' )
+        try:
+            for i in xrange( 2 ):
+                cached = lod.cachedLevels( os.path.join( temp_dir, 'mesh' ), self.positions, self.triangles )
+                self.assertEqual( len( cached ), len( levels ) )
+                for ( positions, triangles ), ( expected_positions, expected_triangles ) in zip( cached, levels ):
+                    np.testing.assert_array_equal( positions, expected_positions )
+                    np.testing.assert_array_equal( triangles, expected_triangles )
+            # The second call loaded the levels.
+            self.assertIsInstance( cached[0][1], np.memmap )
+        finally:
+            shutil.rmtree( temp_dir )
+
+    def test_select_level( self ):
+        '''The selected level is the last with a triangle for every pixel (or
+        the first, if none has).'''
+        rand = np.random.RandomState( 22 )
+        for i in xrange( 200 ):
+            counts = sorted( rand.randint( 1, 100000, rand.randint( 1, 5 ) ).tolist(), reverse=True )
+            pixels = rand.uniform( 0, 200000 )
+            per_triangle = rand.choice( [ 0.5, 1.0, 4.0 ] )
+            expected = 0
+            for level, count in enumerate( counts ):
+                if ( count * per_triangle >= pixels ):
+                    expected = level
+            self.assertEqual( lod.selectLevel( counts, pixels, per_triangle ), expected, ( counts, pixels ) )
+
+    def test_projected_box_area( self ):
+        '''The area is that of the rectangle bounding the box's projected
+        corners, clipped to the viewport.'''
+        rand = np.random.RandomState( 23 )
+        viewport = ( 0, 0, 640, 480 )
+        projection = perspective( np.pi / 3, 640.0 / 480.0, 0.1, 100.0 )
+        for i in xrange( 200 ):
+            view = randomView( rand )
+            box_min = rand.uniform( -1.0, 0.0, 3 )
+            box_max = box_min + rand.uniform( 0.0, 1.0, 3 )
+            behind = False
+            xs, ys = [], []
+            for corner in ( ( a, b, c ) for a in ( box_min[0], box_max[0] ) for b in ( box_min[1], box_max[1] )
+                            for c in ( box_min[2], box_max[2] ) ):
+                clip = np.dot( projection, np.dot( view, list( corner ) + [ 1.0 ] ) )
+                if ( clip[3] <= 0 ):
+                    behind = True
+                xs.append( min( max( clip[0] / clip[3], -1.0 ), 1.0 ) )
+                ys.append( min( max( clip[1] / clip[3], -1.0 ), 1.0 ) )
+            if ( behind ):
+                expected = 640 * 480
+            else:
+                expected = ( max( xs ) - min( xs ) ) * 320 * ( max( ys ) - min( ys ) ) * 240
+            # OpenGL returns the matrices column major.
+            area = lod.projectedBoxArea( box_min, box_max, view.T, projection.T, viewport )
+            self.assertAlmostEqual( area, expected, 6, i )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Tests the on-disk mesh cache (meshcache.py): meshes loaded from the cache --
+# after a miss, on a hit and after the obj file changes -- against meshes
+# parsed from the obj file.
+#
+# Run with: python -m unittest test_meshcache
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import numpy as np
+import meshcache
+from offset_bench import randomPolytope
+from watertight import WatertightMesh
+
+class MeshCacheTest( unittest.TestCase ):
+    def setUp( self ):
+        self.temp_dir = tempfile.mkdtemp( prefix='test_meshcache' )
+        self.cache_dir = os.path.join( self.temp_dir, 'cache' )
+        self.obj_file = os.path.join( self.temp_dir, 'random.obj' )
+        self.writeObj( 0 )
+
+    def tearDown( self ):
+        shutil.rmtree( self.temp_dir )
+
+    def writeObj( self, seed ):
+        '''Writes a random polytope to the obj file.'''
+        with open( self.obj_file, 'w' ) as f:
+            randomPolytope( 40, seed ).writeOBJ( f )
+
+    def load( self ):
+        '''Loads the obj file through the cache.
+
+        @returns A 2-tuple ( mesh, hit ).
+        '''
+        mesh = WatertightMesh()
+        hit = mesh.from_obj_file( self.obj_file, cache_dir=self.cache_dir )
+        return mesh, hit
+
+    def assertParsed( self, mesh ):
+        '''Asserts that the mesh's arrays match those parsed from the obj file.'''
+        parsed = WatertightMesh()
+        self.assertFalse( parsed.from_obj_file( self.obj_file, use_cache=False ) )
+        for name in WatertightMesh.ARRAYS:
+            expected = getattr( parsed, name )
+            actual = getattr( mesh, name )
+            self.assertEqual( actual.dtype, expected.dtype, name )
+            np.testing.assert_array_equal( actual, expected, name )
+
+    def test_miss_and_hit( self ):
+        '''The first load parses the file and writes an entry, which later
+        loads memory-map.'''
+        mesh, hit = self.load()
+        self.assertFalse( hit )
+        self.assertParsed( mesh )
+        self.assertEqual( os.listdir( self.cache_dir ), [ os.path.basename( mesh.cache_entry ) ] )
+        mesh, hit = self.load()
+        self.assertTrue( hit )
+        self.assertParsed( mesh )
+        self.assertIsInstance( mesh.face_vertices, np.memmap )
+        self.assertFalse( mesh.face_vertices.flags.writeable )
+
+    def test_changed_file( self ):
+        '''A changed obj file has a new entry; the old entry is left alone.'''
+        old, hit = self.load()
+        self.writeObj( 1 )
+        mesh, hit = self.load()
+        self.assertFalse( hit )
+        self.assertNotEqual( mesh.cache_entry, old.cache_entry )
+        self.assertParsed( mesh )
+        self.assertEqual( sorted( os.listdir( self.cache_dir ) ),
+                          sorted( os.path.basename( m.cache_entry ) for m in ( old, mesh ) ) )
+        self.assertTrue( self.load()[1] )
+
+    def test_incomplete_entry( self ):
+        '''An entry missing an array is a miss.'''
+        mesh, hit = self.load()
+        os.remove( os.path.join( mesh.cache_entry, 'twins.npy' ) )
+        mesh, hit = self.load()
+        self.assertFalse( hit )
+        self.assertParsed( mesh )
+
+    def test_entry_mode( self ):
+        '''An entry has the cache directory's permissions.'''
+        os.makedirs( self.cache_dir )
+        os.chmod( self.cache_dir, 0750 )
+        mesh, hit = self.load()
+        self.assertEqual( stat.S_IMODE( os.stat( mesh.cache_entry ).st_mode ), 0750 )
+
+    def test_unwritable_cache( self ):
+        '''A cache which can't be written doesn't prevent loading the file.'''
+        with open( self.cache_dir, 'w' ) as f:
+            f.write( 'not a directory' )
+        mesh, hit = self.load()
+        self.assertFalse( hit )
+        self.assertParsed( mesh )
+        self.assertFalse( meshcache.saveArrays( mesh.cache_entry, { 'a' : np.zeros( 1 ) } ) )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# Tests reading obj files in bulk (ObjReader.readObjArrays) against reading
+# them line by line (ObjFile.readFileLines), for the polytopes shipped with the
+# repository and files using groups, materials and the other face layouts.
+#
+# Run with: python -m unittest test_objreader
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from offset_bench import SHIPPED
+from ObjReader import ObjFile, readObjArrays
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# Files exercising the parts of the format the shipped files don't: groups
+#   (revisited), materials, the v, v/t and v/t/n layouts, records with extra
+#   values and a face which repeats a vertex (which is discarded).
+VARIANTS = {
+    'groups.obj' : '''mtllib scene.mtl
+v 0 0 0
+v 1 0 0
+v 0 1 0
+v 0 0 1 1.0
+vt 0 0
+vt 1 0
+vt 0 1 0.5
+g first
+usemtl red
+f 1/1 3/3 2/2
+usemtl blue
+f 1/1 2/2 4/1
+g second
+f 1/1 4/1 3/3
+g first
+usemtl red
+f 2/2 3/3 4/1
+''',
+    'plain.obj' : '''v -1 -1 -1
+v 1 -1 -1
+v 0 1 -1
+v 0 0 1
+f 1 3 2
+f 1 2 4
+  f 2 3 4
+f 3 1 4
+f 1 1 2
+''',
+    'full.obj' : '''v 0 0 0
+v 1 0 0
+v 0 1 0
+v 0 0 1
+vn 0 0 -1
+vn 0 -1 0
+vt 0 0
+vt 1 0
+f 1/1/1 3/2/1 2/1/1
+usemtl shiny
+f 1/1/2 2/2/2 4/1/2
+f 2/1/1 3/2/1 4/1/1
+f 3/1/1 1/2/1 4/1/1
+''',
+    }
+
+def readLines( obj_file ):
+    '''Reads an obj file line by line.'''
+    obj = ObjFile()
+    obj.readFileLines( obj_file )
+    return obj
+
+def faceLists( obj ):
+    '''Lists each group's faces, per material, as ( verts, norms, uvs ).'''
+    return dict( ( ( name, material ), [ ( f.verts, f.norms, f.uvs ) for f in faces ] )
+                 for name, group in obj.groups.items()
+                 for material, faces in group.materials.items() )
+
+class ObjReaderTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.temp_dir = tempfile.mkdtemp( prefix='test_objreader' )
+        cls.obj_files = [ ( name, os.path.join( ROOT, name ) ) for name in SHIPPED ]
+        for name, text in sorted( VARIANTS.items() ):
+            obj_file = os.path.join( cls.temp_dir, name )
+            with open( obj_file, 'w' ) as f:
+                f.write( text )
+            cls.obj_files.append( ( name, obj_file ) )
+
+    @classmethod
+    def tearDownClass( cls ):
+        shutil.rmtree( cls.temp_dir )
+
+    def test_bulk_read( self ):
+        '''Every file is read in bulk and gives the same vertices, normals,
+        uvs, groups, materials and faces as reading it line by line.'''
+        for name, obj_file in self.obj_files:
+            self.assertIsNotNone( readObjArrays( obj_file ), name )
+            bulk = ObjFile( obj_file )
+            self.assertIsNotNone( bulk.arrays, name )
+            lines = readLines( obj_file )
+            self.assertIsNone( lines.arrays, name )
+            self.assertEqual( bulk.mtllib, lines.mtllib, name )
+            np.testing.assert_array_equal( bulk.vertexArray(), lines.vertexArray(), name )
+            for attribute in ( 'normSet', 'uvSet' ):
+                self.assertEqual( [ list( v.data ) for v in getattr( bulk, attribute ) ],
+                                  [ list( v.data ) for v in getattr( lines, attribute ) ],
+                                  '%s: %s' % ( name, attribute ) )
+            offsets, verts = bulk.faceArrays()
+            expected_offsets, expected_verts = lines.faceArrays()
+            np.testing.assert_array_equal( offsets, expected_offsets, name )
+            np.testing.assert_array_equal( verts, expected_verts, name )
+            if ( offsets.size > 1 ):
+                np.testing.assert_array_equal( bulk.getFaceNormals( offsets, verts ),
+                                               lines.getFaceNormals( expected_offsets, expected_verts ), name )
+            # The bulk file's groups are created from its arrays.
+            self.assertEqual( faceLists( bulk ), faceLists( lines ), name )
+
+    def test_fallback( self ):
+        '''Files the bulk reader doesn't handle are read line by line.'''
+        obj_file = os.path.join( self.temp_dir, 'mixed.obj' )
+        with open( obj_file, 'w' ) as f:
+            f.write( VARIANTS[ 'plain.obj' ] + 'f 1/1 2/2 3/3\n' )
+        self.assertIsNone( readObjArrays( obj_file ) )
+        obj = ObjFile( obj_file )
+        self.assertIsNone( obj.arrays )
+        self.assertEqual( faceLists( obj ), faceLists( readLines( obj_file ) ) )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# Tests the offset surfaces computed by OffsetSurface -- for the polytopes
+# shipped with the repository and a random polytope (see
+# offset_bench.randomPolytope) -- against polytopes computed from scratch and
+# the convex hulls of their vertices.
+#
+# Run with: python -m unittest test_offset
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.spatial import ConvexHull
+from offset import HullCache, offsetSurfaceFromObj
+from offset_batch import applyDeltas
+from offset_bench import SHIPPED, randomPolytope
+from offset_sweep import randomSweep, runSweep, specDeltas, uniformSweep
+from polytope import HalfspacePolytope, PLANE_TOLERANCE
+from test_offset_events import faceMismatch
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# The number of random offset configurations tested per polytope.
+CONFIGS = 8
+
+def randomDeltas( face_count, rand ):
+    '''Creates random offsets, with about half of the faces not offset.'''
+    deltas = rand.uniform( 0.0, 1.0, face_count )
+    deltas[ rand.uniform( size=face_count ) < 0.5 ] = 0.0
+    return deltas
+
+class HullCacheTest( unittest.TestCase ):
+    def test_eviction( self ):
+        '''The cache keeps the same entries as a list of every entry in order
+        of use, trimmed from the least recently used to the budget.'''
+        rand = np.random.RandomState( 5 )
+        cache = HullCache( 1000, 1e-3 )
+        # ( key, entry, size ), least recently used first.
+        expected = []
+        for i in xrange( 2000 ):
+            deltas = rand.randint( 0, 20, 2 ) * 1e-3
+            # Offsets within the quantum share an entry.
+            key = cache.key( deltas + rand.uniform( -4e-4, 4e-4, 2 ) )
+            self.assertEqual( key, cache.key( deltas ) )
+            found = [ item for item in expected if item[0] == key ]
+            if ( rand.uniform() < 0.5 ):
+                entry = cache.get( key )
+                if ( found ):
+                    self.assertIs( entry, found[0][1] )
+                    expected.remove( found[0] )
+                    expected.append( found[0] )
+                else:
+                    self.assertIsNone( entry )
+            else:
+                entry, size = object(), rand.randint( 1, 300 )
+                cache.put( key, entry, size )
+                if ( found ):
+                    expected.remove( found[0] )
+                expected.append( ( key, entry, size ) )
+                while ( sum( item[2] for item in expected ) > cache.max_bytes ):
+                    expected.pop( 0 )
+            self.assertEqual( len( cache ), len( expected ) )
+            self.assertEqual( cache.byte_count, sum( item[2] for item in expected ) )
+
+class OffsetTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.temp_dir = tempfile.mkdtemp( prefix='test_offset' )
+        cls.obj_files = [ ( name, os.path.join( ROOT, name ) ) for name in SHIPPED ]
+        obj_file = os.path.join( cls.temp_dir, 'random.obj' )
+        with open( obj_file, 'w' ) as f:
+            randomPolytope( 50 ).writeOBJ( f )
+        cls.obj_files.append( ( 'random 50', obj_file ) )
+        cls.surfaces = [ ( name, offsetSurfaceFromObj( obj_file ) ) for name, obj_file in cls.obj_files ]
+
+    @classmethod
+    def tearDownClass( cls ):
+        shutil.rmtree( cls.temp_dir )
+
+    def expected( self, surface, deltas ):
+        '''Computes the polytope from scratch for the given offsets.'''
+        planes = surface.planes.copy()
+        planes[:, 3] -= deltas
+        return HalfspacePolytope( planes, surface.feasible_point )
+
+    def test_offsets( self ):
+        '''Setting uniform and per-face offsets gives the polytopes computed
+        from scratch; the hull's vertices lie in every offset half space and
+        are all corners of their convex hull.'''
+        rand = np.random.RandomState( 4 )
+        for name, surface in self.surfaces:
+            face_count = surface.planes.shape[0]
+            configs = [ np.array( [ 0.5 ] ) ] + [ randomDeltas( face_count, rand ) for i in xrange( CONFIGS ) ]
+            for i, deltas in enumerate( configs ):
+                message = '%s, configuration %d' % ( name, i )
+                applyDeltas( surface, deltas )
+                expected = self.expected( surface, deltas )
+                mismatch = faceMismatch( surface.hull.vertices, surface.hull.faces, expected )
+                self.assertIsNone( mismatch, '%s: %s' % ( message, mismatch ) )
+                vertices = surface.hull.vertices
+                dist = np.dot( vertices, expected.planes[:, :3].T ) + expected.planes[:, 3]
+                self.assertLess( dist.max(), PLANE_TOLERANCE, message )
+                self.assertEqual( ConvexHull( vertices ).vertices.size, vertices.shape[0], message )
+
+    def test_cached_hulls( self ):
+        '''Revisiting offsets uses the cached hulls, which match the polytopes
+        computed from scratch.'''
+        rand = np.random.RandomState( 6 )
+        for name, surface in self.surfaces:
+            face_count = surface.planes.shape[0]
+            configs = [ randomDeltas( face_count, rand ) for i in xrange( 3 ) ]
+            hulls = []
+            for deltas in configs:
+                surface.set_offsets( deltas )
+                hulls.append( surface.hull )
+            for deltas, hull in zip( configs, hulls ):
+                surface.set_offsets( deltas )
+                self.assertIs( surface.hull, hull, name )
+                expected = self.expected( surface, deltas )
+                mismatch = faceMismatch( hull.vertices, hull.faces, expected )
+                self.assertIsNone( mismatch, '%s: %s' % ( name, mismatch ) )
+                # The cached polytope is the surface's starting point for the
+                #   next (uncached) offsets.
+                index = rand.randint( face_count )
+                surface.set_offset( deltas[ index ] + 0.1, index )
+                deltas = deltas.copy()
+                deltas[ index ] += 0.1
+                mismatch = faceMismatch( surface.hull.vertices, surface.hull.faces,
+                                         self.expected( surface, deltas ) )
+                self.assertIsNone( mismatch, '%s: %s' % ( name, mismatch ) )
+
+    def test_sweep( self ):
+        '''A sweep across processes reports every configuration with the size
+        and volume of the polytope computed from scratch.'''
+        name, obj_file = self.obj_files[-1]
+        surface = self.surfaces[-1][1]
+        face_count = surface.planes.shape[0]
+        specs = uniformSweep( 1.0, 5 ) + randomSweep( 6, 1.0, 0.5, seed=7 )
+        csv_file = os.path.join( self.temp_dir, 'sweep.csv' )
+        self.assertEqual( runSweep( obj_file, specs, csv_file, processes=2, chunk_size=2 ), 0 )
+        with open( csv_file, 'rb' ) as f:
+            rows = sorted( csv.DictReader( f ), key=lambda row: int( row[ 'index' ] ) )
+        self.assertEqual( [ int( row[ 'index' ] ) for row in rows ], range( len( specs ) ) )
+        for row, spec in zip( rows, specs ):
+            expected = self.expected( surface, specDeltas( spec, face_count ) )
+            message = '%s, %s' % ( name, spec )
+            self.assertEqual( row[ 'error' ], '', message )
+            self.assertEqual( int( row[ 'vertices' ] ), expected.vertices.shape[0], message )
+            self.assertEqual( int( row[ 'faces' ] ), sum( 1 for face in expected.faces if face ), message )
+            self.assertAlmostEqual( float( row[ 'volume' ] ), ConvexHull( expected.vertices ).volume, 6, message )
+
+    def test_wrong_offset_count( self ):
+        '''Offsets which are neither uniform nor one per face are rejected.'''
+        name, surface = self.surfaces[0]
+        with self.assertRaises( ValueError ):
+            applyDeltas( surface, np.zeros( surface.planes.shape[0] + 1 ) )
+
+if __name__ == '__main__':
+    unittest.main()
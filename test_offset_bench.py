@@ -0,0 +1,135 @@
+# Tests the offset benchmark (offset_bench.py): random polytopes against
+# intersecting every triple of their planes, and the benchmark's results
+# against summarizing the recorded durations with numpy.
+#
+# Run with: python -m unittest test_offset_bench
+
+import csv
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import timing
+from offset_bench import CSV_FIELDS, POLYTOPE_STAGES, benchmarkObj, randomPolytope, summarize, writeResults
+from watertight import WatertightMesh
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+def bruteForceVertices( planes ):
+    '''Finds the vertices of the intersection of half spaces by intersecting
+    every triple of their planes.
+
+    @param  planes      An Nx4 array of planes ( a, b, c, d ); the half spaces
+                        are a*x + b*y + c*z + d <= 0.
+    @returns A list of the distinct vertices.
+    '''
+    scale = np.abs( planes[:, 3] ).max()
+    vertices = []
+    for triple in itertools.combinations( xrange( planes.shape[0] ), 3 ):
+        A = planes[ list( triple ), :3 ]
+        if ( abs( np.linalg.det( A ) ) < 1e-9 ):
+            continue
+        v = np.linalg.solve( A, -planes[ list( triple ), 3 ] )
+        if ( np.all( np.dot( planes[:, :3], v ) + planes[:, 3] <= 1e-9 * scale ) and
+             not any( np.allclose( v, w, atol=1e-7 * scale ) for w in vertices ) ):
+            vertices.append( v )
+    return vertices
+
+class OffsetBenchTest( unittest.TestCase ):
+    def test_random_polytope( self ):
+        '''A random polytope has the requested number of faces, all tangent to
+        a sphere, and its vertices are those found from every triple of its
+        planes; it survives being written to and read from an obj file.'''
+        temp_dir = tempfile.mkdtemp( prefix='test_offset_bench' )
+        try:
+            for face_count, seed in ( ( 4, 0 ), ( 5, 1 ), ( 12, 2 ), ( 40, 3 ), ( 40, 4 ) ):
+                name = '%d faces, seed %d' % ( face_count, seed )
+                polytope = randomPolytope( face_count, seed )
+                self.assertEqual( polytope.face_count(), face_count, name )
+                normals = polytope.normals.T
+                np.testing.assert_allclose( np.sum( normals ** 2, axis=1 ), 1.0, err_msg=name )
+                radius = np.sqrt( face_count / 4.0 )
+                planes = np.hstack( ( normals, np.tile( -radius, ( face_count, 1 ) ) ) )
+                expected = bruteForceVertices( planes )
+                self.assertEqual( polytope.vertex_count(), len( expected ), name )
+                for v in expected:
+                    self.assertTrue( np.isclose( polytope.vertices, v, atol=1e-7 * radius ).all( axis=1 ).any(),
+                                     '%s: %s' % ( name, v ) )
+                for i, face in enumerate( polytope.faces ):
+                    self.assertGreaterEqual( len( face ), 3, name )
+                    distances = np.dot( polytope.vertices[ face ], normals[ i ] ) - radius
+                    np.testing.assert_allclose( distances, 0.0, atol=1e-9 * radius, err_msg=name )
+                # The same seed gives the same polytope.
+                np.testing.assert_array_equal( randomPolytope( face_count, seed ).vertices, polytope.vertices )
+                obj_file = os.path.join( temp_dir, 'random.obj' )
+                with open( obj_file, 'w' ) as f:
+                    polytope.writeOBJ( f )
+                mesh = WatertightMesh()
+                mesh.from_obj_file( obj_file, use_cache=False )
+                self.assertEqual( mesh.face_count(), face_count, name )
+                self.assertEqual( mesh.vertex_count(), len( expected ), name )
+        finally:
+            shutil.rmtree( temp_dir )
+        with self.assertRaises( ValueError ):
+            randomPolytope( 3 )
+
+    def test_summarize( self ):
+        '''A result row summarizes the durations in milliseconds.'''
+        mesh = WatertightMesh()
+        mesh.from_obj_file( os.path.join( ROOT, 'cube.obj' ), use_cache=False )
+        durations = np.random.RandomState( 18 ).exponential( 0.01, 7 ).tolist()
+        row = summarize( 'cube', mesh, 'stage', durations )
+        self.assertEqual( sorted( row ), sorted( CSV_FIELDS ) )
+        self.assertEqual( ( row[ 'faces' ], row[ 'vertices' ], row[ 'repeats' ] ), ( 6, 8, 7 ) )
+        for field, statistic in ( ( 'min_ms', np.min ), ( 'median_ms', np.median ), ( 'mean_ms', np.mean ),
+                                  ( 'max_ms', np.max ) ):
+            self.assertAlmostEqual( row[ field ], statistic( durations ) * 1000.0, 9, field )
+
+    def test_benchmark( self ):
+        '''Each benchmarked stage is repeated and every polytope stage timed
+        within set_offset is reported; the results are written as csv and
+        json.'''
+        repeat = 3
+        rows = benchmarkObj( os.path.join( ROOT, 'dodec.obj' ), 'dodec', repeat )
+        stages = [ row[ 'stage' ] for row in rows ]
+        for stage in ( 'from_obj', 'OffsetSurface.__init__', 'set_offset uniform', 'set_offset single' ):
+            self.assertTrue( stage in stages, stage )
+        for row in rows:
+            self.assertEqual( ( row[ 'polytope' ], row[ 'faces' ] ), ( 'dodec', 12 ), row[ 'stage' ] )
+            if ( ':' not in row[ 'stage' ] ):
+                self.assertEqual( row[ 'repeats' ], repeat, row[ 'stage' ] )
+            else:
+                self.assertTrue( row[ 'stage' ].split( ': ' )[1] in POLYTOPE_STAGES, row[ 'stage' ] )
+        # The last rows are the single-face stages still held by the timings.
+        for stage in POLYTOPE_STAGES:
+            durations = timing.TIMINGS.durations( stage )
+            if ( durations ):
+                row = rows[ stages.index( 'set_offset single: %s' % stage ) ]
+                self.assertEqual( row[ 'repeats' ], len( durations ), stage )
+                self.assertAlmostEqual( row[ 'mean_ms' ], np.mean( durations ) * 1000.0, 9, stage )
+        temp_dir = tempfile.mkdtemp( prefix='test_offset_bench' )
+        try:
+            csv_file = os.path.join( temp_dir, 'bench.csv' )
+            writeResults( csv_file, rows, {} )
+            with open( csv_file, 'rb' ) as f:
+                written = list( csv.DictReader( f ) )
+            self.assertEqual( [ row[ 'stage' ] for row in written ], stages )
+            for row, expected in zip( written, rows ):
+                self.assertAlmostEqual( float( row[ 'max_ms' ] ), expected[ 'max_ms' ], 9, row[ 'stage' ] )
+            json_file = os.path.join( temp_dir, 'bench.json' )
+            writeResults( json_file, rows, { 'repeat' : repeat } )
+            with open( json_file ) as f:
+                data = json.load( f )
+            self.assertEqual( data[ 'settings' ], { 'repeat' : repeat } )
+            self.assertEqual( [ row[ 'stage' ] for row in data[ 'results' ] ], stages )
+            for row, expected in zip( data[ 'results' ], rows ):
+                self.assertAlmostEqual( row[ 'median_ms' ], expected[ 'median_ms' ], 9, row[ 'stage' ] )
+        finally:
+            shutil.rmtree( temp_dir )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# Tests the offset surfaces found from a fixed combinatorial structure -- the
+# events of a single face (OffsetSurface.face_events) and the offset skeleton
+# (OffsetSurface.build_skeleton) -- against polytopes computed from scratch,
+# for the polytopes shipped with the repository and a random polytope (see
+# offset_bench.randomPolytope).
+#
+# Run with: python -m unittest test_offset_events
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from offset import offsetSurfaceFromObj
+from offset_bench import SHIPPED, randomPolytope
+from polytope import HalfspacePolytope, PLANE_TOLERANCE
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# The distance within which the vertices of two surfaces are taken to agree.
+TOLERANCE = 1e-5
+
+# The largest offset tested.
+MAX_OFFSET = 10.0
+
+# The offsets tested for every polytope (in addition to offsets within each
+#   interval of its structure).
+OFFSETS = ( 0.0, 1e-7, 1e-5, 1e-3, 0.1, 1.0, 3.6, 5.0, 9.9 )
+
+def faceMismatch( vertices, faces, expected ):
+    '''Compares a surface with a polytope face by face: each face must have as
+    many vertices as the polytope's and each of its vertices must be within
+    TOLERANCE of one of the polytope's (and vice versa).
+
+    @param  vertices    An (N, 3) array of the surface's vertices.
+    @param  faces       A list of lists of vertex indices (one per plane).
+    @param  expected    The HalfspacePolytope.
+    @returns A message describing the first face which differs; None if none do.
+    '''
+    for i, ( face, other ) in enumerate( zip( faces, expected.faces ) ):
+        if ( len( face ) != len( other ) ):
+            return 'face %d has %d vertices, not %d' % ( i, len( face ), len( other ) )
+        if ( not face ):
+            continue
+        diff = vertices[ face ][:, np.newaxis, :] - expected.vertices[ other ][np.newaxis, :, :]
+        dist = np.sqrt( np.sum( diff ** 2, axis=2 ) )
+        if ( max( dist.min( axis=0 ).max(), dist.min( axis=1 ).max() ) > TOLERANCE ):
+            return 'face %d has vertices %s, not %s' % ( i, vertices[ face ].tolist(),
+                                                      expected.vertices[ other ].tolist() )
+    return None
+
+def shortestEdge( vertices, faces ):
+    '''Measures the shortest edge of a surface.
+
+    @param  vertices    An (N, 3) array of the surface's vertices.
+    @param  faces       A list of lists of vertex indices.
+    @returns The length of the shortest edge (infinite if there are none).
+    '''
+    shortest = np.inf
+    for face in faces:
+        if ( face ):
+            corners = vertices[ face ]
+            lengths = np.sqrt( np.sum( ( np.roll( corners, -1, axis=0 ) - corners ) ** 2, axis=1 ) )
+            shortest = min( shortest, lengths.min() )
+    return shortest
+
+class OffsetEventsTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.surfaces = [ ( name, offsetSurfaceFromObj( os.path.join( ROOT, name ) ) )
+                         for name in SHIPPED ]
+        temp_dir = tempfile.mkdtemp( prefix='test_offset_events' )
+        try:
+            obj_file = os.path.join( temp_dir, 'random.obj' )
+            with open( obj_file, 'w' ) as f:
+                randomPolytope( 50 ).writeOBJ( f )
+            cls.surfaces.append( ( 'random 50', offsetSurfaceFromObj( obj_file ) ) )
+        finally:
+            shutil.rmtree( temp_dir )
+
+    def expected( self, surface, offsets ):
+        '''Computes the polytope from scratch for the given offsets of the faces.'''
+        planes = surface.planes.copy()
+        planes[:, 3] -= offsets
+        return HalfspacePolytope( planes, surface.feasible_point )
+
+    def test_skeleton_intervals( self ):
+        '''The intervals of the skeleton are contiguous from zero.'''
+        for name, surface in self.surfaces:
+            skeleton = surface.build_skeleton( MAX_OFFSET )
+            self.assertEqual( skeleton._starts[0], 0.0, name )
+            for i in xrange( len( skeleton ) - 1 ):
+                self.assertEqual( skeleton._ends[ i ], skeleton._starts[ i + 1 ], name )
+            self.assertGreaterEqual( skeleton._ends[-1], MAX_OFFSET, name )
+
+    def test_skeleton_surfaces( self ):
+        '''The skeleton's surfaces match the polytopes computed from scratch.'''
+        for name, surface in self.surfaces:
+            skeleton = surface.build_skeleton( MAX_OFFSET )
+            middles = [ 0.5 * ( start + min( end, MAX_OFFSET ) )
+                        for start, end in zip( skeleton._starts, skeleton._ends ) ]
+            for offset in sorted( OFFSETS + tuple( middles ) ):
+                result = skeleton.surface( offset )
+                self.assertIsNotNone( result, '%s at %g' % ( name, offset ) )
+                vertices, faces = result
+                expected = self.expected( surface, offset )
+                mismatch = faceMismatch( vertices, faces, expected )
+                self.assertIsNone( mismatch, '%s at %g: %s' % ( name, offset, mismatch ) )
+                self.assertGreater( shortestEdge( vertices, faces ), PLANE_TOLERANCE,
+                                    '%s at %g' % ( name, offset ) )
+
+    def test_face_events( self ):
+        '''The polytopes of a face's events match those computed from scratch.'''
+        for name, surface in self.surfaces:
+            face_count = surface.planes.shape[0]
+            for face_index in xrange( 0, face_count, max( 1, face_count // 4 ) ):
+                events = surface.face_events( face_index, MAX_OFFSET )
+                middles = [ 0.5 * ( start + min( end, MAX_OFFSET ) )
+                            for start, end, polytope in events._intervals ]
+                offsets = np.zeros( face_count )
+                for offset in sorted( OFFSETS + tuple( middles ) ):
+                    polytope = events.polytope( offset )
+                    message = '%s, face %d at %g' % ( name, face_index, offset )
+                    self.assertIsNotNone( polytope, message )
+                    offsets[ face_index ] = offset
+                    expected = self.expected( surface, offsets )
+                    mismatch = faceMismatch( polytope.vertices, polytope.faces, expected )
+                    self.assertIsNone( mismatch, '%s: %s' % ( message, mismatch ) )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+# Tests computing offset surfaces in a background thread (offset_worker.py) --
+# for the polytopes shipped with the repository and a random polytope (see
+# offset_bench.randomPolytope) -- against polytopes and rounded surfaces
+# computed from scratch for the latest requested offsets.
+#
+# Run with: python -m unittest test_offset_worker
+
+import os
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+import numpy as np
+from offset import OffsetSurface, offsetSurfaceFromObj
+from offset_bench import SHIPPED, randomPolytope
+from offset_worker import OffsetWorker
+from polytope import HalfspacePolytope
+from rounded import roundedSurface
+from test_offset import randomDeltas
+from test_offset_events import faceMismatch
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# The longest time (in seconds) to wait for a hull.
+TIMEOUT = 60.0
+
+# A surface's vertices and faces (see faceMismatch()).
+Surface = namedtuple( 'Surface', ( 'vertices', 'faces' ) )
+
+def expectedSurface( surface, deltas, mode ):
+    '''Computes the offset surface from scratch.
+
+    @param  surface     The OffsetSurface (whose planes are offset).
+    @param  deltas      The offset of each face.
+    @param  mode        OffsetSurface.MITERED or ROUNDED.
+    @returns The polytope (mitered) or the Surface of the rounded offset's
+    translated faces.
+    '''
+    radius = deltas.min() if mode == OffsetSurface.ROUNDED else 0.0
+    planes = surface.planes.copy()
+    planes[:, 3] -= deltas - radius
+    polytope = HalfspacePolytope( planes, surface.feasible_point )
+    if ( radius == 0 ):
+        return polytope
+    positions, vertex_normals, flat_faces, triangles, edge_flags = \
+        roundedSurface( polytope.vertices, polytope.faces, surface.normals, radius, surface.round_angle )
+    return Surface( positions, flat_faces )
+
+class OffsetWorkerTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.temp_dir = tempfile.mkdtemp( prefix='test_offset_worker' )
+        obj_files = [ ( name, os.path.join( ROOT, name ) ) for name in SHIPPED ]
+        obj_file = os.path.join( cls.temp_dir, 'random.obj' )
+        with open( obj_file, 'w' ) as f:
+            randomPolytope( 50 ).writeOBJ( f )
+        obj_files.append( ( 'random 50', obj_file ) )
+        cls.meshes = [ ( name, offsetSurfaceFromObj( obj_file ).mesh ) for name, obj_file in obj_files ]
+
+    @classmethod
+    def tearDownClass( cls ):
+        shutil.rmtree( cls.temp_dir )
+
+    def setUp( self ):
+        self.workers = []
+
+    def tearDown( self ):
+        for worker in self.workers:
+            worker.stop()
+
+    def startWorker( self, mesh ):
+        '''Creates a surface (without a cache, so every hull is computed) and
+        its worker.'''
+        surface = OffsetSurface( mesh, cache_bytes=0 )
+        surface.set_offset( 0.0, -1 )
+        worker = OffsetWorker( surface )
+        self.workers.append( worker )
+        return surface, worker
+
+    def assertLatest( self, worker, message ):
+        '''Waits for the latest hull and asserts that it is the surface computed
+        from scratch for the surface's offsets and mode.'''
+        surface = worker.surface
+        self.assertTrue( worker.wait( TIMEOUT ), message )
+        self.assertTrue( worker.busy(), message )
+        self.assertTrue( worker.poll(), message )
+        self.assertFalse( worker.busy(), message )
+        self.assertFalse( worker.poll(), message )
+        expected = expectedSurface( surface, surface.deltas, surface.mode )
+        mismatch = faceMismatch( surface.hull.vertices, surface.hull.faces, expected )
+        self.assertIsNone( mismatch, '%s: %s' % ( message, mismatch ) )
+
+    def test_drag( self ):
+        '''Dragging single faces, every face and the mode gives the surfaces
+        computed from scratch; the surface's hull only changes when polled.'''
+        rand = np.random.RandomState( 21 )
+        for name, mesh in self.meshes:
+            surface, worker = self.startWorker( mesh )
+            face_count = surface.planes.shape[0]
+            for step in xrange( 12 ):
+                message = '%s, step %d' % ( name, step )
+                hull = surface.hull
+                kind = step % 4
+                if ( kind == 0 ):
+                    for offset in np.linspace( 0.0, rand.uniform( 0.0, 1.0 ), 10 ):
+                        worker.set_offset( offset, -1 )
+                elif ( kind == 1 ):
+                    face = rand.randint( face_count )
+                    for offset in np.linspace( 0.0, rand.uniform( -0.2, 1.0 ), 10 ):
+                        worker.set_offset( offset, face )
+                    self.assertGreaterEqual( surface.deltas[ face ], 0.0, message )
+                elif ( kind == 2 ):
+                    for face, offset in zip( np.flatnonzero( rand.uniform( size=face_count ) < 0.5 ),
+                                             randomDeltas( face_count, rand ) ):
+                        surface.assign_offset( offset, face )
+                    worker.request()
+                else:
+                    mode = surface.mode
+                    surface.set_mode( OffsetSurface.ROUNDED if mode == OffsetSurface.MITERED else
+                                      OffsetSurface.MITERED, recompute=False )
+                    worker.request()
+                self.assertIs( surface.hull, hull, message )
+                self.assertLatest( worker, message )
+
+    def test_latest_wins( self ):
+        '''Requests made while a hull is computed replace each other: only the
+        latest is computed.'''
+        name, mesh = self.meshes[-1]
+        surface, worker = self.startWorker( mesh )
+        computed = []
+        compute_hull = worker._compute_hull
+        def countingComputeHull( deltas, *args ):
+            computed.append( deltas )
+            return compute_hull( deltas, *args )
+        worker._compute_hull = countingComputeHull
+        rand = np.random.RandomState( 22 )
+        face_count = surface.planes.shape[0]
+        # The worker thread can't take a request while the condition is held.
+        with worker._condition:
+            for i in xrange( 50 ):
+                worker.set_offset( rand.uniform( 0.0, 1.0 ), rand.randint( -1, face_count ) )
+        self.assertLatest( worker, name )
+        self.assertEqual( len( computed ), 1 )
+        np.testing.assert_array_equal( computed[0], surface.deltas )
+
+    def test_stop( self ):
+        '''A stopped worker's thread ends; its last hull is still polled.'''
+        name, mesh = self.meshes[-1]
+        surface, worker = self.startWorker( mesh )
+        worker.set_offset( 0.5, -1 )
+        self.assertTrue( worker.wait( TIMEOUT ), name )
+        worker.stop()
+        worker._thread.join( TIMEOUT )
+        self.assertFalse( worker._thread.is_alive(), name )
+        self.assertTrue( worker.poll(), name )
+        expected = expectedSurface( surface, surface.deltas, surface.mode )
+        self.assertIsNone( faceMismatch( surface.hull.vertices, surface.hull.faces, expected ), name )
+        # Requests made after stopping aren't computed.
+        worker.set_offset( 0.7, -1 )
+        self.assertFalse( worker.wait( 0.1 ), name )
+
+if __name__ == '__main__':
+    unittest.main()
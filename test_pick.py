@@ -0,0 +1,234 @@
+# Tests face picking -- the id colors drawn for color-id picking, the rays cast
+# on the CPU and the footprints which save hover picks -- against intersecting
+# a ray with every triangle, one at a time, for the polytopes shipped with the
+# repository. No OpenGL context is needed.
+#
+# Run with: python -m unittest test_pick
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from manipulator import HoverPicker, OffsetSurface, pointInPolygon
+from offset_bench import SHIPPED
+from raypick import TriangleBVH, rayConvex
+from Select import idColors
+from test_watertight import randomTriangles, writeObj
+from watertight import WatertightMesh
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# The number of rays cast at each polytope.
+RAYS = 200
+
+def bruteForceRay( origin, direction, triangles ):
+    '''Intersects a ray with every triangle facing it, one at a time, by
+    solving for the ray parameter and the point's barycentric coordinates.
+
+    @param  origin      The origin of the ray (a length-3 array).
+    @param  direction   The direction of the ray (a length-3 array).
+    @param  triangles   A Tx3x3 array of (counter-clockwise) triangle vertices.
+    @returns A 2-tuple ( t, triangle ) of the nearest hit; ( inf, -1 ) if
+    there is none.
+    '''
+    best_t, best = np.inf, -1
+    for i, ( v0, v1, v2 ) in enumerate( triangles ):
+        if ( np.dot( np.cross( v1 - v0, v2 - v0 ), direction ) >= 0 ):
+            continue
+        # origin + t * direction = v0 + u * ( v1 - v0 ) + v * ( v2 - v0 )
+        t, u, v = np.linalg.solve( np.column_stack( ( direction, v0 - v1, v0 - v2 ) ), v0 - origin )
+        if ( t >= 0 and u >= 0 and v >= 0 and u + v <= 1 and t < best_t ):
+            best_t, best = t, i
+    return best_t, best
+
+def randomRays( vertices, count, rand ):
+    '''Creates rays from outside a polytope aimed at random points near it.
+
+    @param  vertices    The polytope's Nx3 vertices.
+    @param  count       The number of rays.
+    @param  rand        The numpy.random.RandomState.
+    @returns A list of ( origin, direction ) pairs.
+    '''
+    center = vertices.mean( axis=0 )
+    size = np.ptp( vertices, axis=0 ).max()
+    rays = []
+    for i in xrange( count ):
+        origin = rand.normal( size=3 )
+        origin *= 3 * size / np.sqrt( np.sum( origin ** 2 ) )
+        target = center + rand.uniform( -0.6, 0.6, 3 ) * size
+        rays.append( ( center + origin, target - center - origin ) )
+    return rays
+
+def windingNumber( q, polygon ):
+    '''Counts the turns a polygon makes around a point by adding up the angles
+    its edges subtend.'''
+    d0 = polygon - q
+    d1 = np.roll( d0, -1, axis=0 )
+    angles = np.arctan2( d0[:, 0] * d1[:, 1] - d0[:, 1] * d1[:, 0], np.sum( d0 * d1, axis=1 ) )
+    return int( np.round( angles.sum() / ( 2 * np.pi ) ) )
+
+def decodeColors( colors ):
+    '''Decodes id colors, a byte at a time.'''
+    return [ int( r ) + 256 * int( g ) + 65536 * int( b ) for r, g, b, a in colors ]
+
+class PickTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.surfaces = []
+        for name in SHIPPED:
+            mesh = WatertightMesh()
+            mesh.from_obj_file( os.path.join( ROOT, name ), use_cache=False )
+            surface = OffsetSurface( mesh )
+            surface.set_offset( 0.0, -1 )
+            cls.surfaces.append( ( name, surface ) )
+
+    def test_id_colors( self ):
+        '''Ids are encoded a byte per color channel, with an opaque alpha.'''
+        ids = np.array( [ 0, 1, 255, 256, 65535, 65536, 1 << 23, ( 1 << 24 ) - 1 ] +
+                        np.random.RandomState( 11 ).randint( 0, 1 << 24, 100 ).tolist() )
+        colors = idColors( ids )
+        self.assertEqual( colors.dtype, np.uint8 )
+        self.assertEqual( decodeColors( colors ), ids.tolist() )
+        self.assertTrue( np.all( colors[:, 3] == 255 ) )
+
+    def test_color_pick( self ):
+        '''The id color of the front-most triangle drawn for picking is that of
+        the face a ray enters the polytope through (plus one).'''
+        rand = np.random.RandomState( 12 )
+        for name, surface in self.surfaces:
+            surface.set_offset( 0.0, -1 )
+            positions, faces = surface.offset_triangles()
+            ids = decodeColors( surface.pick_buffer.colors )
+            # Every corner of a triangle has its face's id.
+            self.assertEqual( ids, np.repeat( faces + 1, 3 ).tolist(), name )
+            for origin, direction in randomRays( surface.vertices, RAYS, rand ):
+                t, triangle = bruteForceRay( origin, direction, positions )
+                picked = ids[ 3 * triangle ] if triangle >= 0 else 0
+                face = surface.pick_ray( origin, direction )
+                if ( picked != face + 1 ):
+                    # A ray through an edge may be counted in either face.
+                    expected_t = bruteForceRay( origin, direction, positions[ faces == face ] )[0]
+                    self.assertAlmostEqual( t, expected_t, 9, '%s: %s, %s' % ( name, origin, direction ) )
+
+    def test_convex_pick( self ):
+        '''A ray enters a convex polytope through the face of the nearest
+        triangle facing it.'''
+        rand = np.random.RandomState( 13 )
+        for name, surface in self.surfaces:
+            self.assertTrue( surface.convex, name )
+            surface.set_offsets( rand.uniform( 0.0, 0.3, surface.planes.shape[0] ) )
+            planes = surface.polytope.planes
+            triangles = surface.hull.vertices[ surface.hull.triangles()[0] ]
+            tri_faces = surface.hull.triangles()[1]
+            for origin, direction in randomRays( surface.hull.vertices, RAYS, rand ):
+                t, plane = rayConvex( origin, direction, planes )
+                expected_t, triangle = bruteForceRay( origin, direction, triangles )
+                message = '%s: %s, %s' % ( name, origin, direction )
+                if ( triangle < 0 ):
+                    self.assertEqual( plane, -1, message )
+                    continue
+                self.assertAlmostEqual( t, expected_t, 9, message )
+                # A ray through an edge may be counted in either face.
+                if ( plane != tri_faces[ triangle ] ):
+                    plane = planes[ tri_faces[ triangle ] ]
+                    self.assertAlmostEqual( np.dot( origin + t * direction, plane[:3] ) + plane[3], 0.0, 9,
+                                            message )
+
+    def test_bvh( self ):
+        '''The hierarchy finds the same hits as testing every triangle, for
+        overlapping triangles of all sizes and leaves of any size.'''
+        rand = np.random.RandomState( 14 )
+        for count, leaf_size in ( ( 0, 16 ), ( 1, 16 ), ( 50, 1 ), ( 50, 4 ), ( 300, 16 ) ):
+            centers = rand.uniform( -1.0, 1.0, ( count, 1, 3 ) )
+            scales = rand.uniform( 0.01, 1.0, ( count, 1, 1 ) )
+            triangles = centers + rand.normal( 0.0, 0.3, ( count, 3, 3 ) ) * scales
+            bvh = TriangleBVH( triangles, leaf_size )
+            for origin, direction in randomRays( np.array( [ [ -1.0 ] * 3, [ 1.0 ] * 3 ] ), RAYS, rand ):
+                if ( rand.uniform() < 0.1 ):
+                    # Rays parallel to an axis.
+                    direction = np.roll( [ 0.0, 0.0, np.sign( direction[0] ) ], rand.randint( 3 ) )
+                t, triangle = bvh.intersect( origin, direction )
+                expected_t, expected = bruteForceRay( origin, direction, triangles )
+                message = '%d triangles: %s, %s' % ( count, origin, direction )
+                self.assertEqual( triangle, expected, message )
+                if ( expected >= 0 ):
+                    self.assertAlmostEqual( t, expected_t, 9, message )
+
+    def test_nonconvex_pick( self ):
+        '''A mesh is convex if every vertex is below every face's plane; a ray
+        picks a non-convex mesh's face of the nearest offset triangle facing
+        it.'''
+        rand = np.random.RandomState( 15 )
+        vertices, faces = randomTriangles( 60, rand )
+        dented = vertices.copy()
+        dented[0] *= 0.3
+        temp_dir = tempfile.mkdtemp( prefix='test_pick' )
+        try:
+            meshes = []
+            for positions in ( vertices, dented ):
+                obj_file = os.path.join( temp_dir, 'triangles.obj' )
+                writeObj( obj_file, positions, faces )
+                mesh = WatertightMesh()
+                mesh.from_obj_file( obj_file, use_cache=False )
+                meshes.append( mesh )
+        finally:
+            shutil.rmtree( temp_dir )
+        for mesh, convex in zip( meshes, ( True, False ) ):
+            positions = mesh.vertex_pos[:3, :].T
+            heights = [ np.dot( positions - positions[ face.vertices[0] ], mesh.face_normals[:, i] ).max()
+                        for i, face in enumerate( mesh.faces ) ]
+            size = np.ptp( positions, axis=0 ).max()
+            self.assertEqual( max( heights ) <= 1e-6 * size, convex )
+            self.assertEqual( mesh.is_convex(), convex )
+        surface = OffsetSurface( mesh )
+        surface.set_offsets( rand.uniform( 0.0, 0.2, surface.deltas.size ) )
+        positions, tri_faces = surface.offset_triangles()
+        for origin, direction in randomRays( dented, RAYS, rand ):
+            t, triangle = bruteForceRay( origin, direction, positions )
+            expected = tri_faces[ triangle ] if triangle >= 0 else -1
+            self.assertEqual( surface.pick_ray( origin, direction ), expected,
+                              '%s, %s' % ( origin, direction ) )
+
+    def test_point_in_polygon( self ):
+        '''A point is inside a simple polygon if the polygon winds around it.'''
+        rand = np.random.RandomState( 16 )
+        for i in xrange( 50 ):
+            # A star-shaped (often not convex) polygon.
+            count = rand.randint( 3, 12 )
+            angles = np.sort( rand.uniform( 0.0, 2 * np.pi, count ) )
+            radii = rand.uniform( 0.2, 1.0, count )
+            polygon = np.column_stack( ( radii * np.cos( angles ), radii * np.sin( angles ) ) )
+            for q in rand.uniform( -1.0, 1.0, ( 50, 2 ) ):
+                self.assertEqual( pointInPolygon( q, polygon ), windingNumber( q, polygon ) != 0,
+                                  '%s in %s' % ( q, polygon.tolist() ) )
+
+    def test_hover_footprint( self ):
+        '''A point the footprint covers picks the footprint's face (looking
+        down the z axis); a changed view or hull covers nothing.'''
+        rand = np.random.RandomState( 17 )
+        for name, surface in self.surfaces:
+            surface.set_offset( 0.0, -1 )
+            hull = surface.hull
+            triangles = hull.vertices[ hull.triangles()[0] ]
+            size = np.ptp( hull.vertices, axis=0 ).max()
+            top = hull.vertices[:, 2].max() + size
+            picker = HoverPicker()
+            covered = 0
+            direction = np.array( [ 0.0, 0.0, -1.0 ] )
+            for q in rand.uniform( -size, size, ( RAYS, 2 ) ):
+                t, triangle = bruteForceRay( np.array( [ q[0], q[1], top ] ), direction, triangles )
+                face = hull.triangles()[1][ triangle ] if triangle >= 0 else -1
+                if ( picker.covers( q, 'view', hull ) ):
+                    covered += 1
+                    self.assertEqual( face, picker.face, '%s at %s' % ( name, q ) )
+                    self.assertFalse( picker.covers( q, 'other view', hull ) )
+                    self.assertFalse( picker.covers( q, 'view', surface.polytope ) )
+                elif ( face >= 0 ):
+                    polygon = hull.vertices[ hull.faces[ face ] ][:, :2]
+                    picker.set_footprint( face, polygon, 'view', hull )
+            self.assertGreater( covered, 0, name )
+
+if __name__ == '__main__':
+    unittest.main()
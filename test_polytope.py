@@ -0,0 +1,237 @@
+# Tests HalfspacePolytope's faces against the distances of its vertices to its
+# planes, its Chebyshev center against a linear program of all of its planes
+# and its updates -- translating one or every plane (at once) without
+# recomputing the half space intersection, or adding half spaces to it --
+# against polytopes computed from scratch, for the polytopes shipped with the
+# repository and random polytopes (see offset_bench.randomPolytope).
+#
+# Run with: python -m unittest test_polytope
+
+import os
+import unittest
+import numpy as np
+from scipy.optimize import linprog
+from offset import offsetSurfaceFromObj
+from offset_bench import SHIPPED, randomPolytope
+from polytope import HalfspacePolytope, PLANE_TOLERANCE, chebyshevCenter, planeClearance, weldVertices
+from test_offset_events import faceMismatch
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# The face counts of the random polytopes.
+RANDOM_SIZES = ( 30, 300 )
+
+# The number of faces dragged on each polytope and the steps of each drag.
+DRAG_FACES = 6
+DRAG_STEPS = 30
+
+def randomPlanes( face_count, rand ):
+    '''Creates the planes of a random polytope, each moved away from the sphere
+    it is tangent to by a random distance (so some planes don't touch the
+    polytope).
+
+    @param  face_count  The number of planes.
+    @param  rand        The numpy.random.RandomState.
+    @returns An (F, 4) array of planes (the origin is inside all of them).
+    '''
+    mesh = randomPolytope( face_count, seed=rand.randint( 1000 ) )
+    d = -np.sqrt( face_count / 4.0 ) - rand.uniform( 0.0, 0.3, face_count )
+    return np.column_stack( ( mesh.normals.T, d ) )
+
+def bruteForceWeld( vertices, tolerance ):
+    '''Welds vertices by testing every pair (see polytope.weldVertices).
+
+    @returns An (N,) int array: the smallest index of the vertices welded with
+    each vertex.
+    '''
+    close = np.sqrt( np.sum( ( vertices[:, np.newaxis] - vertices[np.newaxis] ) ** 2, axis=2 ) ) < tolerance
+    groups = np.arange( vertices.shape[0] )
+    while ( True ):
+        merged = np.array( [ groups[ row ].min() for row in close ] )
+        if ( np.array_equal( merged, groups ) ):
+            return groups
+        groups = merged
+
+def bruteForceChebyshev( planes ):
+    '''Finds the radius of the largest ball inside the half spaces by solving
+    the linear program of every plane at once (see polytope.chebyshevCenter).'''
+    lengths = np.sqrt( np.sum( planes[:, :3] ** 2, axis=1 ) )
+    result = linprog( ( 0.0, 0.0, 0.0, -1.0 ), A_ub=np.column_stack( ( planes[:, :3], lengths ) ),
+                      b_ub=-planes[:, 3], bounds=[ ( None, None ) ] * 4, method='simplex' )
+    return -result.fun
+
+class WeldTest( unittest.TestCase ):
+    def test_weld( self ):
+        '''Welding matches testing every pair of vertices, including chains of
+        vertices welded through each other.'''
+        rand = np.random.RandomState( 3 )
+        for count in ( 1, 2, 10, 300 ):
+            # Clusters of nearly coincident vertices and chains a little
+            #   shorter than the tolerance per link.
+            centers = rand.uniform( -1.0, 1.0, ( count, 3 ) )
+            cluster = centers[ rand.randint( 0, count, count ) ] + rand.normal( 0.0, PLANE_TOLERANCE, ( count, 3 ) )
+            chain = centers[:1] + 0.9 * PLANE_TOLERANCE * np.arange( count )[:, np.newaxis] * np.array( [ 1.0, 0.0, 0.0 ] )
+            vertices = np.vstack( ( centers, cluster, chain ) )
+            welded, vertex_map = weldVertices( vertices )
+            groups = bruteForceWeld( vertices, PLANE_TOLERANCE )
+            # The same vertices are welded together: each vertex is welded
+            #   with the first of its group and there are as many welded
+            #   vertices as groups.
+            np.testing.assert_array_equal( vertex_map[ groups ], vertex_map )
+            self.assertEqual( welded.shape[0], np.unique( groups ).size, count )
+            # Each welded vertex is the mean of its vertices.
+            for i in np.unique( groups ):
+                np.testing.assert_allclose( welded[ vertex_map[ i ] ], vertices[ groups == i ].mean( axis=0 ) )
+
+class PolytopeTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        rand = np.random.RandomState( 1 )
+        cls.polytopes = []
+        for name in SHIPPED:
+            surface = offsetSurfaceFromObj( os.path.join( ROOT, name ) )
+            cls.polytopes.append( ( name, surface.planes, surface.feasible_point ) )
+        for face_count in RANDOM_SIZES:
+            cls.polytopes.append( ( 'random %d' % face_count, randomPlanes( face_count, rand ),
+                                    np.zeros( 3 ) ) )
+
+    def assertMatches( self, polytope, message ):
+        '''Asserts that the polytope matches the one computed from scratch for
+        its planes.'''
+        expected = HalfspacePolytope( polytope.planes, polytope.feasible_point )
+        mismatch = faceMismatch( polytope.vertices, polytope.faces, expected )
+        self.assertIsNone( mismatch, '%s: %s' % ( message, mismatch ) )
+
+    def test_plane_incidence( self ):
+        '''Each face holds exactly the vertices within PLANE_TOLERANCE of its
+        plane (including a duplicated plane, which qhull omits), and each
+        simple vertex's planes are the three it lies on.'''
+        for name, planes, point in self.polytopes:
+            planes = np.vstack( ( planes, planes[:1] ) )
+            polytope = HalfspacePolytope( planes, point )
+            dist = np.dot( polytope.vertices, planes[:, :3].T ) + planes[:, 3]
+            for i, face in enumerate( polytope.faces ):
+                expected = np.flatnonzero( np.abs( dist[:, i] ) < PLANE_TOLERANCE )
+                self.assertEqual( sorted( face ), expected.tolist(), '%s, face %d' % ( name, i ) )
+            on_planes = np.abs( dist ) < PLANE_TOLERANCE
+            np.testing.assert_array_equal( polytope.degenerate, on_planes.sum( axis=1 ) != 3, name )
+            for v in np.flatnonzero( ~polytope.degenerate ):
+                self.assertEqual( sorted( polytope.vertex_planes[ v ] ),
+                                  np.flatnonzero( on_planes[ v ] ).tolist(), '%s, vertex %d' % ( name, v ) )
+
+    def test_face_order( self ):
+        '''Each face's vertices turn counter-clockwise about its plane's normal
+        at every corner.'''
+        for name, planes, point in self.polytopes:
+            polytope = HalfspacePolytope( planes, point )
+            for i, face in enumerate( polytope.faces ):
+                if ( not face ):
+                    continue
+                corners = polytope.vertices[ face ]
+                edges = np.roll( corners, -1, axis=0 ) - corners
+                turns = np.dot( np.cross( edges, np.roll( edges, -1, axis=0 ) ), planes[ i, :3 ] )
+                self.assertTrue( np.all( turns > 0 ), '%s, face %d' % ( name, i ) )
+                # The turns add up to one revolution (the face doesn't wind
+                #   around twice).
+                angles = np.arctan2( turns, np.sum( edges * np.roll( edges, -1, axis=0 ), axis=1 ) )
+                self.assertAlmostEqual( angles.sum(), 2 * np.pi, 6, '%s, face %d' % ( name, i ) )
+
+    def test_drag_face( self ):
+        '''Dragging a single plane back and forth matches the polytopes
+        computed from scratch, whether or not the update was incremental.'''
+        rand = np.random.RandomState( 2 )
+        incremental = 0
+        for name, planes, point in self.polytopes:
+            polytope = HalfspacePolytope( planes, point )
+            scale = 0.03 * np.ptp( polytope.vertices, axis=0 ).max()
+            for index in rand.randint( 0, planes.shape[0], DRAG_FACES ):
+                d = polytope.planes[ index, 3 ]
+                for step in xrange( DRAG_STEPS ):
+                    d += rand.uniform( -scale, scale )
+                    incremental += polytope.set_plane_constant( index, d )
+                    self.assertMatches( polytope, '%s, plane %d at %g' % ( name, index, d ) )
+        # Most steps don't change the structure.
+        self.assertGreater( incremental, DRAG_STEPS * DRAG_FACES * len( self.polytopes ) // 2 )
+
+    def test_drag_past_neighbors( self ):
+        '''Dragging a plane inward until its face vanishes, and back out,
+        matches the polytopes computed from scratch.'''
+        for name, planes, point in self.polytopes:
+            polytope = HalfspacePolytope( planes, point )
+            index = 0
+            # The plane's distance from the feasible point.
+            depth = -( np.dot( planes[ index, :3 ], point ) + planes[ index, 3 ] )
+            d = planes[ index, 3 ]
+            constants = d + depth * np.linspace( 0.0, 0.99, 25 )
+            for constant in np.concatenate( ( constants, constants[::-1] ) ):
+                polytope.set_plane_constant( index, constant )
+                self.assertMatches( polytope, '%s, plane %d at %g' % ( name, index, constant ) )
+
+    def test_translate_planes( self ):
+        '''Translating every plane at once -- uniformly, by small per-plane
+        amounts and by large ones -- matches the polytopes computed from
+        scratch; the faces are kept when the vertices are merely moved.'''
+        rand = np.random.RandomState( 24 )
+        translated = steps = 0
+        for name, planes, point in self.polytopes:
+            polytope = HalfspacePolytope( planes, point )
+            scale = np.ptp( polytope.vertices, axis=0 ).max()
+            for step in xrange( 12 ):
+                kind = step % 3
+                if ( kind == 0 ):
+                    d = planes[:, 3] - rand.uniform( 0.0, 0.3 ) * scale
+                elif ( kind == 1 ):
+                    d = polytope.planes[:, 3] + rand.uniform( -1e-3, 1e-3, planes.shape[0] ) * scale
+                else:
+                    d = planes[:, 3] - rand.uniform( 0.0, 0.3, planes.shape[0] ) * scale
+                faces = polytope.faces
+                message = '%s, step %d' % ( name, step )
+                if ( polytope.set_plane_constants( d ) ):
+                    translated += 1
+                    self.assertIs( polytope.faces, faces, message )
+                steps += 1
+                np.testing.assert_array_equal( polytope.planes[:, 3], d, message )
+                self.assertMatches( polytope, message )
+        # The uniform and small translations of the simple polytopes keep the
+        #   structure.
+        self.assertGreater( translated, steps // 3 )
+
+    def test_chebyshev_center( self ):
+        '''The center found from subsets of the planes is as far from the
+        nearest plane as the center of all of them, from any starting point;
+        half spaces without a common interior have no positive radius.'''
+        rand = np.random.RandomState( 22 )
+        for name, planes, point in self.polytopes:
+            size = np.abs( planes[:, 3] ).max()
+            expected = bruteForceChebyshev( planes )
+            for start in ( None, point, rand.uniform( -size, size, 3 ) ):
+                center, radius = chebyshevCenter( planes, point=start )
+                self.assertAlmostEqual( radius / expected, 1.0, 6, name )
+                self.assertAlmostEqual( planeClearance( planes, center ), radius, 12, name )
+            # A plane facing the opposite way, beyond the center.
+            cut = np.append( -planes[0, :3], -planes[0, 3] + expected )
+            center, radius = chebyshevCenter( np.vstack( ( planes, cut ) ), point=point )
+            self.assertLessEqual( radius, PLANE_TOLERANCE * size, name )
+
+    def test_add_halfspaces( self ):
+        '''Dragging planes inward, so their faces shrink and vanish, adds their
+        half spaces to the previous intersection and matches the polytopes
+        computed from scratch.'''
+        rand = np.random.RandomState( 23 )
+        added = 0
+        for name, planes, point in self.polytopes:
+            polytope = HalfspacePolytope( planes, point )
+            for index in rand.randint( 0, planes.shape[0], DRAG_FACES ):
+                depth = -( np.dot( planes[ index, :3 ], polytope.feasible_point ) + polytope.planes[ index, 3 ] )
+                for step in xrange( 5 ):
+                    d = polytope.planes[ index, 3 ] + rand.uniform( 0.0, 0.1 ) * depth
+                    half_spaces = polytope._qhull_planes.size
+                    polytope.set_plane_constant( index, d )
+                    added += polytope._qhull_planes.size > half_spaces
+                    self.assertMatches( polytope, '%s, plane %d at %g' % ( name, index, d ) )
+        # Some half spaces were added rather than the polytopes rebuilt.
+        self.assertGreater( added, 0 )
+
+if __name__ == '__main__':
+    unittest.main()
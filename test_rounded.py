@@ -0,0 +1,173 @@
+# Tests the rounded offsets of convex polytopes (rounded.roundedSurface and the
+# ROUNDED mode of OffsetSurface) -- for the polytopes shipped with the
+# repository and a random polytope (see offset_bench.randomPolytope) --
+# against the distance of every surface vertex to the polytope, the convex
+# hull of the surface's vertices and the volume of the Minkowski sum (Steiner's
+# formula).
+#
+# Run with: python -m unittest test_rounded
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.spatial import ConvexHull
+from offset import OffsetSurface, offsetSurfaceFromObj
+from offset_bench import SHIPPED, randomPolytope
+from polytope import HalfspacePolytope, PLANE_TOLERANCE
+from rounded import roundedSurface
+from test_offset import randomDeltas
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+def surfaceTriangles( flat_faces, triangles ):
+    '''Lists the triangles of the translated faces (fans around their first
+    vertices) and of the cylinders and spheres.'''
+    result = [ ( f[0], f[ k ], f[ k + 1 ] ) for f in flat_faces for k in xrange( 1, len( f ) - 1 ) ]
+    return np.array( result + triangles.tolist() )
+
+def enclosedVolume( positions, triangles ):
+    '''Computes the volume enclosed by counter-clockwise triangles (by the
+    divergence theorem).'''
+    a, b, c = positions[ triangles[:, 0] ], positions[ triangles[:, 1] ], positions[ triangles[:, 2] ]
+    return np.sum( a * np.cross( b, c ) ) / 6.0
+
+def steinerVolume( vertices, faces, normals, radius ):
+    '''Computes the volume of the Minkowski sum of a convex polytope and a ball
+    from the polytope's volume, area and edges (Steiner's formula).
+
+    @param  vertices    A Vx3 array of the polytope's vertices.
+    @param  faces       A list of lists of vertex indices (counter-clockwise);
+                        faces with fewer than three vertices and repeated
+                        faces are ignored.
+    @param  normals     A 3xF array of the faces' unit normals.
+    @param  radius      The radius of the ball.
+    @returns The volume.
+    '''
+    area = 0.0
+    # Maps each directed edge to the normal of its face.
+    edge_normals = {}
+    seen = set()
+    for i, face in enumerate( faces ):
+        if ( len( face ) < 3 or frozenset( face ) in seen ):
+            continue
+        seen.add( frozenset( face ) )
+        corners = vertices[ face ]
+        area += 0.5 * np.dot( np.sum( np.cross( corners, np.roll( corners, -1, axis=0 ) ), axis=0 ),
+                              normals[:, i] )
+        for v, w in zip( face, face[1:] + face[:1] ):
+            edge_normals[ ( v, w ) ] = normals[:, i]
+    # The integral of the mean curvature: half the sum of each edge's length
+    #   times the angle between its faces' normals.
+    curvature = 0.0
+    for ( v, w ), n in edge_normals.iteritems():
+        angle = np.arccos( np.clip( np.dot( n, edge_normals[ ( w, v ) ] ), -1.0, 1.0 ) )
+        curvature += 0.25 * np.sqrt( np.sum( ( vertices[ w ] - vertices[ v ] ) ** 2 ) ) * angle
+    return ( ConvexHull( vertices ).volume + area * radius + curvature * radius ** 2 +
+             4.0 / 3.0 * np.pi * radius ** 3 )
+
+class RoundedTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.temp_dir = tempfile.mkdtemp( prefix='test_rounded' )
+        obj_files = [ ( name, os.path.join( ROOT, name ) ) for name in SHIPPED ]
+        obj_file = os.path.join( cls.temp_dir, 'random.obj' )
+        with open( obj_file, 'w' ) as f:
+            randomPolytope( 50 ).writeOBJ( f )
+        obj_files.append( ( 'random 50', obj_file ) )
+        cls.surfaces = [ ( name, offsetSurfaceFromObj( obj_file ) ) for name, obj_file in obj_files ]
+
+    @classmethod
+    def tearDownClass( cls ):
+        shutil.rmtree( cls.temp_dir )
+
+    def assertRounded( self, positions, vertex_normals, flat_faces, triangles, polytope, radius, max_angle,
+                       message ):
+        '''Asserts that the rounded surface is closed, (nearly) convex and
+        outward facing, and that each vertex is the radius from the polytope
+        along its normal.'''
+        # Every directed edge is used once, and so is its reverse.
+        all_triangles = surfaceTriangles( flat_faces, triangles )
+        edges = set()
+        for t in all_triangles.tolist():
+            for edge in zip( t, t[1:] + t[:1] ):
+                self.assertFalse( edge in edges, '%s: edge %s' % ( message, edge ) )
+                edges.add( edge )
+        self.assertTrue( all( ( w, v ) in edges for v, w in edges ), message )
+        # The point of the polytope nearest a vertex is the vertex minus the
+        #   radius times its normal: that point is in the polytope and no point
+        #   of the polytope is further along the normal.
+        # (The face normals read from obj files are unit to their precision.)
+        np.testing.assert_allclose( np.sum( vertex_normals ** 2, axis=1 ), 1.0, 1e-6, err_msg=message )
+        nearest = positions - radius * vertex_normals
+        planes = polytope.planes
+        self.assertLess( ( np.dot( nearest, planes[:, :3].T ) + planes[:, 3] ).max(), PLANE_TOLERANCE, message )
+        support = np.dot( polytope.vertices, vertex_normals.T ).max( axis=0 )
+        self.assertLess( ( support - np.sum( nearest * vertex_normals, axis=1 ) ).max(), PLANE_TOLERANCE,
+                         message )
+        # The surface bounds (nearly) the convex hull of its vertices; the
+        #   sectors of the spheres aren't split like the hull of their samples,
+        #   so they may dip below it by a little more than the sampling error.
+        volume = enclosedVolume( positions, all_triangles )
+        hull_volume = ConvexHull( positions ).volume
+        self.assertLessEqual( volume, hull_volume * ( 1 + 1e-9 ), message )
+        self.assertGreater( volume, hull_volume * ( 1 - 0.05 * max_angle ** 2 ), message )
+        return volume
+
+    def test_rounded_surface( self ):
+        '''The rounded surface is closed and (nearly) convex, its vertices are the
+        radius from the polytope and its volume approaches that of the
+        Minkowski sum as the tessellation gets finer.'''
+        for name, surface in self.surfaces:
+            polytope = HalfspacePolytope( surface.planes, surface.feasible_point )
+            for radius in ( 0.05, 1.0 ):
+                steiner = steinerVolume( polytope.vertices, polytope.faces, surface.normals, radius )
+                errors = []
+                for max_angle in ( np.pi / 6, np.pi / 12, np.pi / 48 ):
+                    message = '%s, radius %g, angle %g' % ( name, radius, max_angle )
+                    positions, vertex_normals, flat_faces, triangles, edge_flags = \
+                        roundedSurface( polytope.vertices, polytope.faces, surface.normals, radius, max_angle )
+                    self.assertEqual( edge_flags.shape, triangles.shape, message )
+                    volume = self.assertRounded( positions, vertex_normals, flat_faces, triangles, polytope,
+                                                 radius, max_angle, message )
+                    # The tessellation is inscribed in the Minkowski sum.
+                    self.assertLessEqual( volume, steiner * ( 1 + 1e-9 ), message )
+                    errors.append( ( steiner - volume ) / steiner )
+                self.assertLess( errors[-1], 1e-2, name )
+                self.assertLessEqual( errors[-1], errors[0], name )
+
+    def test_rounded_mode( self ):
+        '''A rounded offset is the polytope offset by each face's offset less
+        the smallest one, rounded by the smallest offset.'''
+        rand = np.random.RandomState( 19 )
+        for name, surface in self.surfaces:
+            surface = OffsetSurface( surface.mesh )
+            surface.set_mode( OffsetSurface.ROUNDED )
+            face_count = surface.planes.shape[0]
+            for i in xrange( 3 ):
+                deltas = randomDeltas( face_count, rand ) + rand.uniform( 0.01, 0.3 )
+                surface.set_offsets( deltas )
+                radius = deltas.min()
+                self.assertEqual( surface.ball_radius(), radius, name )
+                planes = surface.planes.copy()
+                planes[:, 3] -= deltas - radius
+                expected = HalfspacePolytope( planes, surface.feasible_point )
+                hull = surface.hull
+                message = '%s, configuration %d' % ( name, i )
+                volume = self.assertRounded( hull.vertices, hull.vertex_normals, hull.faces, hull.patches,
+                                             expected, radius, surface.round_angle, message )
+                positions, vertex_normals, flat_faces, triangles, edge_flags = \
+                    roundedSurface( expected.vertices, expected.faces, surface.normals, radius,
+                                    surface.round_angle )
+                self.assertEqual( hull.vertices.shape, positions.shape, message )
+                self.assertAlmostEqual( volume / enclosedVolume( positions, surfaceTriangles( flat_faces, triangles ) ),
+                                        1.0, 9, message )
+            # Back to a mitered offset, the hull is the polytope itself.
+            surface.set_mode( OffsetSurface.MITERED )
+            self.assertEqual( surface.ball_radius(), 0.0, name )
+            self.assertFalse( hasattr( surface.hull, 'patches' ), name )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# Tests the stage timings (timing.StageTimings) -- their recent durations,
+# summaries and CSV and JSON dumps -- against keeping every duration recorded,
+# for durations recorded from one thread and from several at once.
+#
+# Run with: python -m unittest test_timing
+
+import csv
+import json
+import threading
+import unittest
+from collections import OrderedDict
+from StringIO import StringIO
+import numpy as np
+from timing import StageTimings
+
+# The stages timed.
+STAGES = ( 'qhull', 'upload', 'pick', 'draw' )
+
+def recordRandom( timings, count, rand ):
+    '''Records random durations of random stages.
+
+    @param  timings     The StageTimings.
+    @param  count       The number of durations.
+    @param  rand        The numpy.random.RandomState.
+    @returns A dict mapping stage name -> the list of every duration recorded
+    (oldest first) and the list of stage names in the order first recorded.
+    '''
+    recorded = OrderedDict()
+    for i in xrange( count ):
+        name = STAGES[ rand.randint( len( STAGES ) ) ]
+        seconds = rand.exponential( 0.01 )
+        timings.record( name, seconds )
+        recorded.setdefault( name, [] ).append( seconds )
+    return recorded
+
+class TimingTest( unittest.TestCase ):
+    def assertSummary( self, timings, recorded ):
+        '''Asserts that the durations and summary of the timings are those of
+        the last history durations of each stage recorded.'''
+        self.assertEqual( timings.stages(), recorded.keys() )
+        summary = timings.summary()
+        self.assertEqual( [ row[ 'stage' ] for row in summary ], recorded.keys() )
+        for row, ( name, every ) in zip( summary, recorded.items() ):
+            recent = every[ -timings.history: ]
+            self.assertEqual( timings.durations( name ), recent, name )
+            self.assertEqual( row[ 'count' ], len( every ), name )
+            self.assertEqual( row[ 'samples' ], len( recent ), name )
+            self.assertAlmostEqual( row[ 'last' ], recent[-1] * 1000.0, 9, name )
+            self.assertAlmostEqual( row[ 'mean' ], np.mean( recent ) * 1000.0, 9, name )
+            self.assertAlmostEqual( row[ 'max' ], np.max( recent ) * 1000.0, 9, name )
+
+    def test_history( self ):
+        '''Only the most recent durations of each stage are kept, but every
+        execution is counted.'''
+        rand = np.random.RandomState( 17 )
+        for history in ( 1, 5, 256 ):
+            timings = StageTimings( history )
+            self.assertEqual( timings.summary(), [] )
+            self.assertEqual( timings.durations( 'qhull' ), [] )
+            recorded = recordRandom( timings, 1000, rand )
+            self.assertSummary( timings, recorded )
+            timings.clear()
+            self.assertEqual( timings.stages(), [] )
+            self.assertSummary( timings, recordRandom( timings, 10, rand ) )
+
+    def test_threads( self ):
+        '''Durations recorded from several threads at once are all counted.'''
+        timings = StageTimings( 10000 )
+        results = [ None ] * 4
+        def record( i ):
+            results[ i ] = recordRandom( timings, 2000, np.random.RandomState( i ) )
+        threads = [ threading.Thread( target=record, args=( i, ) ) for i in xrange( len( results ) ) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for row in timings.summary():
+            name = row[ 'stage' ]
+            every = sum( ( r.get( name, [] ) for r in results ), [] )
+            self.assertEqual( row[ 'count' ], len( every ), name )
+            self.assertEqual( sorted( timings.durations( name ) ), sorted( every ), name )
+
+    def test_stage( self ):
+        '''A stage is timed by the block it manages, even if the block raises;
+        disabled timings time nothing.'''
+        timings = StageTimings()
+        with timings.stage( 'qhull' ):
+            pass
+        with self.assertRaises( ZeroDivisionError ):
+            with timings.stage( 'pick' ):
+                1 / 0
+        self.assertEqual( timings.stages(), [ 'qhull', 'pick' ] )
+        self.assertTrue( all( 0 <= d < 1 for name in timings.stages() for d in timings.durations( name ) ) )
+        timings.enabled = False
+        with timings.stage( 'qhull' ):
+            pass
+        self.assertEqual( timings.summary()[0][ 'count' ], 1 )
+
+    def test_dumps( self ):
+        '''The CSV dump lists each recent duration; the JSON dump has the
+        summary and the recent durations.'''
+        rand = np.random.RandomState( 18 )
+        timings = StageTimings( 20 )
+        recorded = recordRandom( timings, 100, rand )
+        outfile = StringIO()
+        timings.dump_csv( outfile )
+        rows = list( csv.reader( StringIO( outfile.getvalue() ) ) )
+        self.assertEqual( rows[0], [ 'stage', 'sample', 'ms' ] )
+        expected = [ ( name, i, seconds * 1000.0 ) for name, every in recorded.items()
+                     for i, seconds in enumerate( every[ -20: ] ) ]
+        self.assertEqual( len( rows ) - 1, len( expected ) )
+        for row, ( name, i, ms ) in zip( rows[1:], expected ):
+            self.assertEqual( row[:2], [ name, str( i ) ] )
+            self.assertAlmostEqual( float( row[2] ), ms, 4 )
+        outfile = StringIO()
+        timings.dump_json( outfile )
+        data = json.loads( outfile.getvalue() )
+        self.assertEqual( data[ 'summary' ], json.loads( json.dumps( timings.summary() ) ) )
+        self.assertEqual( sorted( data[ 'durations' ] ), sorted( recorded ) )
+        for name, every in recorded.items():
+            np.testing.assert_allclose( data[ 'durations' ][ name ], np.array( every[ -20: ] ) * 1000.0,
+                                        err_msg=name )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Tests the corner data drawn from vertex buffers (vbo.meshCorners and
+# watertight.fanTriangles) -- for the polytopes shipped with the repository and
+# the offset hulls of a drag -- against triangulating each polygon on its own.
+# No OpenGL context is needed.
+#
+# Run with: python -m unittest test_vbo
+
+import os
+import unittest
+import numpy as np
+from offset import OffsetSurface
+from offset_bench import SHIPPED
+from vbo import CORNER_FLOATS, DynamicTriangleBuffer, meshCorners
+from watertight import WatertightMesh, fanTriangles
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+def polygonCorners( vertices, faces, normals ):
+    '''Triangulates each polygon as a fan around its first vertex, one polygon
+    at a time.
+
+    @param  vertices    A Vx3 array of vertex positions.
+    @param  faces       A list of lists of vertex indices.
+    @param  normals     A 3xF array of face normals.
+    @returns A 2-tuple of lists ( corners, edge_flags ): the position and
+    normal (6 floats) of every triangle corner and whether the edge from the
+    corner to the next one in its triangle is an edge of the polygon.
+    '''
+    corners = []
+    edge_flags = []
+    for i, face in enumerate( faces ):
+        for k in xrange( 1, len( face ) - 1 ):
+            triangle = ( face[0], face[k], face[k + 1] )
+            corners.extend( list( vertices[ v ] ) + list( normals[:, i] ) for v in triangle )
+            edge_flags.extend( ( k == 1, True, k == len( face ) - 2 ) )
+    return corners, edge_flags
+
+class VboTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        cls.meshes = []
+        for name in SHIPPED:
+            mesh = WatertightMesh()
+            mesh.from_obj_file( os.path.join( ROOT, name ), use_cache=False )
+            cls.meshes.append( ( name, mesh ) )
+
+    def test_mesh_corners( self ):
+        '''The corners of the whole mesh match triangulating each polygon.'''
+        for name, mesh in self.meshes:
+            positions = mesh.vertex_pos[:3, :].T
+            faces = [ face.vertices.tolist() for face in mesh.faces ]
+            corner_idx, tri_faces, edge_flags = fanTriangles( mesh.face_offsets )
+            triangles = ( mesh.face_vertices[ corner_idx ], tri_faces, edge_flags )
+            corners, flags = meshCorners( positions, mesh.face_normals, triangles )
+            expected_corners, expected_flags = polygonCorners( positions, faces, mesh.face_normals )
+            self.assertEqual( corners.shape, ( len( expected_corners ), CORNER_FLOATS ), name )
+            self.assertEqual( corners.dtype, np.float32, name )
+            np.testing.assert_array_equal( corners, np.array( expected_corners, dtype=np.float32 ), name )
+            np.testing.assert_array_equal( flags, np.array( expected_flags, dtype=np.uint8 ), name )
+
+    def test_polygon_edges( self ):
+        '''The flagged edges of each face's triangles are exactly the face's
+        edges.'''
+        for name, mesh in self.meshes:
+            corner_idx, tri_faces, edge_flags = fanTriangles( mesh.face_offsets )
+            tri_vertices = mesh.face_vertices[ corner_idx ]
+            for i, face in enumerate( mesh.faces ):
+                vertices = face.vertices.tolist()
+                mine = tri_faces == i
+                flagged = set( ( t[ k ], t[ ( k + 1 ) % 3 ] )
+                               for t, flags in zip( tri_vertices[ mine ], edge_flags[ mine ] )
+                               for k in xrange( 3 ) if flags[ k ] )
+                self.assertEqual( flagged, set( zip( vertices, vertices[1:] + vertices[:1] ) ),
+                                  '%s, face %d' % ( name, i ) )
+
+    def test_hull_corners( self ):
+        '''The corners written to the hull's buffer during a drag match
+        triangulating each of the hull's polygons.'''
+        rand = np.random.RandomState( 10 )
+        for name, mesh in self.meshes:
+            surface = OffsetSurface( mesh )
+            buffer = DynamicTriangleBuffer()
+            face_count = mesh.face_count()
+            for step in xrange( 20 ):
+                surface.set_offset( rand.uniform( 0.0, 0.5 ), rand.randint( -1, face_count ) )
+                hull = surface.hull
+                buffer.set_triangles( *meshCorners( hull.vertices, hull.normals, hull.triangles() ) )
+                expected_corners, expected_flags = polygonCorners( hull.vertices, hull.faces, hull.normals )
+                message = '%s, step %d' % ( name, step )
+                self.assertEqual( buffer.count, len( expected_corners ), message )
+                np.testing.assert_array_equal( buffer.corners, np.array( expected_corners, dtype=np.float32 ),
+                                               message )
+                np.testing.assert_array_equal( buffer.edge_flags, np.array( expected_flags, dtype=np.uint8 ),
+                                               message )
+
+if __name__ == '__main__':
+    unittest.main()
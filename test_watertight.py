@@ -0,0 +1,151 @@
+# Tests the topology of WatertightMesh -- its half-edges and the rings of faces
+# around each vertex and each face -- against searching every face, for the polytopes
+# shipped with the repository, a random polytope (see
+# offset_bench.randomPolytope) and random triangle meshes.
+#
+# Run with: python -m unittest test_watertight
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from scipy.spatial import ConvexHull
+from offset_bench import SHIPPED, randomPolytope
+from watertight import WatertightMesh, halfEdges
+
+# The directory of the shipped polytopes.
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+def writeObj( file_name, vertices, faces ):
+    '''Writes a mesh without normals to an obj file.
+
+    @param  file_name   The path to the obj file.
+    @param  vertices    An (N, 3) array of vertex positions.
+    @param  faces       A list of lists of (zero-based) vertex indices.
+    '''
+    with open( file_name, 'w' ) as f:
+        for v in vertices:
+            f.write( 'v %.17g %.17g %.17g\n' % tuple( v ) )
+        for face in faces:
+            f.write( 'f %s\n' % ' '.join( str( v + 1 ) for v in face ) )
+
+def randomTriangles( count, rand ):
+    '''Creates the convex hull of random points on a sphere: a triangle mesh
+    whose vertices have widely varying degrees.
+
+    @param  count       The number of points.
+    @param  rand        The numpy.random.RandomState.
+    @returns A 2-tuple ( vertices, faces ) (see writeObj()).
+    '''
+    points = rand.normal( size=( count, 3 ) )
+    points /= np.sqrt( np.sum( points ** 2, axis=1 ) )[:, np.newaxis]
+    hull = ConvexHull( points )
+    faces = []
+    for triangle in hull.simplices:
+        a, b, c = points[ triangle ]
+        if ( np.dot( np.cross( b - a, c - a ), a ) < 0 ):
+            triangle = triangle[::-1]
+        faces.append( triangle.tolist() )
+    return points, faces
+
+def faceEdgeSet( face ):
+    '''The directed edges of a face (pairs of consecutive vertices).'''
+    return set( zip( face, face[1:] + face[:1] ) )
+
+class WatertightTest( unittest.TestCase ):
+    @classmethod
+    def setUpClass( cls ):
+        rand = np.random.RandomState( 8 )
+        cls.temp_dir = tempfile.mkdtemp( prefix='test_watertight' )
+        cls.obj_files = [ ( name, os.path.join( ROOT, name ) ) for name in SHIPPED ]
+        obj_file = os.path.join( cls.temp_dir, 'random.obj' )
+        with open( obj_file, 'w' ) as f:
+            randomPolytope( 50 ).writeOBJ( f )
+        cls.obj_files.append( ( 'random 50', obj_file ) )
+        for count in ( 4, 30, 500 ):
+            obj_file = os.path.join( cls.temp_dir, 'triangles%d.obj' % count )
+            writeObj( obj_file, *randomTriangles( count, rand ) )
+            cls.obj_files.append( ( 'triangles %d' % count, obj_file ) )
+        cls.meshes = []
+        for name, obj_file in cls.obj_files:
+            mesh = WatertightMesh()
+            mesh.from_obj_file( obj_file, use_cache=False )
+            faces = [ face.vertices.tolist() for face in mesh.faces ]
+            cls.meshes.append( ( name, mesh, faces ) )
+
+    @classmethod
+    def tearDownClass( cls ):
+        shutil.rmtree( cls.temp_dir )
+
+    def test_half_edges( self ):
+        '''Each half-edge's face, neighbors in the face and twin match those
+        found from a dictionary of every directed edge.'''
+        for name, mesh, faces in self.meshes:
+            # Maps each directed edge to its half-edge.
+            by_edge = {}
+            H = mesh.face_vertices.size
+            face_of = np.empty( H, dtype=np.int )
+            next_of = np.empty( H, dtype=np.int )
+            prev_of = np.empty( H, dtype=np.int )
+            for i, face in enumerate( faces ):
+                start, size = mesh.face_offsets[ i ], len( face )
+                for k in xrange( size ):
+                    h = start + k
+                    by_edge[ ( face[ k ], face[ ( k + 1 ) % size ] ) ] = h
+                    face_of[ h ] = i
+                    next_of[ h ] = start + ( k + 1 ) % size
+                    prev_of[ h ] = start + ( k - 1 ) % size
+            twin_of = np.empty( H, dtype=np.int )
+            for ( v, w ), h in by_edge.iteritems():
+                twin_of[ h ] = by_edge[ ( w, v ) ]
+            half_edge_face, next_edge, prev_edge, twins = halfEdges( mesh.face_offsets, mesh.face_vertices,
+                                                                     mesh.vertex_count() )
+            for actual, expected in ( ( half_edge_face, face_of ), ( next_edge, next_of ),
+                                      ( prev_edge, prev_of ), ( twins, twin_of ),
+                                      ( mesh.half_edge_face, face_of ), ( mesh.twins, twin_of ) ):
+                np.testing.assert_array_equal( actual, expected, name )
+
+    def test_open_mesh( self ):
+        '''A mesh with a missing face or a face in the wrong direction is
+        rejected.'''
+        vertices, faces = randomTriangles( 30, np.random.RandomState( 9 ) )
+        for broken in ( faces[1:], [ faces[0][::-1] ] + faces[1:] ):
+            obj_file = os.path.join( self.temp_dir, 'broken.obj' )
+            writeObj( obj_file, vertices, broken )
+            with self.assertRaises( ValueError ):
+                WatertightMesh().from_obj_file( obj_file, use_cache=False )
+
+    def test_vertex_rings( self ):
+        '''Each vertex's faces are those containing it, starting with the
+        lowest-indexed one, and each is followed by the face across the edge
+        entering the vertex (counter-clockwise, looking from the outside).'''
+        for name, mesh, faces in self.meshes:
+            edges = [ faceEdgeSet( face ) for face in faces ]
+            for v, vertex in enumerate( mesh.vertices ):
+                ring = vertex.faces.tolist()
+                expected = [ i for i, face in enumerate( faces ) if v in face ]
+                message = '%s, vertex %d: %s' % ( name, v, ring )
+                self.assertEqual( sorted( ring ), expected, message )
+                self.assertEqual( ring[0], expected[0], message )
+                for f, g in zip( ring, ring[1:] + ring[:1] ):
+                    entering = [ u for u, w in edges[ f ] if w == v ]
+                    self.assertTrue( ( v, entering[0] ) in edges[ g ], message )
+
+    def test_face_rings( self ):
+        '''Each face's adjacent faces are those sharing a vertex with it,
+        starting at its first vertex, and each shares an edge with the next.'''
+        for name, mesh, faces in self.meshes:
+            edges = [ faceEdgeSet( face ) for face in faces ]
+            for i, face in enumerate( mesh.faces ):
+                ring = face.faces.tolist()
+                expected = [ j for j, other in enumerate( faces )
+                             if j != i and set( other ) & set( faces[ i ] ) ]
+                message = '%s, face %d: %s' % ( name, i, ring )
+                self.assertEqual( sorted( ring ), expected, message )
+                self.assertTrue( faces[ i ][0] in faces[ ring[0] ], message )
+                for f, g in zip( ring, ring[1:] + ring[:1] ):
+                    self.assertTrue( any( ( w, u ) in edges[ g ] for u, w in edges[ f ] ), message )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+# Lightweight instrumentation of where time goes.
+#
+# Work is divided into named stages, each timed with a context manager:
+#
+#   with timing.stage( 'qhull' ):
+#       ...
+#
+# Only the most recent durations of each stage are kept (in a ring buffer), so
+# the cost of timing doesn't grow with the length of a session. The durations
+# can be summarized (e.g., by the overlay in GLWidget) or dumped as CSV or JSON.
+# Stages can be timed from any thread (e.g., see offset_worker.py).
+
+import csv
+import json
+import threading
+import timeit
+from collections import OrderedDict, deque
+
+# The clock used for timing (the most precise wall clock available).
+clock = timeit.default_timer
+
+# The default number of durations kept for each stage.
+HISTORY = 256
+
+class _StageTimer( object ):
+    '''Times a single execution of a stage (see StageTimings.stage()).'''
+    __slots__ = ( 'timings', 'name', 'start' )
+
+    def __init__( self, timings, name ):
+        self.timings = timings
+        self.name = name
+
+    def __enter__( self ):
+        self.start = clock()
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.timings.record( self.name, clock() - self.start )
+        return False
+
+class _NullTimer( object ):
+    '''Stands in for _StageTimer when timing is disabled.'''
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class StageTimings( object ):
+    '''The recent durations of a set of named stages.'''
+    def __init__( self, history=HISTORY ):
+        '''Constructor.
+
+        @param  history     The number of durations kept for each stage.
+        '''
+        self.history = history
+        # If False, stages are not timed.
+        self.enabled = True
+        # Maps stage name -> deque of durations (in seconds), in the order the
+        #   stages were first timed.
+        self._durations = OrderedDict()
+        # Maps stage name -> the total number of times it has been timed.
+        self._counts = {}
+        # Guards the durations and counts.
+        self._lock = threading.Lock()
+
+    def stage( self, name ):
+        '''Creates a context manager which times the block it manages as an
+        execution of the named stage.
+
+        @param  name        The name of the stage.
+        @returns A context manager.
+        '''
+        if ( not self.enabled ):
+            return _NULL_TIMER
+        return _StageTimer( self, name )
+
+    def record( self, name, seconds ):
+        '''Records a duration of the named stage.
+
+        @param  name        The name of the stage.
+        @param  seconds     The duration (in seconds).
+        '''
+        with self._lock:
+            durations = self._durations.get( name )
+            if ( durations is None ):
+                durations = self._durations[ name ] = deque( maxlen=self.history )
+                self._counts[ name ] = 0
+            durations.append( seconds )
+            self._counts[ name ] += 1
+
+    def _snapshot( self ):
+        '''Copies the durations: a list of 3-tuples ( name, count, durations ),
+        in the order first timed.'''
+        with self._lock:
+            return [ ( name, self._counts[ name ], list( durations ) )
+                     for name, durations in self._durations.iteritems() ]
+
+    def stages( self ):
+        '''Reports the names of the timed stages (in the order first timed).'''
+        with self._lock:
+            return self._durations.keys()
+
+    def durations( self, name ):
+        '''Reports the recent durations (in seconds, oldest first) of the named
+        stage; empty if it has never been timed.'''
+        with self._lock:
+            return list( self._durations.get( name, () ) )
+
+    def clear( self ):
+        '''Forgets all durations.'''
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+
+    def summary( self ):
+        '''Summarizes the recent durations of each stage.
+
+        @returns A list of dicts (one per stage, in the order first timed) with
+        the keys: stage, count (the total number of executions), samples (the
+        number of recent durations), and last, mean and max (of the recent
+        durations, in milliseconds).
+        '''
+        rows = []
+        for name, count, durations in self._snapshot():
+            rows.append( OrderedDict( ( ( 'stage', name ),
+                                        ( 'count', count ),
+                                        ( 'samples', len( durations ) ),
+                                        ( 'last', durations[-1] * 1000.0 ),
+                                        ( 'mean', sum( durations ) * 1000.0 / len( durations ) ),
+                                        ( 'max', max( durations ) * 1000.0 ) ) ) )
+        return rows
+
+    def dump_csv( self, outfile ):
+        '''Writes the recent durations to the file object in CSV format: one row
+        per duration with the columns stage, sample (oldest first) and ms.'''
+        writer = csv.writer( outfile )
+        writer.writerow( ( 'stage', 'sample', 'ms' ) )
+        for name, count, durations in self._snapshot():
+            for i, seconds in enumerate( durations ):
+                writer.writerow( ( name, i, '%.4f' % ( seconds * 1000.0 ) ) )
+
+    def dump_json( self, outfile ):
+        '''Writes the summary and the recent durations (in milliseconds) to the
+        file object in JSON format.'''
+        data = { 'summary' : self.summary(),
+                 'durations' : OrderedDict( ( name, [ seconds * 1000.0 for seconds in durations ] )
+                                            for name, count, durations in self._snapshot() ) }
+        json.dump( data, outfile, indent=1 )
+
+    def dump( self, fileName ):
+        '''Writes the durations to a file; the format (CSV or JSON) is chosen
+        by the file's extension (.json for JSON, CSV otherwise).'''
+        if ( fileName.lower().endswith( '.json' ) ):
+            with open( fileName, 'w' ) as outfile:
+                self.dump_json( outfile )
+        else:
+            with open( fileName, 'wb' ) as outfile:
+                self.dump_csv( outfile )
+
+# The timings shared by the whole application.
+TIMINGS = StageTimings()
+
+def stage( name ):
+    '''Times a block as an execution of the named stage in TIMINGS (see
+    StageTimings.stage()).'''
+    return TIMINGS.stage( name )
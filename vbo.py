@@ -0,0 +1,222 @@
+# Drawing flat-shaded, polygonal meshes from vertex buffer objects.
+#
+# Polygons are triangulated once (see watertight.fanTriangles) and every
+# triangle corner gets its own position and (face) normal, interleaved in a
+# single buffer. Drawing the whole mesh is then a fixed, small number of
+# OpenGL calls, independent of the size of the mesh.
+#
+# Per-vertex edge flags mark the triangulation's diagonals so that drawing
+# with glPolygonMode( ..., GL_LINE ) still only outlines the original polygons.
+
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+# The layout of a corner in the interleaved buffer: position then normal.
+CORNER_FLOATS = 6
+CORNER_STRIDE = CORNER_FLOATS * 4
+POSITION_OFFSET = ctypes.c_void_p( 0 )
+NORMAL_OFFSET = ctypes.c_void_p( 3 * 4 )
+
+# Buffers whose owners have been garbage collected. OpenGL objects can only be
+# deleted while the context is current, so they are deleted the next time a
+# buffer is created or drawn.
+_ORPHANED_BUFFERS = []
+
+def _deleteOrphans():
+    '''Deletes the buffers of garbage-collected TriangleBuffers.'''
+    if ( _ORPHANED_BUFFERS ):
+        glDeleteBuffers( len( _ORPHANED_BUFFERS ), _ORPHANED_BUFFERS )
+        del _ORPHANED_BUFFERS[:]
+
+def interleave( positions, normals ):
+    '''Interleaves corner positions and normals into a single array.
+
+    @param  positions   An Nx3 array of positions.
+    @param  normals     An Nx3 array of normals.
+    @returns An Nx6 float32 array.
+    '''
+    data = np.empty( ( positions.shape[0], CORNER_FLOATS ), dtype=np.float32 )
+    data[:, :3] = positions
+    data[:, 3:] = normals
+    return data
+
+def meshCorners( vertices, face_normals, triangles, vertex_normals=None ):
+    '''Computes the corner data of a triangulated mesh.
+
+    @param  vertices        A Vx3 array of vertex positions.
+    @param  face_normals    A 3xF array of face normals.
+    @param  triangles       A 3-tuple ( vertices, faces, edge_flags ): the Tx3
+                            vertex indices of the triangles, the face of each
+                            triangle and the Tx3 edge flags.
+    @param  vertex_normals  An optional Vx3 array of vertex normals. If given,
+                            each corner uses its vertex's normal (a smooth
+                            surface) instead of its face's.
+    @returns A 2-tuple of arrays ( corners, edge_flags ): the (3T)x6 interleaved
+    float32 positions and normals and the 3T uint8 edge flags.
+    '''
+    tri_vertices, tri_faces, edge_flags = triangles
+    positions = vertices[ tri_vertices.ravel() ]
+    if ( vertex_normals is not None ):
+        normals = vertex_normals[ tri_vertices.ravel() ]
+    else:
+        normals = np.repeat( face_normals[ :, tri_faces ].T, 3, axis=0 )
+    return interleave( positions, normals ), edge_flags.ravel().astype( np.uint8 )
+
+class TriangleBuffer( object ):
+    '''A set of triangles stored in OpenGL vertex buffer objects. The buffers
+    are created (and uploaded) the first time they are drawn, so a
+    TriangleBuffer can be created without a current OpenGL context.'''
+    def __init__( self, corners, edge_flags ):
+        '''Constructor.
+
+        @param  corners     A (3T)x6 float32 array of interleaved corner positions
+                            and normals (see meshCorners).
+        @param  edge_flags  A length 3T uint8 array of corner edge flags.
+        '''
+        self.corners = corners
+        self.edge_flags = edge_flags
+        self.count = corners.shape[0]
+        # The OpenGL names of the corner and edge flag buffers.
+        self.buffers = None
+        # While corners (and edge_flags) are not None, they have not been
+        #   uploaded yet.
+
+    def __del__( self ):
+        if ( self.buffers is not None ):
+            _ORPHANED_BUFFERS.extend( self.buffers )
+
+    def _upload( self ):
+        '''Creates the buffers and uploads the data.'''
+        _deleteOrphans()
+        self.buffers = [ int( name ) for name in np.atleast_1d( glGenBuffers( 2 ) ) ]
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+        glBufferData( GL_ARRAY_BUFFER, self.corners.nbytes, self.corners, GL_STATIC_DRAW )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[1] )
+        glBufferData( GL_ARRAY_BUFFER, self.edge_flags.nbytes, self.edge_flags, GL_STATIC_DRAW )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        # The data lives on the GPU now.
+        self.corners = self.edge_flags = None
+
+    def drawGL( self ):
+        '''Draws the triangles.'''
+        if ( self.count == 0 ):
+            return
+        if ( self.corners is not None ):
+            self._upload()
+        else:
+            _deleteOrphans()
+        glPushClientAttrib( GL_CLIENT_VERTEX_ARRAY_BIT )
+        glEnableClientState( GL_VERTEX_ARRAY )
+        glEnableClientState( GL_NORMAL_ARRAY )
+        glEnableClientState( GL_EDGE_FLAG_ARRAY )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+        glVertexPointer( 3, GL_FLOAT, CORNER_STRIDE, POSITION_OFFSET )
+        glNormalPointer( GL_FLOAT, CORNER_STRIDE, NORMAL_OFFSET )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[1] )
+        glEdgeFlagPointer( 0, POSITION_OFFSET )
+        glDrawArrays( GL_TRIANGLES, 0, self.count )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        glPopClientAttrib()
+
+class DynamicTriangleBuffer( TriangleBuffer ):
+    '''A set of triangles which is replaced often (e.g., while dragging). The
+    buffers are allocated with spare capacity and new triangles are written into
+    them with glBufferSubData. They are only reallocated when the triangles
+    outgrow them, at which point the capacity is (at least) doubled.'''
+    # The smallest capacity (in corners) of the buffers.
+    MIN_CAPACITY = 1024
+
+    def __init__( self ):
+        '''Constructor.'''
+        TriangleBuffer.__init__( self, np.zeros( ( 0, CORNER_FLOATS ), dtype=np.float32 ),
+                                 np.zeros( 0, dtype=np.uint8 ) )
+        # The number of corners the buffers can hold.
+        self.capacity = 0
+
+    def set_triangles( self, corners, edge_flags ):
+        '''Replaces the triangles. The data is uploaded when next drawn.
+
+        @param  corners     A (3T)x6 float32 array of interleaved corner positions
+                            and normals (see meshCorners).
+        @param  edge_flags  A length 3T uint8 array of corner edge flags.
+        '''
+        self.corners = corners
+        self.edge_flags = edge_flags
+        self.count = corners.shape[0]
+
+    def _upload( self ):
+        '''Writes the triangles into the buffers, growing them if necessary.'''
+        _deleteOrphans()
+        if ( self.buffers is None ):
+            self.buffers = [ int( name ) for name in np.atleast_1d( glGenBuffers( 2 ) ) ]
+        if ( self.count > self.capacity ):
+            self.capacity = max( self.count, 2 * self.capacity, self.MIN_CAPACITY )
+            glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+            glBufferData( GL_ARRAY_BUFFER, self.capacity * CORNER_STRIDE, None, GL_DYNAMIC_DRAW )
+            glBindBuffer( GL_ARRAY_BUFFER, self.buffers[1] )
+            glBufferData( GL_ARRAY_BUFFER, self.capacity, None, GL_DYNAMIC_DRAW )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+        glBufferSubData( GL_ARRAY_BUFFER, 0, self.corners.nbytes, self.corners )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[1] )
+        glBufferSubData( GL_ARRAY_BUFFER, 0, self.edge_flags.nbytes, self.edge_flags )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        self.corners = self.edge_flags = None
+
+class PickBuffer( object ):
+    '''A set of triangles drawn in per-corner id colors for color-id picking
+    (see Select.startPick()). The colors are fixed, but the positions can be
+    replaced (e.g., as the faces of an offset surface move).'''
+    # The size (in bytes) of a corner's position and color.
+    POSITION_STRIDE = 3 * 4
+    COLOR_STRIDE = 4
+
+    def __init__( self, colors ):
+        '''Constructor.
+
+        @param  colors      A (3T)x4 uint8 array of corner colors (see
+                            Select.idColors()).
+        '''
+        self.colors = colors
+        self.positions = None
+        self.count = colors.shape[0]
+        # The OpenGL names of the position and color buffers.
+        self.buffers = None
+
+    def __del__( self ):
+        if ( self.buffers is not None ):
+            _ORPHANED_BUFFERS.extend( self.buffers )
+
+    def set_positions( self, positions ):
+        '''Replaces the corner positions. The data is uploaded when next drawn.
+
+        @param  positions   A (3T)x3 float32 array of corner positions.
+        '''
+        self.positions = positions
+
+    def drawGL( self ):
+        '''Draws the triangles.'''
+        _deleteOrphans()
+        if ( self.count == 0 ):
+            return
+        if ( self.buffers is None ):
+            self.buffers = [ int( name ) for name in np.atleast_1d( glGenBuffers( 2 ) ) ]
+            glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+            glBufferData( GL_ARRAY_BUFFER, self.count * self.POSITION_STRIDE, None, GL_DYNAMIC_DRAW )
+            glBindBuffer( GL_ARRAY_BUFFER, self.buffers[1] )
+            glBufferData( GL_ARRAY_BUFFER, self.colors.nbytes, self.colors, GL_STATIC_DRAW )
+            self.colors = None
+        if ( self.positions is not None ):
+            glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+            glBufferSubData( GL_ARRAY_BUFFER, 0, self.positions.nbytes, self.positions )
+            self.positions = None
+        glPushClientAttrib( GL_CLIENT_VERTEX_ARRAY_BIT )
+        glEnableClientState( GL_VERTEX_ARRAY )
+        glEnableClientState( GL_COLOR_ARRAY )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[0] )
+        glVertexPointer( 3, GL_FLOAT, self.POSITION_STRIDE, POSITION_OFFSET )
+        glBindBuffer( GL_ARRAY_BUFFER, self.buffers[1] )
+        glColorPointer( 4, GL_UNSIGNED_BYTE, self.COLOR_STRIDE, POSITION_OFFSET )
+        glDrawArrays( GL_TRIANGLES, 0, self.count )
+        glBindBuffer( GL_ARRAY_BUFFER, 0 )
+        glPopClientAttrib()
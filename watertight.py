@@ -0,0 +1,410 @@
+# The topology of a watertight polygonal mesh.
+#
+# This module has no OpenGL dependencies; the drawable mesh is defined in mesh.py.
+
+import numpy as np
+import meshcache
+from matrix import Vector3, IDENTITY4x4
+from ObjReader import ObjFile
+# TODO: Do I need MeshEdge?
+
+def fanTriangles( face_offsets ):
+    '''Triangulates polygonal faces as fans around each face's first vertex:
+    a face with vertices (v0, v1, ..., vn) produces the triangles (v0, v1, v2),
+    (v0, v2, v3), ..., (v0, vn-1, vn).
+
+    @param  face_offsets    The F + 1 offsets of the faces' vertices in a
+                            flattened array of face vertices (see
+                            WatertightMesh.face_offsets). Faces with fewer
+                            than three vertices produce no triangles.
+    @returns A 3-tuple of arrays ( corners, faces, edge_flags ):
+        corners:    A Tx3 int array of indices into the flattened face
+                    vertices.
+        faces:      The length-T int array of the face of each triangle.
+        edge_flags: A Tx3 bool array; edge_flags[ t, i ] is True if the edge
+                    from corner i to corner i + 1 of triangle t is an edge of
+                    the face (rather than a diagonal introduced by the
+                    triangulation).
+    '''
+    face_offsets = np.asarray( face_offsets )
+    tri_counts = np.maximum( np.diff( face_offsets ) - 2, 0 )
+    faces = np.repeat( np.arange( tri_counts.size ), tri_counts )
+    tri_starts = np.cumsum( tri_counts ) - tri_counts
+    # The index of each triangle in its fan.
+    fan_index = np.arange( faces.size ) - tri_starts[ faces ]
+    corners = np.empty( ( faces.size, 3 ), dtype=np.int64 )
+    corners[:, 0] = face_offsets[:-1][ faces ]
+    corners[:, 1] = corners[:, 0] + fan_index + 1
+    corners[:, 2] = corners[:, 1] + 1
+    edge_flags = np.ones( ( faces.size, 3 ), dtype=np.bool )
+    edge_flags[:, 0] = fan_index == 0
+    edge_flags[:, 2] = fan_index == tri_counts[ faces ] - 1
+    return corners, faces, edge_flags
+
+def halfEdges( face_offsets, face_vertices, vertex_count ):
+    '''Computes the half-edges of a watertight polygonal mesh. Half-edge h runs
+    from face_vertices[ h ] to the next vertex in the same face.
+
+    @param  face_offsets    The F + 1 offsets of the faces' vertices in
+                            face_vertices.
+    @param  face_vertices   The vertex indices of all faces, in
+                            counter-clockwise order per face.
+    @param  vertex_count    The number of vertices.
+    @returns A 4-tuple of int32 arrays ( half_edge_face, next_edge, prev_edge,
+    twins ): the face of each half-edge, the next and previous half-edges in
+    the same face and the opposite half-edge (the same edge, traversed by the
+    adjacent face).
+    @raises ValueError if the mesh is not watertight.
+    '''
+    V = vertex_count
+    F = face_offsets.size - 1
+    origin = face_vertices
+    H = origin.size
+    half_edges = np.arange( H, dtype=np.int32 )
+    face_sizes = np.diff( face_offsets )
+    half_edge_face = np.repeat( np.arange( F, dtype=np.int32 ), face_sizes )
+    is_first = half_edges == face_offsets[ half_edge_face ]
+    is_last = half_edges == face_offsets[ half_edge_face + 1 ] - 1
+    next_edge = half_edges + 1
+    next_edge[ is_last ] = face_offsets[ half_edge_face[ is_last ] ]
+    prev_edge = half_edges - 1
+    prev_edge[ is_first ] = face_offsets[ half_edge_face[ is_first ] + 1 ] - 1
+
+    # Match each half-edge (v0, v1) with its opposite (v1, v0). In a
+    #   watertight mesh, each directed edge appears exactly once.
+    dest = origin[ next_edge ]
+    keys = origin.astype( np.int64 ) * V + dest
+    by_key = np.argsort( keys, kind='mergesort' ).astype( np.int32 )
+    sorted_keys = keys[ by_key ]
+    repeated = np.flatnonzero( sorted_keys[1:] == sorted_keys[:-1] )
+    if ( repeated.size ):
+        h = by_key[ repeated[0] ]
+        raise ValueError, "The edge (%d, %d) is used by more than one face in the same direction" % ( origin[ h ], dest[ h ] )
+    twin_keys = dest.astype( np.int64 ) * V + origin
+    found = np.minimum( np.searchsorted( sorted_keys, twin_keys ), max( H - 1, 0 ) )
+    missing = np.flatnonzero( sorted_keys[ found ] != twin_keys )
+    if ( missing.size ):
+        h = missing[0]
+        raise ValueError, "The edge (%d, %d) of face %d has no opposite face; the mesh is not watertight" % ( origin[ h ], dest[ h ], half_edge_face[ h ] )
+    return half_edge_face, next_edge, prev_edge, by_key[ found ]
+
+class MeshVertex( object ):
+    '''Definition of adjacency data for a mesh vertex. The interpretation
+    of a MeshVertex depends on a WatertightMesh. The MeshVertex maintains *references*
+    in the WatertightMesh. All vertex values (and therefore edge and face properties)
+    are stored in the mesh.
+
+    The adjacent features are stored in a "counter-clockwise" order. That is, when
+    looking from the outside toward the vertex, the edges/faces are enumerated
+    in counter-clockwise order such that feature[i] is adjacent to feature[i + 1].
+
+    A MeshVertex is a light-weight view of the mesh's topology arrays; they are
+    created on demand (see WatertightMesh.vertices).
+    '''
+    __slots__ = ( 'mesh', 'index' )
+
+    def __init__( self, mesh, index ):
+        '''Constructor
+
+        @param  mesh        The mesh containing the vertex.
+        @param  index       The index of the vertex in the mesh.
+        '''
+        self.mesh = mesh
+        self.index = index
+
+    def __str__( self ):
+        return "V - %s" % self.faces.tolist()
+
+    # indices of the faces incident to this vertex (an int32 array).
+    faces = property( lambda self: self.mesh.vertex_faces[ self.mesh.vertex_offsets[ self.index ] :
+                                                            self.mesh.vertex_offsets[ self.index + 1 ] ] )
+
+class MeshFace( object ):
+    '''Definition of adjacency data for a mesh vertex. The interpretation
+    of a MeshFace depends on a WatertightMesh. The MeshFace maintains *references*
+    in the WatertightMesh.
+
+    The vertex order is stored in a counter-clockwise order. (Looking from
+    the outside in.) A face is considerd adjacent to this face if they share
+    a vertex. The adjacent face order "aligns" with the vertices. The
+    0th face is adjacent to this face via the 0th vertex. However, the 1th
+    face may share the 0th or 1th vertex because the vertex might have
+    an arbitrarily high degree. The faces are ordered such that one can walk
+    from face to face in counter-clockwise order by traversing shared edges.
+
+    A MeshFace is a light-weight view of the mesh's topology arrays; they are
+    created on demand (see WatertightMesh.faces).
+    '''
+    __slots__ = ( 'mesh', 'index' )
+
+    def __init__( self, mesh, index ):
+        '''Constructor
+
+        @param  mesh        The mesh containing the face.
+        @param  index       The index of the face in the mesh.
+        '''
+        self.mesh = mesh
+        self.index = index
+
+    def __str__( self ):
+        return 'F V(%s) - F_adj(%s)' % ( self.vertices.tolist(), self.faces.tolist() )
+
+    # Indices of the vertices that form this face (an int32 array).
+    vertices = property( lambda self: self.mesh.face_vertices[ self.mesh.face_offsets[ self.index ] :
+                                                                self.mesh.face_offsets[ self.index + 1 ] ] )
+    # Indices of the faces adjacent to this face (an int32 array).
+    faces = property( lambda self: self.mesh.face_faces[ self.mesh.face_face_offsets[ self.index ] :
+                                                          self.mesh.face_face_offsets[ self.index + 1 ] ] )
+
+    def has_edge( self, v0, v1 ):
+        '''Confirms that one of the edges of this face is formed by the
+        *counter clockwise* sequence of vertices v0, v1. If they are in
+        reverse order, an exception is thrown. Otherwise true is returned.
+        '''
+        vertices = self.vertices.tolist()
+        try:
+            idx = vertices.index( v0 )
+            next_idx = (idx + 1) % len( vertices )
+            if ( vertices[ next_idx ] == v1 ):
+                return True
+            else:
+                prev_idx = idx - 1
+                if ( vertices[ prev_idx ] == v1 ):
+                    raise ValueError("The edge (%d, %d) was found reversed" % (v0, v1))
+                return False
+        except ValueError:
+            # v0 is not in the vertex list, the edge cannot exist.
+            return False
+
+class MeshElements( object ):
+    '''A read-only sequence of MeshVertex or MeshFace views of a mesh.'''
+    __slots__ = ( 'mesh', 'element_class', 'count' )
+
+    def __init__( self, mesh, element_class, count ):
+        self.mesh = mesh
+        self.element_class = element_class
+        self.count = count
+
+    def __len__( self ):
+        return self.count
+
+    def __getitem__( self, index ):
+        if ( index < 0 ):
+            index += self.count
+        if ( index < 0 or index >= self.count ):
+            raise IndexError( "Mesh element index out of range" )
+        return self.element_class( self.mesh, index )
+
+    def __iter__( self ):
+        for i in xrange( self.count ):
+            yield self.element_class( self.mesh, i )
+
+class WatertightMesh( object ):
+    '''A mesh with topology definition -- supporting an orderly
+    set of adjacency queries.
+
+    This requires a *watertight* mesh. That is, one that is well-defined with
+    an inside and outside and no cracks or seams. In other words, every edge
+    in the mesh has two and only two faces adjacent.
+
+    The topology is stored in compact (int32) arrays. The faces' vertices are
+    stored in a single array: face i's vertices are
+    face_vertices[ face_offsets[ i ] : face_offsets[ i + 1 ] ]. Each entry of
+    face_vertices is also a *half-edge*: half-edge h runs from face_vertices[ h ]
+    to the next vertex in the same face and its opposite half-edge is twins[ h ].
+    The faces incident to each vertex and the faces adjacent to each face are
+    stored the same way (see vertex_faces and face_faces). The vertices and faces
+    properties provide MeshVertex/MeshFace views of these arrays.
+    '''
+    # The arrays which completely define the mesh (see from_obj_file).
+    ARRAYS = ( 'vertex_pos', 'face_normals', 'face_offsets', 'face_vertices',
+               'half_edge_face', 'twins', 'vertex_offsets', 'vertex_faces',
+               'face_face_offsets', 'face_faces' )
+
+    def __init__( self ):
+        # A 4xV numpy array of vertex positions. They are homogeneous coordinates
+        #   where self.vertex_pos[3, i] is always 1. This facilitates transform
+        #   *all* the points by X * v.
+        self.vertex_pos = None
+        # A 3xF numpy array of face normals. This facilitates transforming normals
+        #   by taking xform.rotation() * v.
+        self.face_normals = None
+        # The F + 1 offsets of each face's vertices (and half-edges) in face_vertices.
+        self.face_offsets = np.zeros( 1, dtype=np.int32 )
+        # The vertex indices of all faces, in counter-clockwise order per face.
+        #   Entry h is also the origin of half-edge h.
+        self.face_vertices = np.zeros( 0, dtype=np.int32 )
+        # The face of each half-edge.
+        self.half_edge_face = np.zeros( 0, dtype=np.int32 )
+        # The opposite of each half-edge (the same edge, traversed by the
+        #   adjacent face).
+        self.twins = np.zeros( 0, dtype=np.int32 )
+        # The V + 1 offsets of each vertex's faces in vertex_faces.
+        self.vertex_offsets = np.zeros( 1, dtype=np.int32 )
+        # The faces incident to each vertex, in counter-clockwise order.
+        self.vertex_faces = np.zeros( 0, dtype=np.int32 )
+        # The F + 1 offsets of each face's adjacent faces in face_faces.
+        self.face_face_offsets = np.zeros( 1, dtype=np.int32 )
+        # The faces adjacent to each face (see MeshFace).
+        self.face_faces = np.zeros( 0, dtype=np.int32 )
+        # The path of the mesh's cache entry (see from_obj_file); None if the
+        #   mesh wasn't read through the cache.
+        self.cache_entry = None
+
+    # A length V sequence of MeshVertex instances.
+    vertices = property( lambda self: MeshElements( self, MeshVertex, self.vertex_count() ) )
+    # A length F sequence of MeshFace instances.
+    faces = property( lambda self: MeshElements( self, MeshFace, self.face_count() ) )
+
+    def face_count( self ):
+        '''Reports the total number of faces'''
+        return self.face_offsets.size - 1
+
+    def vertex_count( self ):
+        '''Reports the total number of vertices'''
+        return self.vertex_offsets.size - 1
+
+    def getBB( self, xform=IDENTITY4x4 ):
+        '''Computes the axis-aligned bounding box of this node.
+
+        @param:         xform       The 4x4 matrix representing a particular instance
+                                    of this geometry.
+        @returns:       A 2-tuple of Vector3s.  The (min, max) points of the BB.
+        '''
+        xformed = np.dot( xform.data, self.vertex_pos )
+        minPt = Vector3(array = np.min( xformed[:3, :], axis=1) )
+        maxPt = Vector3(array = np.max( xformed[:3, :], axis=1) )
+        return minPt, maxPt
+
+    def is_convex( self, tolerance=1e-6 ):
+        '''Reports if the mesh is convex. Every edge is tested: the centroid of
+        the face on one side must not lie above the plane of the face on the
+        other side. For a closed, connected mesh which doesn't intersect itself,
+        convexity at every edge means the whole mesh is convex.
+
+        @param  tolerance   The distance (relative to the size of the mesh's
+                            bounding box) a centroid can be above a plane.
+        @returns True if the mesh is convex.
+        '''
+        if ( not self.twins.size ):
+            return True
+        positions = self.vertex_pos[:3, :].T
+        sizes = np.diff( self.face_offsets )
+        centroids = np.add.reduceat( positions[ self.face_vertices ], self.face_offsets[:-1] )
+        centroids /= sizes[:, None]
+        # Half-edge h lies in the plane of the face on the *other* side of its
+        #   twin; its origin is a point on that plane.
+        other_faces = self.half_edge_face[ self.twins ]
+        heights = np.sum( self.face_normals[:, other_faces ].T *
+                          ( centroids[ self.half_edge_face ] - positions[ self.face_vertices ] ), axis=1 )
+        size = np.max( positions.max( axis=0 ) - positions.min( axis=0 ) )
+        return bool( np.all( heights <= tolerance * size ) )
+
+    def from_obj( self, obj_file ):
+        '''Initialize the mesh from an obj file.'''
+        self._populate_from_obj( obj_file )
+        self._calculateAdjacency()
+
+    def from_obj_file( self, file_name, use_cache=True, cache_dir=None ):
+        '''Initialize the mesh from the path to an obj file. The mesh's arrays
+        are cached on disk (see meshcache.py); if the file has been read before,
+        they are memory-mapped (read-only) from the cache instead.
+
+        @param  file_name   The path to the obj file.
+        @param  use_cache   If False, the file is always parsed and nothing is
+                            written to the cache.
+        @param  cache_dir   The cache directory; see meshcache.cachePath().
+        @returns True if the mesh was loaded from the cache.
+        '''
+        self.cache_entry = None
+        if ( not use_cache ):
+            self.from_obj( ObjFile( file_name ) )
+            return False
+        entry = self.cache_entry = meshcache.cachePath( file_name, cache_dir )
+        arrays = meshcache.loadArrays( entry, self.ARRAYS )
+        if ( arrays is not None ):
+            for name, array in arrays.iteritems():
+                setattr( self, name, array )
+            return True
+        self.from_obj( ObjFile( file_name ) )
+        meshcache.saveArrays( entry, dict( ( name, getattr( self, name ) ) for name in self.ARRAYS ) )
+        return False
+
+    def _populate_from_obj( self, obj_file ):
+        '''This populates the bare data necessary from the obj_file'''
+        # initialize the vertex data.
+        positions = obj_file.vertexArray()
+        vert_count = positions.shape[0]
+        self.vertex_pos = np.empty( ( 4, vert_count), dtype=np.float )
+        self.vertex_pos[3, :] = 1.0
+        self.vertex_pos[:3, :] = positions.T
+        self.vertex_offsets = np.zeros( vert_count + 1, dtype=np.int32 )
+
+        # initialize face data
+        face_offsets, face_vertices = obj_file.faceArrays()
+        self.face_normals = obj_file.getFaceNormals( face_offsets, face_vertices ).T.astype( np.float )
+        self.face_offsets = face_offsets.astype( np.int32 )
+        # obj indices are one-based.
+        self.face_vertices = face_vertices.astype( np.int32 ) - 1
+
+    def _calculateAdjacency( self ):
+        '''Given vertex positions, normals, and the vertices of each face,
+        computes all of the adjacency data.'''
+        V = self.vertex_count()
+        origin = self.face_vertices
+        H = origin.size
+        half_edges = np.arange( H, dtype=np.int32 )
+        self.half_edge_face, next_edge, prev_edge, self.twins = halfEdges( self.face_offsets, origin, V )
+        is_first = half_edges == self.face_offsets[ self.half_edge_face ]
+        is_last = half_edges == self.face_offsets[ self.half_edge_face + 1 ] - 1
+
+        # Around each vertex, the half-edges leaving it form a ring: the edge
+        #   entering the vertex in one face is opposite the edge leaving it in
+        #   the face counter-clockwise from it (each face lies to the left of
+        #   its counter-clockwise edges).
+        ccw_edge = self.twins[ prev_edge ]
+        degree = np.bincount( origin, minlength=V )
+        self.vertex_offsets = np.zeros( V + 1, dtype=np.int32 )
+        np.cumsum( degree, out=self.vertex_offsets[1:] )
+        # Each ring starts with the vertex's lowest-indexed face. The position of
+        #   every half-edge in its ring is found by pointer jumping backwards
+        #   towards the start.
+        by_vertex = np.lexsort( ( self.half_edge_face, origin ) )
+        is_start = np.zeros( H, dtype=np.bool )
+        is_start[ by_vertex[ self.vertex_offsets[:-1][ degree > 0 ] ] ] = True
+        jump = np.empty( H, dtype=np.int32 )
+        jump[ ccw_edge ] = half_edges
+        jump[ is_start ] = half_edges[ is_start ]
+        rank = ( ~is_start ).astype( np.int32 )
+        max_steps = int( np.ceil( np.log2( max( degree.max() if V else 1, 1 ) ) ) ) + 1
+        for step in xrange( max_steps ):
+            if ( np.all( is_start[ jump ] ) ):
+                break
+            rank += rank[ jump ]
+            jump = jump[ jump ]
+        if ( not np.all( is_start[ jump ] ) ):
+            v = origin[ np.flatnonzero( ~is_start[ jump ] )[0] ]
+            raise ValueError, "The faces around vertex %d do not form a single ring" % v
+        self.vertex_faces = np.empty( H, dtype=np.int32 )
+        self.vertex_faces[ self.vertex_offsets[ origin ] + rank ] = self.half_edge_face
+
+        # A face's adjacent faces are collected by walking counter-clockwise
+        #   around each of its vertices in turn, from the face following the
+        #   one that ended the walk around the previous vertex (for the first
+        #   vertex, from the face following this one) up to the face across the
+        #   edge leaving the vertex. The last face collected is the first one,
+        #   so it is dropped.
+        skip = np.where( is_first, 1, 2 ).astype( np.int32 )
+        counts = np.maximum( degree[ origin ] - skip - is_last, 0 )
+        count_offsets = np.zeros( H + 1, dtype=np.int32 )
+        np.cumsum( counts, out=count_offsets[1:] )
+        edge = np.repeat( half_edges, counts )
+        step = skip[ edge ] + np.arange( count_offsets[-1], dtype=np.int32 ) - count_offsets[ edge ]
+        ring_start = self.vertex_offsets[ origin[ edge ] ]
+        self.face_faces = self.vertex_faces[ ring_start + ( rank[ edge ] + step ) % degree[ origin[ edge ] ] ]
+        self.face_face_offsets = count_offsets[ self.face_offsets ]
+
+if __name__ == '__main__':    
+    mesh = WatertightMesh()
+    mesh.from_obj( ObjFile( 'facet.obj' ) )
+    print "Bounding box", mesh.getBB()
\ No newline at end of file